@@ -1,6 +1,6 @@
 import os
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,6 +20,92 @@ class Settings:
     alfacrm_domain: Optional[str] = None
     alfacrm_token: Optional[str] = None
     alfacrm_branch_id: int = 1
+    alfacrm_email: Optional[str] = None
+    alfacrm_timeout: float = 10.0
+    alfacrm_max_retries: int = 3
+    crm_outbox_concurrency: int = 4
+    crm_outbox_max_attempts: int = 8
+    crm_outbox_poll_interval: float = 5.0
+    # Update delivery: "polling" or "webhook"
+    bot_mode: str = "polling"
+    webhook_base_url: str = ""
+    # Analytics event writer (core.events.writer)
+    events_batch_size: int = 200
+    events_flush_interval: float = 1.0
+    events_queue_size: int = 10000
+    events_overflow: str = "drop_oldest"
+    # User cache (core.users)
+    user_cache_size: int = 10000
+    user_cache_ttl: float = 600.0
+    user_flush_interval: float = 30.0
+    # SQLite storage profile (applied on every new connection)
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 268435456
+    sqlite_cache_size_kib: int = 65536
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    # Admin notifications (core.notify) and outgoing Telegram rate limits
+    admin_ids: list[int] = field(default_factory=list)
+    notify_digest_threshold: int = 5
+    notify_max_attempts: int = 5
+    tg_global_rate: float = 25.0
+    tg_per_chat_rate: float = 1.0
+    # Analytics / reminder scoping
+    tenant_id: str = "myking"
+    bot_id: str = "tsar_bot"
+    # Reminder scheduler (core.reminders)
+    reminder_batch_size: int = 100
+    reminder_max_sleep: float = 300.0
+    reminder_lease: float = 600.0
+    # FSM storage: "sql" (persistent, core.fsm) or "memory"
+    fsm_storage: str = "sql"
+    fsm_ttl: float = 86400.0
+    fsm_flush_interval: float = 1.0
+    fsm_cache_size: int = 10000
+    fsm_cache_ttl: float = 300.0
+    # Multi-process mode (core.workers): updates sharded by user across workers
+    workers: int = 1
+    worker_index: Optional[int] = None
+    leaderboard_refresh: float = 60.0
+    # Broadcasts (core.broadcast)
+    broadcast_rate: float = 20.0
+    broadcast_page_size: int = 200
+    broadcast_concurrency: int = 8
+    # Static games: Cache-Control max-age for non-HTML assets (core.web.static)
+    static_max_age: int = 86400
+    # POST /api/results (core.web.results)
+    results_api_origins: Tuple[str, ...] = ("*",)
+    webapp_auth_max_age: int = 86400
+    results_api_max_batch: int = 50
+    # Game sessions: a result is accepted within this many seconds of opening
+    game_session_ttl: int = 86400
+    # Incoming updates per user (core.throttling); 0 disables throttling
+    throttle_rate: float = 1.0
+    throttle_burst: float = 5.0
+
+    @property
+    def webhook_path(self) -> str:
+        return f"/webhook/{self.webhook_secret}"
+
+    @property
+    def webhook_url(self) -> str:
+        return f"{self.webhook_base_url}{self.webhook_path}"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
 
 
 def get_settings() -> Settings:
@@ -35,6 +121,62 @@ def get_settings() -> Settings:
 
     admin_username = os.getenv("ADMIN_USERNAME", "")
 
+    # Notification recipients: ADMIN_TG_IDS="1,2,3", falls back to ADMIN_TG_ID
+    admin_ids: list[int] = []
+    for part in os.getenv("ADMIN_TG_IDS", "").replace(";", ",").split(","):
+        part = part.strip()
+        if part.lstrip("-").isdigit() and int(part) not in admin_ids:
+            admin_ids.append(int(part))
+    if not admin_ids and admin_tg_id:
+        admin_ids = [admin_tg_id]
+    notify_digest_threshold = _env_int("NOTIFY_DIGEST_THRESHOLD", 5)
+    notify_max_attempts = _env_int("NOTIFY_MAX_ATTEMPTS", 5)
+    # Worker processes are started by the supervisor with BOT_WORKER_INDEX set
+    workers = max(1, _env_int("WORKERS", 1))
+    worker_index_str = os.getenv("BOT_WORKER_INDEX", "")
+    worker_index = int(worker_index_str) if worker_index_str.isdigit() else None
+    leaderboard_refresh = _env_float("LEADERBOARD_REFRESH", 60.0)
+
+    # Telegram allows ~30 msg/s per bot and ~1 msg/s per chat
+    tg_global_rate = _env_float("TG_GLOBAL_RATE", 25.0)
+    tg_per_chat_rate = _env_float("TG_PER_CHAT_RATE", 1.0)
+    if worker_index is not None and workers > 1:
+        # Worker processes split the bot-wide budget between them
+        tg_global_rate /= workers
+    tenant_id = os.getenv("TENANT_ID", "myking")
+    bot_id = os.getenv("BOT_ID", "tsar_bot")
+    reminder_batch_size = _env_int("REMINDER_BATCH_SIZE", 100)
+    reminder_max_sleep = _env_float("REMINDER_MAX_SLEEP", 300.0)
+    reminder_lease = _env_float("REMINDER_LEASE", 600.0)
+
+    # Conversation state: kept in the DB so forms survive restarts
+    fsm_storage = os.getenv("FSM_STORAGE", "sql").strip().lower()
+    if fsm_storage not in ("sql", "memory"):
+        fsm_storage = "sql"
+    fsm_ttl = _env_float("FSM_TTL", 86400.0)
+    fsm_flush_interval = _env_float("FSM_FLUSH_INTERVAL", 1.0)
+    fsm_cache_size = _env_int("FSM_CACHE_SIZE", 10000)
+    fsm_cache_ttl = _env_float("FSM_CACHE_TTL", 300.0)
+
+    broadcast_rate = _env_float("BROADCAST_RATE", 20.0)
+    broadcast_page_size = _env_int("BROADCAST_PAGE_SIZE", 200)
+    broadcast_concurrency = _env_int("BROADCAST_CONCURRENCY", 8)
+
+    # Game files are served from memory, pre-compressed; HTML is always revalidated
+    static_max_age = _env_int("STATIC_MAX_AGE", 86400)
+
+    # Games post results with their signed Telegram initData
+    results_api_origins = tuple(
+        origin.strip() for origin in os.getenv("RESULTS_API_ORIGINS", "*").split(",") if origin.strip()
+    )
+    webapp_auth_max_age = _env_int("WEBAPP_AUTH_MAX_AGE", 86400)
+    results_api_max_batch = _env_int("RESULTS_API_MAX_BATCH", 50)
+    game_session_ttl = _env_int("GAME_SESSION_TTL", 86400)
+
+    # Per-user token bucket for incoming updates: sustained rate and burst
+    throttle_rate = _env_float("THROTTLE_RATE", 1.0)
+    throttle_burst = _env_float("THROTTLE_BURST", 5.0)
+
     # Where games are hosted (GitHub Pages or Render)
     webapp_base_url = os.getenv(
         "WEBAPP_BASE_URL",
@@ -52,9 +194,45 @@ def get_settings() -> Settings:
 
     webhook_secret = os.getenv("WEBHOOK_SECRET", "bot-webhook")
 
+    # Update delivery mode. Webhook needs a public HTTPS address Telegram can reach.
+    bot_mode = os.getenv("BOT_MODE", "polling").strip().lower()
+    if bot_mode not in ("polling", "webhook"):
+        bot_mode = "polling"
+    webhook_base_url = os.getenv("WEBHOOK_BASE_URL", render_url).rstrip("/")
+    if "://" not in webhook_base_url:
+        webhook_base_url = f"https://{webhook_base_url}"
+
+    # Analytics events are buffered in memory and written in batches
+    events_batch_size = _env_int("EVENTS_BATCH_SIZE", 200)
+    events_flush_interval = _env_float("EVENTS_FLUSH_INTERVAL", 1.0)
+    events_queue_size = _env_int("EVENTS_QUEUE_SIZE", 10000)
+    events_overflow = os.getenv("EVENTS_OVERFLOW", "drop_oldest").strip().lower()
+    if events_overflow not in ("drop_oldest", "drop_newest"):
+        events_overflow = "drop_oldest"
+
+    # Users are cached in memory; last_seen_at is written back in bulk
+    user_cache_size = _env_int("USER_CACHE_SIZE", 10000)
+    user_cache_ttl = _env_float("USER_CACHE_TTL", 600.0)
+    user_flush_interval = _env_float("USER_FLUSH_INTERVAL", 30.0)
+
+    # SQLite tuning: WAL lets report readers run next to the bot's writer
+    sqlite_journal_mode = os.getenv("SQLITE_JOURNAL_MODE", "WAL").strip().upper()
+    sqlite_synchronous = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").strip().upper()
+    sqlite_busy_timeout_ms = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    sqlite_mmap_size = _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+    sqlite_cache_size_kib = _env_int("SQLITE_CACHE_SIZE_KIB", 64 * 1024)
+    db_pool_size = _env_int("DB_POOL_SIZE", 5)
+    db_max_overflow = _env_int("DB_MAX_OVERFLOW", 10)
+
     # AlfaCRM — optional
     alfacrm_domain = os.getenv("ALFACRM_DOMAIN") or None
-    alfacrm_token = os.getenv("ALFACRM_TOKEN") or None
+    alfacrm_token = os.getenv("ALFACRM_TOKEN") or os.getenv("ALFACRM_API_KEY") or None
+    alfacrm_email = os.getenv("ALFACRM_EMAIL") or None
+    alfacrm_timeout = _env_float("ALFACRM_TIMEOUT", 10.0)
+    alfacrm_max_retries = _env_int("ALFACRM_MAX_RETRIES", 3)
+    crm_outbox_concurrency = _env_int("CRM_OUTBOX_CONCURRENCY", 4)
+    crm_outbox_max_attempts = _env_int("CRM_OUTBOX_MAX_ATTEMPTS", 8)
+    crm_outbox_poll_interval = _env_float("CRM_OUTBOX_POLL_INTERVAL", 5.0)
     try:
         alfacrm_branch_id = int(os.getenv("ALFACRM_BRANCH_ID", "1"))
     except ValueError:
@@ -98,4 +276,54 @@ def get_settings() -> Settings:
         alfacrm_domain=alfacrm_domain,
         alfacrm_token=alfacrm_token,
         alfacrm_branch_id=alfacrm_branch_id,
+        alfacrm_email=alfacrm_email,
+        alfacrm_timeout=alfacrm_timeout,
+        alfacrm_max_retries=alfacrm_max_retries,
+        crm_outbox_concurrency=crm_outbox_concurrency,
+        crm_outbox_max_attempts=crm_outbox_max_attempts,
+        crm_outbox_poll_interval=crm_outbox_poll_interval,
+        bot_mode=bot_mode,
+        webhook_base_url=webhook_base_url,
+        events_batch_size=events_batch_size,
+        events_flush_interval=events_flush_interval,
+        events_queue_size=events_queue_size,
+        events_overflow=events_overflow,
+        user_cache_size=user_cache_size,
+        user_cache_ttl=user_cache_ttl,
+        user_flush_interval=user_flush_interval,
+        sqlite_journal_mode=sqlite_journal_mode,
+        sqlite_synchronous=sqlite_synchronous,
+        sqlite_busy_timeout_ms=sqlite_busy_timeout_ms,
+        sqlite_mmap_size=sqlite_mmap_size,
+        sqlite_cache_size_kib=sqlite_cache_size_kib,
+        db_pool_size=db_pool_size,
+        db_max_overflow=db_max_overflow,
+        admin_ids=admin_ids,
+        notify_digest_threshold=notify_digest_threshold,
+        notify_max_attempts=notify_max_attempts,
+        tg_global_rate=tg_global_rate,
+        tg_per_chat_rate=tg_per_chat_rate,
+        tenant_id=tenant_id,
+        bot_id=bot_id,
+        reminder_batch_size=reminder_batch_size,
+        reminder_max_sleep=reminder_max_sleep,
+        reminder_lease=reminder_lease,
+        fsm_storage=fsm_storage,
+        fsm_ttl=fsm_ttl,
+        fsm_flush_interval=fsm_flush_interval,
+        fsm_cache_size=fsm_cache_size,
+        fsm_cache_ttl=fsm_cache_ttl,
+        workers=workers,
+        worker_index=worker_index,
+        leaderboard_refresh=leaderboard_refresh,
+        broadcast_rate=broadcast_rate,
+        broadcast_page_size=broadcast_page_size,
+        broadcast_concurrency=broadcast_concurrency,
+        static_max_age=static_max_age,
+        results_api_origins=results_api_origins,
+        webapp_auth_max_age=webapp_auth_max_age,
+        results_api_max_batch=results_api_max_batch,
+        game_session_ttl=game_session_ttl,
+        throttle_rate=throttle_rate,
+        throttle_burst=throttle_burst,
     )
@@ -0,0 +1,37 @@
+from core.analytics.report import (
+    EVENT_COLUMNS,
+    FUNNEL_STEPS,
+    EventFilter,
+    build_report,
+    connect,
+    db_path_from_env,
+    events_source,
+    iter_events,
+    report_rows,
+)
+from core.analytics.rollup import (
+    build_rollup_report,
+    high_water_mark,
+    reset_rollups,
+    update_rollups,
+    whole_days,
+)
+from core.analytics.sketch import HyperLogLog
+
+__all__ = [
+    "EVENT_COLUMNS",
+    "FUNNEL_STEPS",
+    "EventFilter",
+    "HyperLogLog",
+    "build_report",
+    "build_rollup_report",
+    "connect",
+    "db_path_from_env",
+    "events_source",
+    "high_water_mark",
+    "iter_events",
+    "report_rows",
+    "reset_rollups",
+    "update_rollups",
+    "whole_days",
+]
@@ -0,0 +1,214 @@
+"""Funnel and game analytics over the event log.
+
+All counting happens in SQLite: ``GROUP BY`` for the funnel and per-game
+numbers (``game_id`` is a column of ``event_log``) and
+``COUNT(DISTINCT tg_id)`` with subqueries for conversion. Only result rows
+come back to Python, and raw event exports are streamed with
+``fetchmany``, so memory stays flat on a year of events.
+
+Until core.events.migrate has emptied the legacy ``events`` table, its
+rows are read too, converted on the fly to the same columns.
+
+This is an offline reader used by ``scripts/report.py``; it opens the
+database file read-only with plain :mod:`sqlite3`. For long windows the
+daily rollups in :mod:`core.analytics.rollup` answer the same questions
+without scanning the event log.
+"""
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+FUNNEL_STEPS = (
+    "user.started",
+    "game.opened",
+    "game.finished",
+    "purchase.intent",
+    "reminder.enabled",
+    "reminder.sent",
+)
+
+EVENT_COLUMNS = ("id", "ts", "tenant_id", "bot_id", "tg_id", "event_name", "game_id", "session_id", "score", "meta")
+
+_TYPED_EVENTS = (
+    "SELECT l.id, l.ts, l.tenant_id, l.bot_id, l.tg_id, n.name AS event_name, "
+    "l.game_id, l.session_id, l.score, l.meta "
+    "FROM event_log AS l JOIN event_names AS n ON n.id = l.name_id"
+)
+
+
+def _legacy_field(name: str) -> str:
+    # Legacy meta is free-form TEXT; json_extract raises on malformed JSON
+    return f"CASE WHEN json_valid(meta) THEN json_extract(meta, '$.{name}') END"
+
+
+_LEGACY_EVENTS = (
+    "SELECT id, CAST(strftime('%s', ts) AS INTEGER), tenant_id, bot_id, CAST(tg_id AS INTEGER), event_name, "
+    f"{_legacy_field('game_id')}, {_legacy_field('session_id')}, "
+    f"CAST({_legacy_field('score')} AS INTEGER), meta FROM events"
+)
+
+
+def events_source(conn: sqlite3.Connection) -> str:
+    """Subquery with :data:`EVENT_COLUMNS`, for ``FROM {source} AS e``."""
+    if conn.execute("SELECT 1 FROM events LIMIT 1").fetchone():
+        return f"({_TYPED_EVENTS} UNION ALL {_LEGACY_EVENTS})"
+    return f"({_TYPED_EVENTS})"
+
+
+def db_path_from_env() -> str:
+    """SQLite file path, from the same settings the bot uses.
+
+    Priority: DB_PATH (explicit override) → DATABASE_URL → bot.db
+    DATABASE_URL format: sqlite+aiosqlite:///./bot.db  →  ./bot.db
+    """
+    explicit = os.getenv("DB_PATH")
+    if explicit:
+        return explicit
+    db_url = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./bot.db")
+    if ":///" in db_url:
+        return db_url.split("///", 1)[1]
+    return "bot.db"
+
+
+def connect(db_path: str, readonly: bool = True) -> sqlite3.Connection:
+    """Read-only by default; a report never blocks the bot's writer."""
+    mode = "ro" if readonly else "rw"
+    conn = sqlite3.connect(f"file:{db_path}?mode={mode}", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+@dataclass(frozen=True)
+class EventFilter:
+    """Half-open time window [start, end) plus optional tenant/bot."""
+
+    start: datetime
+    end: datetime
+    tenant_id: Optional[str] = None
+    bot_id: Optional[str] = None
+
+    def where(self) -> Tuple[str, List[Any]]:
+        clauses = ["ts >= ?", "ts < ?"]
+        params: List[Any] = [_epoch(self.start), _epoch(self.end)]
+        if self.tenant_id:
+            clauses.append("tenant_id = ?")
+            params.append(self.tenant_id)
+        if self.bot_id:
+            clauses.append("bot_id = ?")
+            params.append(self.bot_id)
+        return " AND ".join(clauses), params
+
+
+def _utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _iso(dt: datetime) -> str:
+    return _utc(dt).isoformat()
+
+
+def _epoch(dt: datetime) -> int:
+    # Rounded up, so a fractional bound keeps the half-open window exact
+    return math.ceil(_utc(dt).timestamp())
+
+
+def funnel_counts(conn: sqlite3.Connection, f: EventFilter, steps: Sequence[str] = FUNNEL_STEPS) -> Dict[str, int]:
+    where, params = f.where()
+    marks = ", ".join("?" for _ in steps)
+    rows = conn.execute(
+        f"SELECT event_name, COUNT(*) FROM {events_source(conn)} AS e "
+        f"WHERE {where} AND event_name IN ({marks}) GROUP BY event_name",
+        [*params, *steps],
+    ).fetchall()
+    counts = {step: 0 for step in steps}
+    counts.update({name: n for name, n in rows})
+    return counts
+
+
+def total_events(conn: sqlite3.Connection, f: EventFilter) -> int:
+    where, params = f.where()
+    return conn.execute(f"SELECT COUNT(*) FROM {events_source(conn)} AS e WHERE {where}", params).fetchone()[0]
+
+
+def top_games(conn: sqlite3.Connection, f: EventFilter, event_name: str, limit: int = 5) -> List[Tuple[str, int]]:
+    """Most frequent ``game_id`` values among ``event_name`` events."""
+    where, params = f.where()
+    rows = conn.execute(
+        "SELECT COALESCE(game_id, 'unknown') AS game, COUNT(*) AS n "
+        f"FROM {events_source(conn)} AS e WHERE {where} AND event_name = ? "
+        "GROUP BY game ORDER BY n DESC, game LIMIT ?",
+        [*params, event_name, limit],
+    ).fetchall()
+    return [(game_id, n) for game_id, n in rows]
+
+
+def conversion(conn: sqlite3.Connection, f: EventFilter) -> Dict[str, Any]:
+    """Unique users who finished a game, showed purchase intent, and both."""
+    where, params = f.where()
+    source = events_source(conn)
+    finished = f"SELECT tg_id FROM {source} AS e WHERE {where} AND event_name = 'game.finished'"
+    intent = f"SELECT tg_id FROM {source} AS e WHERE {where} AND event_name = 'purchase.intent'"
+    row = conn.execute(
+        f"SELECT (SELECT COUNT(DISTINCT tg_id) FROM ({finished})),"
+        f" (SELECT COUNT(DISTINCT tg_id) FROM ({intent})),"
+        f" (SELECT COUNT(*) FROM (SELECT DISTINCT tg_id FROM ({finished}) WHERE tg_id IN ({intent})))",
+        [*params, *params, *params, *params],
+    ).fetchone()
+    finished_users, intent_users, converted = row
+    return {
+        "finished_users": finished_users,
+        "intent_users": intent_users,
+        "converted_users": converted,
+        "rate": round(converted / finished_users * 100, 2) if finished_users else None,
+    }
+
+
+def build_report(conn: sqlite3.Connection, f: EventFilter, top: int = 5) -> Dict[str, Any]:
+    return {
+        "from": _iso(f.start),
+        "to": _iso(f.end),
+        "tenant_id": f.tenant_id,
+        "bot_id": f.bot_id,
+        "total_events": total_events(conn, f),
+        "funnel": funnel_counts(conn, f),
+        "top_opened": top_games(conn, f, "game.opened", top),
+        "top_finished": top_games(conn, f, "game.finished", top),
+        "conversion": conversion(conn, f),
+    }
+
+
+def iter_events(conn: sqlite3.Connection, f: EventFilter, batch_size: int = 1000) -> Iterator[sqlite3.Row]:
+    """Raw events in id order, fetched ``batch_size`` rows at a time."""
+    where, params = f.where()
+    cursor = conn.execute(
+        f"SELECT {', '.join(EVENT_COLUMNS)} FROM {events_source(conn)} AS e WHERE {where} ORDER BY id",
+        params,
+    )
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def report_rows(report: Dict[str, Any]) -> Iterator[Tuple[str, str, Any]]:
+    """Flatten a report into (section, key, value) rows for CSV output."""
+    yield ("summary", "total_events", report["total_events"])
+    for step, n in report["funnel"].items():
+        yield ("funnel", step, n)
+    for game_id, n in report["top_opened"]:
+        yield ("top_opened", game_id, n)
+    for game_id, n in report["top_finished"]:
+        yield ("top_finished", game_id, n)
+    for key, value in report["conversion"].items():
+        yield ("conversion", key, value)
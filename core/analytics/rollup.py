@@ -0,0 +1,205 @@
+"""Daily rollups of the ``events`` table.
+
+``update_rollups`` folds new events of the event log into two tables:
+``rollup_daily_counts`` holds event counters per (day, tenant_id, bot_id,
+event_name, game_id) and ``rollup_daily_users`` a HyperLogLog sketch of
+the distinct users per (day, tenant_id, bot_id, event_name). Progress is a high-water mark on the event id kept in
+``rollup_state``; each id range is applied in the same transaction that
+moves the mark, so an interrupted run never counts an event twice.
+
+SQLite serializes writers and the log is append-only, so an id below the
+mark can never show up later. Legacy rows moved by core.events.migrate
+keep their ids and new ids start after them, so the mark stays valid
+across that move.
+
+``build_rollup_report`` answers the same questions as
+``core.analytics.report.build_report`` from the daily rows, in time that
+depends on the number of days in the window, not the number of events.
+Windows are whole UTC days; distinct-user numbers are estimates.
+"""
+from __future__ import annotations
+
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Sequence, Tuple
+
+from core.analytics.report import FUNNEL_STEPS, EventFilter, events_source
+from core.analytics.sketch import HyperLogLog
+
+ROLLUP_NAME = "events_daily"
+
+_USERS_KEY = ("day", "tenant_id", "bot_id", "event_name")
+
+
+def whole_days(f: EventFilter) -> EventFilter:
+    """Widen a window to UTC midnight boundaries."""
+    start = f.start.astimezone(timezone.utc) if f.start.tzinfo else f.start.replace(tzinfo=timezone.utc)
+    end = f.end.astimezone(timezone.utc) if f.end.tzinfo else f.end.replace(tzinfo=timezone.utc)
+    first = datetime.combine(start.date(), time(), tzinfo=timezone.utc)
+    last = datetime.combine(end.date(), time(), tzinfo=timezone.utc)
+    if last < end:
+        last += timedelta(days=1)
+    return EventFilter(start=first, end=last, tenant_id=f.tenant_id, bot_id=f.bot_id)
+
+
+def _where(f: EventFilter) -> Tuple[str, List[Any]]:
+    f = whole_days(f)
+    clauses = ["day >= ?", "day < ?"]
+    params: List[Any] = [f.start.date().isoformat(), f.end.date().isoformat()]
+    if f.tenant_id:
+        clauses.append("tenant_id = ?")
+        params.append(f.tenant_id)
+    if f.bot_id:
+        clauses.append("bot_id = ?")
+        params.append(f.bot_id)
+    return " AND ".join(clauses), params
+
+
+# ----------------------------------------------------------------------
+# Incremental update
+# ----------------------------------------------------------------------
+
+def high_water_mark(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT last_event_id FROM rollup_state WHERE name = ?", (ROLLUP_NAME,)).fetchone()
+    return row[0] if row else 0
+
+
+def update_rollups(conn: sqlite3.Connection, batch_size: int = 50000) -> int:
+    """Roll up events added since the last run; returns how many were applied."""
+    last_id = high_water_mark(conn)
+    max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {events_source(conn)} AS e").fetchone()[0]
+    applied = 0
+    while last_id < max_id:
+        upper = min(last_id + max(1, batch_size), max_id)
+        with conn:
+            applied += _apply_range(conn, last_id, upper)
+            conn.execute(
+                "INSERT INTO rollup_state (name, last_event_id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET last_event_id = excluded.last_event_id, "
+                "updated_at = excluded.updated_at",
+                (ROLLUP_NAME, upper, datetime.utcnow().isoformat(" ")),
+            )
+        last_id = upper
+    return applied
+
+
+def _apply_range(conn: sqlite3.Connection, after_id: int, upper_id: int) -> int:
+    source = events_source(conn)
+    key_sql = "date(ts, 'unixepoch'), tenant_id, bot_id, event_name"
+    conn.execute(
+        "INSERT INTO rollup_daily_counts (day, tenant_id, bot_id, event_name, game_id, events) "
+        f"SELECT {key_sql}, COALESCE(game_id, ''), COUNT(*) FROM {source} AS e "
+        "WHERE id > ? AND id <= ? GROUP BY 1, 2, 3, 4, 5 "
+        "ON CONFLICT(day, tenant_id, bot_id, event_name, game_id) "
+        "DO UPDATE SET events = events + excluded.events",
+        (after_id, upper_id),
+    )
+    applied = conn.execute(
+        f"SELECT COUNT(*) FROM {source} AS e WHERE id > ? AND id <= ?", (after_id, upper_id)
+    ).fetchone()[0]
+
+    sketches: Dict[Tuple[str, ...], HyperLogLog] = defaultdict(HyperLogLog)
+    rows = conn.execute(
+        f"SELECT DISTINCT {key_sql}, tg_id FROM {source} AS e WHERE id > ? AND id <= ?", (after_id, upper_id)
+    )
+    for *key, tg_id in rows:
+        sketches[tuple(key)].add(tg_id)
+
+    key_match = " AND ".join(f"{column} = ?" for column in _USERS_KEY)
+    for key, sketch in sketches.items():
+        row = conn.execute(f"SELECT sketch FROM rollup_daily_users WHERE {key_match}", key).fetchone()
+        if row is not None:
+            sketch.merge_bytes(row[0])
+        conn.execute(
+            "INSERT OR REPLACE INTO rollup_daily_users (day, tenant_id, bot_id, event_name, sketch) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (*key, sketch.to_bytes()),
+        )
+    return applied
+
+
+def reset_rollups(conn: sqlite3.Connection) -> None:
+    """Drop all rolled-up data; the next update starts from the first event."""
+    with conn:
+        conn.execute("DELETE FROM rollup_daily_counts")
+        conn.execute("DELETE FROM rollup_daily_users")
+        conn.execute("DELETE FROM rollup_state WHERE name = ?", (ROLLUP_NAME,))
+
+
+# ----------------------------------------------------------------------
+# Queries
+# ----------------------------------------------------------------------
+
+def funnel_counts(conn: sqlite3.Connection, f: EventFilter, steps: Sequence[str] = FUNNEL_STEPS) -> Dict[str, int]:
+    where, params = _where(f)
+    marks = ", ".join("?" for _ in steps)
+    rows = conn.execute(
+        f"SELECT event_name, SUM(events) FROM rollup_daily_counts "
+        f"WHERE {where} AND event_name IN ({marks}) GROUP BY event_name",
+        [*params, *steps],
+    ).fetchall()
+    counts = {step: 0 for step in steps}
+    counts.update({name: n for name, n in rows})
+    return counts
+
+
+def total_events(conn: sqlite3.Connection, f: EventFilter) -> int:
+    where, params = _where(f)
+    return conn.execute(
+        f"SELECT COALESCE(SUM(events), 0) FROM rollup_daily_counts WHERE {where}", params
+    ).fetchone()[0]
+
+
+def top_games(conn: sqlite3.Connection, f: EventFilter, event_name: str, limit: int = 5) -> List[Tuple[str, int]]:
+    where, params = _where(f)
+    rows = conn.execute(
+        "SELECT CASE game_id WHEN '' THEN 'unknown' ELSE game_id END AS game, SUM(events) AS n "
+        f"FROM rollup_daily_counts WHERE {where} AND event_name = ? "
+        "GROUP BY game ORDER BY n DESC, game LIMIT ?",
+        [*params, event_name, limit],
+    ).fetchall()
+    return [(game_id, n) for game_id, n in rows]
+
+
+def distinct_users(conn: sqlite3.Connection, f: EventFilter, event_name: str) -> HyperLogLog:
+    """Merged sketch of everyone who produced ``event_name`` in the window."""
+    where, params = _where(f)
+    merged = HyperLogLog()
+    for (data,) in conn.execute(
+        f"SELECT sketch FROM rollup_daily_users WHERE {where} AND event_name = ?", [*params, event_name]
+    ):
+        merged.merge_bytes(data)
+    return merged
+
+
+def conversion(conn: sqlite3.Connection, f: EventFilter) -> Dict[str, Any]:
+    finished = distinct_users(conn, f, "game.finished")
+    intent = distinct_users(conn, f, "purchase.intent")
+    finished_users, intent_users = finished.count(), intent.count()
+    union = HyperLogLog()
+    union.merge(finished)
+    union.merge(intent)
+    # |A ∩ B| = |A| + |B| - |A ∪ B|, clamped against estimation noise
+    converted = max(0, min(finished_users, intent_users, finished_users + intent_users - union.count()))
+    return {
+        "finished_users": finished_users,
+        "intent_users": intent_users,
+        "converted_users": converted,
+        "rate": round(converted / finished_users * 100, 2) if finished_users else None,
+    }
+
+
+def build_rollup_report(conn: sqlite3.Connection, f: EventFilter, top: int = 5) -> Dict[str, Any]:
+    days = whole_days(f)
+    return {
+        "from": days.start.isoformat(),
+        "to": days.end.isoformat(),
+        "tenant_id": f.tenant_id,
+        "bot_id": f.bot_id,
+        "total_events": total_events(conn, days),
+        "funnel": funnel_counts(conn, days),
+        "top_opened": top_games(conn, days, "game.opened", top),
+        "top_finished": top_games(conn, days, "game.finished", top),
+        "conversion": conversion(conn, days),
+    }
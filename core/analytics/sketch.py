@@ -0,0 +1,92 @@
+"""HyperLogLog distinct-user sketch.
+
+A sketch answers "how many distinct users" with ~1.6% standard error in at
+most 4 KiB, and two sketches merge losslessly (register-wise max), so daily
+sketches combine into a sketch for any window. Small sets are stored in a
+sparse form of 3 bytes per used register; with linear counting they are
+close to exact.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import struct
+from typing import Iterable, Optional
+
+PRECISION = 12
+
+_DENSE = 0
+_SPARSE = 1
+_PAIR = struct.Struct(">HB")
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = PRECISION) -> None:
+        self.p = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, value: object) -> None:
+        h = _hash64(str(value))
+        bits = 64 - self.p
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[object]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.p != self.p:
+            raise ValueError(f"Cannot merge sketches of precision {self.p} and {other.p}")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def merge_bytes(self, data: bytes) -> None:
+        """``merge(from_bytes(data))`` without building a dense copy of sparse data."""
+        if data and data[0] == _SPARSE and data[1] == self.p:
+            registers = self.registers
+            for index, rank in _PAIR.iter_unpack(data[2:]):
+                if rank > registers[index]:
+                    registers[index] = rank
+        else:
+            self.merge(HyperLogLog.from_bytes(data))
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    # ------------------------------------------------------------------
+    # Serialization
+    # ------------------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        used = [(i, r) for i, r in enumerate(self.registers) if r]
+        if len(used) * _PAIR.size < self.m:
+            return bytes((_SPARSE, self.p)) + b"".join(_PAIR.pack(i, r) for i, r in used)
+        return bytes((_DENSE, self.p)) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> "HyperLogLog":
+        if not data:
+            return cls()
+        kind, precision = data[0], data[1]
+        sketch = cls(precision)
+        if kind == _DENSE:
+            sketch.registers[:] = data[2:2 + sketch.m]
+        elif kind == _SPARSE:
+            for index, rank in _PAIR.iter_unpack(data[2:]):
+                sketch.registers[index] = rank
+        else:
+            raise ValueError(f"Unknown sketch encoding {kind}")
+        return sketch
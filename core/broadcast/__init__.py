@@ -0,0 +1,4 @@
+from core.broadcast.engine import BroadcastEngine
+from core.broadcast.service import broadcaster
+
+__all__ = ["BroadcastEngine", "broadcaster"]
@@ -0,0 +1,304 @@
+"""Admin broadcasts to every user.
+
+Recipients are streamed from ``users`` page by page with keyset pagination
+(``id > cursor ORDER BY id``), so memory stays flat however many parents
+pressed /start. Sends are started strictly in id order under a dedicated
+token bucket that also draws on the shared bot-wide budget, so together
+with notifications and reminders they stay below Telegram's limit. After
+each page the cursor and counters are written to the ``broadcasts`` row; a
+restart resumes from that cursor. The checkpoint only applies while the
+row is still ``running``, so a /broadcast_cancel handled by another
+process stops the sender at the next page. Progress is reported as ``broadcast.*`` analytics events.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Set
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from sqlalchemy import func, select, update
+
+from core.events import track
+from core.notify import notify_admin
+from core.ratelimit import TelegramRateLimiter
+from models import AsyncSessionLocal, Broadcast, User
+
+logger = logging.getLogger(__name__)
+
+SENT = "sent"
+BLOCKED = "blocked"
+FAILED = "failed"
+
+
+class BroadcastEngine:
+    def __init__(
+        self,
+        limiter: TelegramRateLimiter,
+        *,
+        linked_limiters: Sequence[TelegramRateLimiter] = (),
+        page_size: int = 200,
+        concurrency: int = 8,
+        max_attempts: int = 3,
+    ) -> None:
+        self.limiter = limiter
+        # A flood wait applies to the whole bot: pause the other senders too
+        self.linked_limiters = list(linked_limiters)
+        self.page_size = max(1, page_size)
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._cancelled: Set[int] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def create(self, text: str, created_by: int, parse_mode: Optional[str] = "HTML") -> Broadcast:
+        """Queue a broadcast; it starts as soon as earlier ones finish."""
+        async with AsyncSessionLocal() as session:
+            total = await session.scalar(select(func.count()).select_from(User))
+            broadcast = Broadcast(
+                text=text,
+                parse_mode=parse_mode,
+                status="pending",
+                created_by=created_by,
+                total=total or 0,
+                last_user_id=0,
+                sent=0,
+                blocked=0,
+                failed=0,
+                created_at=datetime.utcnow(),
+            )
+            session.add(broadcast)
+            await session.commit()
+        self._wakeup.set()
+        return broadcast
+
+    async def cancel(self, broadcast_id: int) -> bool:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id, Broadcast.status.in_(("pending", "running")))
+                .values(status="cancelled", finished_at=datetime.utcnow())
+            )
+            await session.commit()
+        if result.rowcount:
+            # Fast path for this process; others see the status at their next checkpoint
+            self._cancelled.add(broadcast_id)
+            return True
+        return False
+
+    async def latest(self) -> Optional[Broadcast]:
+        async with AsyncSessionLocal() as session:
+            return await session.scalar(select(Broadcast).order_by(Broadcast.id.desc()).limit(1))
+
+    async def start(self, bot: Bot) -> None:
+        if self.running:
+            return
+        self._bot = bot
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="broadcast")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stop after in-flight sends; the checkpoint keeps the rest for later."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            # wait_for has cancelled the runner; the last checkpoint still holds
+            logger.warning("Broadcast: did not stop in time, cancelled")
+        except Exception as e:
+            logger.warning(f"Broadcast: runner failed: {e}")
+        self._task = None
+
+    # ------------------------------------------------------------------
+    # Runner
+    # ------------------------------------------------------------------
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                broadcast = await self._next()
+            except Exception as e:
+                logger.warning(f"Broadcast: failed to load queue: {e}")
+                broadcast = None
+            if broadcast is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=60.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._send_broadcast(broadcast)
+            except Exception as e:
+                logger.error(f"Broadcast #{broadcast.id} interrupted: {e}", exc_info=True)
+                await asyncio.sleep(5.0)
+
+    async def _next(self) -> Optional[Broadcast]:
+        async with AsyncSessionLocal() as session:
+            return await session.scalar(
+                select(Broadcast)
+                .where(Broadcast.status.in_(("pending", "running")))
+                .order_by(Broadcast.id)
+                .limit(1)
+            )
+
+    async def _send_broadcast(self, broadcast: Broadcast) -> None:
+        counts = {SENT: broadcast.sent, BLOCKED: broadcast.blocked, FAILED: broadcast.failed}
+        cursor = broadcast.last_user_id
+        if broadcast.status == "pending":
+            if not await self._checkpoint(
+                broadcast.id, cursor, counts, status="running", started_at=datetime.utcnow()
+            ):
+                logger.info(f"Broadcast #{broadcast.id}: cancelled before it started")
+                return
+            await track("broadcast.started", broadcast.created_by, {"broadcast_id": broadcast.id, "total": broadcast.total})
+        else:
+            logger.info(f"Broadcast #{broadcast.id}: resuming after user {cursor}")
+
+        while not self._stopping and broadcast.id not in self._cancelled:
+            async with AsyncSessionLocal() as session:
+                ids = (
+                    await session.execute(
+                        select(User.id).where(User.id > cursor).order_by(User.id).limit(self.page_size)
+                    )
+                ).scalars().all()
+            if not ids:
+                if await self._checkpoint(broadcast.id, cursor, counts, status="done", finished_at=datetime.utcnow()):
+                    await self._finished(broadcast, counts)
+                    return
+                self._cancelled.add(broadcast.id)
+                break
+
+            started = time.monotonic()
+            done, page_counts = await self._send_page(broadcast, ids)
+            if not done:
+                break
+            cursor = ids[done - 1]
+            for outcome, n in page_counts.items():
+                counts[outcome] += n
+            if not await self._checkpoint(broadcast.id, cursor, counts):
+                # Cancelled elsewhere: keep the counters of what was sent, then stop
+                self._cancelled.add(broadcast.id)
+                await self._checkpoint(broadcast.id, cursor, counts, status="cancelled")
+                break
+
+            elapsed = max(time.monotonic() - started, 1e-6)
+            await track(
+                "broadcast.progress",
+                broadcast.created_by,
+                {
+                    "broadcast_id": broadcast.id,
+                    "cursor": cursor,
+                    "total": broadcast.total,
+                    **counts,
+                    "rate": round(done / elapsed, 2),
+                },
+            )
+        state = "cancelled" if broadcast.id in self._cancelled else "paused"
+        logger.info(f"Broadcast #{broadcast.id}: {state} at user {cursor} ({counts[SENT]} sent)")
+
+    async def _send_page(self, broadcast: Broadcast, ids: Sequence[int]) -> tuple[int, Dict[str, int]]:
+        """Send to ``ids`` in order; returns (how many were started, outcomes).
+
+        New sends are only started in id order, so when we stop early the
+        started ones form a prefix and the cursor can point at its end.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        page_counts = {SENT: 0, BLOCKED: 0, FAILED: 0}
+        tasks = []
+
+        async def send(chat_id: int) -> None:
+            try:
+                outcome = await self._send_one(chat_id, broadcast.text, broadcast.parse_mode)
+            finally:
+                semaphore.release()
+            page_counts[outcome] += 1
+
+        started = 0
+        for chat_id in ids:
+            if self._stopping or broadcast.id in self._cancelled:
+                break
+            await semaphore.acquire()
+            await self.limiter.acquire()
+            tasks.append(asyncio.create_task(send(chat_id)))
+            started += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+        return started, page_counts
+
+    async def _send_one(self, chat_id: int, text: str, parse_mode: Optional[str]) -> str:
+        """Deliver one message; the first attempt's token is already taken."""
+        attempt = 0
+        while True:
+            try:
+                await self._bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                return SENT
+            except TelegramRetryAfter as e:
+                for limiter in (self.limiter, *self.linked_limiters):
+                    limiter.pause(e.retry_after)
+                logger.warning(f"Broadcast: flood wait {e.retry_after}s")
+            except TelegramForbiddenError:
+                # Blocked the bot or deactivated the account
+                return BLOCKED
+            except TelegramBadRequest as e:
+                logger.info(f"Broadcast: cannot send to {chat_id}: {e}")
+                return FAILED
+            except Exception as e:
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    logger.warning(f"Broadcast: giving up on {chat_id}: {e}")
+                    return FAILED
+                await asyncio.sleep(2.0 ** attempt)
+            await self.limiter.acquire()
+
+    async def _checkpoint(self, broadcast_id: int, cursor: int, counts: Dict[str, int], **values: Any) -> bool:
+        """Save progress; False if the broadcast is no longer pending/running.
+
+        The status guard doubles as the cross-process cancellation check.
+        ``status="cancelled"`` only updates the counters of a cancelled row.
+        """
+        if values.get("status") == "cancelled":
+            allowed: tuple = ("cancelled",)
+            values.pop("status")
+        elif "status" in values:
+            # Never resurrect a broadcast cancelled in the meantime
+            allowed = ("pending", "running")
+        else:
+            allowed = ("running",)
+        stmt = (
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.status.in_(allowed))
+            .values(last_user_id=cursor, sent=counts[SENT], blocked=counts[BLOCKED], failed=counts[FAILED], **values)
+        )
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(stmt)
+            await session.commit()
+        return bool(result.rowcount)
+
+    async def _finished(self, broadcast: Broadcast, counts: Dict[str, int]) -> None:
+        await track("broadcast.finished", broadcast.created_by, {"broadcast_id": broadcast.id, **counts})
+        logger.info(f"Broadcast #{broadcast.id} finished: {counts}")
+        await notify_admin(
+            self._bot,
+            f"📣 <b>Рассылка #{broadcast.id} завершена</b>\n\n"
+            f"✅ Доставлено: {counts[SENT]}\n"
+            f"🚫 Заблокировали бота: {counts[BLOCKED]}\n"
+            f"⚠️ Ошибки: {counts[FAILED]}",
+        )
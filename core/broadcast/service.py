@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from config import get_settings
+from core.broadcast.engine import BroadcastEngine
+from core.ratelimit import TelegramRateLimiter, telegram_limiter
+
+settings = get_settings()
+
+# Own cap inside the shared budget: broadcasts plus notifications and
+# reminders together never exceed TG_GLOBAL_RATE, and a flood wait pauses all
+broadcast_limiter = TelegramRateLimiter(global_rate=settings.broadcast_rate, parent=telegram_limiter)
+
+broadcaster = BroadcastEngine(
+    broadcast_limiter,
+    page_size=settings.broadcast_page_size,
+    concurrency=settings.broadcast_concurrency,
+)
@@ -0,0 +1,4 @@
+from core.crm.client import AlfaCRMClient, AlfaCRMError, AlfaCRMHTTPError
+from core.crm.outbox import OutboxWorker, enqueue
+
+__all__ = ["AlfaCRMClient", "AlfaCRMError", "AlfaCRMHTTPError", "OutboxWorker", "enqueue"]
@@ -0,0 +1,282 @@
+"""Async AlfaCRM API client.
+
+One ``aiohttp.ClientSession`` with a keep-alive connection pool is shared by
+all calls. The auth token is cached and refreshed under an ``asyncio.Lock``,
+so concurrent callers wait for a single login instead of racing. Requests
+that fail with 5xx, 429 or a network error are retried with exponential
+backoff (honouring ``Retry-After``).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class AlfaCRMError(RuntimeError):
+    """AlfaCRM returned an error or an unexpected payload."""
+
+
+class AlfaCRMHTTPError(AlfaCRMError):
+    def __init__(self, status: int, text: str, url: str) -> None:
+        super().__init__(f"AlfaCRM HTTP {status} for {url}: {text[:200]}")
+        self.status = status
+        self.text = text
+        self.url = url
+
+
+def _is_access_denied(status: int, text: str) -> bool:
+    lowered = text.lower()
+    return status == 401 or "access denied" in lowered or "accessdenied" in lowered
+
+
+class AlfaCRMClient:
+    def __init__(
+        self,
+        base_url: str,
+        email: str,
+        api_key: str,
+        *,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        pool_size: int = 20,
+        token_ttl: float = 3600.0,
+    ) -> None:
+        if "://" not in base_url:
+            base_url = f"https://{base_url}"
+        self.base_url = base_url.rstrip("/")
+        self.email = email
+        self.api_key = api_key
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.token_ttl = token_ttl
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------
+    # Session
+    # ------------------------------------------------------------------
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "AlfaCRMClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    def _url(self, path: str) -> str:
+        if path.startswith("http"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    # ------------------------------------------------------------------
+    # Auth
+    # ------------------------------------------------------------------
+
+    def _token_valid(self) -> bool:
+        return bool(self._token) and time.monotonic() < self._token_expires_at
+
+    async def get_token(self, force: bool = False) -> str:
+        """Cached token; ``force`` replaces a token the server rejected."""
+        if not force and self._token_valid():
+            return self._token
+        stale = self._token
+        async with self._token_lock:
+            # Another coroutine may have logged in while we waited for the lock
+            if self._token_valid() and (not force or self._token != stale):
+                return self._token
+
+            logger.info("Requesting AlfaCRM token")
+            data = await self._send(
+                "POST",
+                self._url("v2api/auth/login"),
+                json={"email": self.email, "api_key": self.api_key},
+                headers={},
+            )
+            token = None
+            if isinstance(data, dict):
+                token = data.get("token") or (data.get("data") or {}).get("token")
+            if not token:
+                raise AlfaCRMError(f"AlfaCRM token missing in response: {data}")
+            self._token = str(token)
+            self._token_expires_at = time.monotonic() + self.token_ttl
+            return self._token
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    async def request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None) -> Any:
+        url = self._url(path)
+        token = await self.get_token()
+        try:
+            return await self._send(method, url, json=json, headers={"X-ALFACRM-TOKEN": token})
+        except AlfaCRMHTTPError as exc:
+            if not _is_access_denied(exc.status, exc.text):
+                raise
+        logger.warning("AlfaCRM token rejected, retrying with new token")
+        token = await self.get_token(force=True)
+        return await self._send(method, url, json=json, headers={"X-ALFACRM-TOKEN": token})
+
+    async def _send(
+        self, method: str, url: str, *, json: Optional[Dict[str, Any]], headers: Dict[str, str]
+    ) -> Any:
+        session = self._get_session()
+        attempt = 0
+        while True:
+            retry_after: Optional[float] = None
+            try:
+                logger.info("AlfaCRM request %s %s", method.upper(), url)
+                async with session.request(method, url, json=json, headers=headers) as response:
+                    text = await response.text()
+                    status = response.status
+                    if status == 429 or status >= 500:
+                        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                        error: Exception = AlfaCRMHTTPError(status, text, url)
+                    elif status >= 400 or _is_access_denied(status, text):
+                        raise AlfaCRMHTTPError(status if status >= 400 else 401, text, url)
+                    else:
+                        return _decode(text)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as exc:
+                error = exc
+
+            if attempt >= self.max_retries:
+                raise error
+            delay = retry_after if retry_after is not None else self.backoff * (2 ** attempt)
+            delay += random.uniform(0, self.backoff / 2)
+            attempt += 1
+            logger.warning(f"AlfaCRM {method.upper()} {url} failed ({error}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    # ------------------------------------------------------------------
+    # API methods
+    # ------------------------------------------------------------------
+
+    async def ping(self) -> bool:
+        try:
+            await self.request("POST", "/v2api/branch/index", json={"is_active": 1, "page": 0})
+            return True
+        except Exception as exc:
+            logger.error("AlfaCRM ping failed: %s", exc)
+            return False
+
+    async def list_branches(self) -> list[dict]:
+        response = await self.request("POST", "/v2api/branch/index", json={"is_active": 1, "page": 0})
+        if isinstance(response, dict):
+            items = response.get("items")
+            if isinstance(items, list):
+                return items
+        return []
+
+    async def create_lead(
+        self,
+        branch_id: int,
+        name: str,
+        phone: str | None,
+        note: str | None = None,
+        source: str = "telegram",
+    ) -> int:
+        """Create a lead; falls back to a customer on CRMs without the lead API.
+
+        ``phone`` is left out of the request when unknown.
+        """
+        lead_payload: Dict[str, Any] = {"name": name}
+        if phone:
+            lead_payload["phone"] = phone
+        if note is not None:
+            lead_payload["note"] = note
+
+        try:
+            response = await self.request("POST", f"/v2api/{branch_id}/lead/create", json=lead_payload)
+            if _is_model_error(response):
+                raise AlfaCRMError(f"Lead create model error: {response}")
+            lead_id = _extract_id(response)
+            if lead_id is not None:
+                return lead_id
+            raise AlfaCRMError(f"Lead create missing id: {response}")
+        except AlfaCRMHTTPError as exc:
+            if exc.status != 404 and "not found" not in exc.text.lower():
+                raise
+
+        customer_payload: Dict[str, Any] = {
+            "name": name,
+            "is_study": 0,
+            "source": source,
+        }
+        if phone:
+            customer_payload["phone"] = [phone]
+        if note is not None:
+            customer_payload["note"] = note
+
+        response = await self.request("POST", f"/v2api/{branch_id}/customer/create", json=customer_payload)
+        customer_id = _extract_id(response)
+        if customer_id is not None:
+            return customer_id
+        raise AlfaCRMError(f"Customer create missing id: {response}")
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _decode(text: str) -> Any:
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _extract_id(payload: Any) -> Optional[int]:
+    if not isinstance(payload, dict):
+        return None
+    for candidate in (payload.get("model"), payload, payload.get("data")):
+        if isinstance(candidate, dict) and "id" in candidate:
+            try:
+                return int(candidate["id"])
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def _is_model_error(payload: Any) -> bool:
+    if payload is None:
+        return False
+    if isinstance(payload, dict):
+        if payload.get("model_error") or payload.get("errors") or payload.get("error"):
+            return True
+        message = payload.get("message")
+        if isinstance(message, str) and "model" in message.lower():
+            return True
+    text = str(payload).lower()
+    return "model" in text and "error" in text
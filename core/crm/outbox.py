@@ -0,0 +1,267 @@
+"""Transactional outbox that pushes leads and bill requests to AlfaCRM.
+
+Handlers call :func:`enqueue` in the same session (and commit) as the
+``Lead``/``BillRequest`` insert, so a row can never be saved without its
+sync job or vice versa. :class:`OutboxWorker` claims due jobs with a lease,
+delivers them through the async CRM client with bounded concurrency and
+moves the source row ``new``/``requested`` → ``synced`` or ``failed``.
+Jobs live in the DB, so retries survive restarts and a backlog left by a
+CRM outage drains in parallel once it is back.
+
+AlfaCRM has no idempotency header: the job's ``idempotency_key`` is put in
+the CRM note, so the (rare) duplicate after a crash between the CRM call
+and the local commit is easy to spot.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import AsyncSessionLocal, BillRequest, CrmOutbox, Lead
+
+logger = logging.getLogger(__name__)
+
+KIND_MODELS = {"lead": Lead, "bill": BillRequest}
+
+# Writes of the "done" status after a successful send
+FINISH_ATTEMPTS = 3
+
+# (branch_id, payload) -> CRM id
+Sender = Callable[[int, Dict[str, Any]], Awaitable[int]]
+
+
+def enqueue(
+    session: AsyncSession,
+    kind: str,
+    ref_id: int,
+    *,
+    name: str,
+    phone: Optional[str] = None,
+    note: Optional[str] = None,
+) -> CrmOutbox:
+    """Add a sync job to *session*; it is committed together with the source row.
+
+    Without ``phone`` the CRM record is created without one.
+    """
+    if kind not in KIND_MODELS:
+        raise ValueError(f"Unknown outbox kind {kind!r}")
+    now = datetime.utcnow()
+    key = f"{kind}:{ref_id}"
+    full_note = f"{note}\n[{key}]" if note else f"[{key}]"
+    payload: Dict[str, Any] = {"name": name, "note": full_note}
+    if phone:
+        payload["phone"] = phone
+    entry = CrmOutbox(
+        kind=kind,
+        ref_id=ref_id,
+        idempotency_key=key,
+        payload=json.dumps(payload, ensure_ascii=False),
+        status="pending",
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+        updated_at=now,
+    )
+    session.add(entry)
+    return entry
+
+
+class OutboxWorker:
+    def __init__(
+        self,
+        sender: Sender,
+        *,
+        branch_id: int = 1,
+        concurrency: int = 4,
+        max_attempts: int = 8,
+        poll_interval: float = 5.0,
+        lease: float = 120.0,
+        base_backoff: float = 10.0,
+        max_backoff: float = 3600.0,
+    ) -> None:
+        self.sender = sender
+        self.branch_id = branch_id
+        self.concurrency = max(1, concurrency)
+        self.batch_size = self.concurrency * 4
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.synced = 0
+        self.failed = 0
+        self.retried = 0
+
+    def notify(self) -> None:
+        """Wake the worker right after a new job was committed."""
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {"synced": self.synced, "failed": self.failed, "retried": self.retried}
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="crm-outbox")
+            logger.info(f"CRM outbox worker started (concurrency={self.concurrency})")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                jobs = await self.claim()
+            except Exception as e:
+                logger.warning(f"CRM outbox: claim failed: {e}")
+                jobs = []
+            if not jobs:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            try:
+                await self.process(jobs)
+            except Exception:
+                # Unfinished jobs keep their lease and are picked up again when it expires
+                logger.exception("CRM outbox: processing a batch failed")
+                await asyncio.sleep(self.poll_interval)
+
+    async def claim(self) -> List[Dict[str, Any]]:
+        """Lease up to ``batch_size`` due jobs (expired leases count as due)."""
+        now = datetime.utcnow()
+        due = or_(
+            and_(CrmOutbox.status == "pending", CrmOutbox.next_attempt_at <= now),
+            and_(CrmOutbox.status == "sending", CrmOutbox.locked_until < now),
+        )
+        async with AsyncSessionLocal() as session:
+            ids = (
+                await session.execute(
+                    select(CrmOutbox.id).where(due).order_by(CrmOutbox.id).limit(self.batch_size)
+                )
+            ).scalars().all()
+            if not ids:
+                return []
+            result = await session.execute(
+                update(CrmOutbox)
+                .where(CrmOutbox.id.in_(ids), due)
+                .values(
+                    status="sending",
+                    locked_until=now + timedelta(seconds=self.lease),
+                    updated_at=now,
+                )
+                .returning(CrmOutbox.id, CrmOutbox.kind, CrmOutbox.ref_id, CrmOutbox.payload, CrmOutbox.attempts)
+                .execution_options(synchronize_session=False)
+            )
+            jobs = [dict(row._mapping) for row in result]
+            await session.commit()
+        return jobs
+
+    async def process(self, jobs: List[Dict[str, Any]]) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(job: Dict[str, Any]) -> None:
+            async with semaphore:
+                await self._deliver(job)
+
+        results = await asyncio.gather(*(deliver(job) for job in jobs), return_exceptions=True)
+        for job, result in zip(jobs, results):
+            if isinstance(result, Exception):
+                # E.g. the retry could not be recorded: the lease runs out and the job is retried
+                logger.error(f"CRM outbox: {job['kind']}:{job['ref_id']} failed: {result!r}", exc_info=result)
+
+    async def _deliver(self, job: Dict[str, Any]) -> None:
+        try:
+            external_id = await self.sender(self.branch_id, json.loads(job["payload"]))
+        except Exception as e:
+            await self._record_failure(job, e)
+            return
+        # Created in the CRM: from here on a failure must not count as a failed send.
+        # If the job stays leased it is sent again after the lease, so retry the write.
+        for attempt in range(FINISH_ATTEMPTS):
+            try:
+                await self._finish(job, status="done", ref_status="synced", external_id=external_id)
+                break
+            except Exception:
+                if attempt + 1 == FINISH_ATTEMPTS:
+                    logger.exception(
+                        f"CRM outbox: {job['kind']}:{job['ref_id']} was created in the CRM "
+                        f"(id {external_id}) but could not be marked done; it may be sent again"
+                    )
+                    return
+                await asyncio.sleep(2.0 ** attempt)
+        self.synced += 1
+
+    async def _record_failure(self, job: Dict[str, Any], error: Exception) -> None:
+        attempts = job["attempts"] + 1
+        if attempts >= self.max_attempts:
+            logger.error(f"CRM outbox: {job['kind']}:{job['ref_id']} failed permanently: {error}")
+            await self._finish(job, status="failed", ref_status="failed", attempts=attempts, error=error)
+            self.failed += 1
+            return
+        delay = min(self.base_backoff * (2 ** (attempts - 1)), self.max_backoff)
+        logger.warning(f"CRM outbox: {job['kind']}:{job['ref_id']} attempt {attempts} failed ({error}), retry in {delay:.0f}s")
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(CrmOutbox)
+                .where(CrmOutbox.id == job["id"])
+                .values(
+                    status="pending",
+                    attempts=attempts,
+                    next_attempt_at=now + timedelta(seconds=delay),
+                    locked_until=None,
+                    last_error=str(error)[:1000],
+                    updated_at=now,
+                )
+            )
+            await session.commit()
+        self.retried += 1
+
+    async def _finish(
+        self,
+        job: Dict[str, Any],
+        *,
+        status: str,
+        ref_status: str,
+        external_id: Optional[int] = None,
+        attempts: Optional[int] = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        now = datetime.utcnow()
+        model = KIND_MODELS[job["kind"]]
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(CrmOutbox)
+                .where(CrmOutbox.id == job["id"])
+                .values(
+                    status=status,
+                    attempts=attempts if attempts is not None else job["attempts"] + 1,
+                    external_id=external_id,
+                    locked_until=None,
+                    last_error=str(error)[:1000] if error else None,
+                    updated_at=now,
+                )
+            )
+            await session.execute(
+                update(model).where(model.id == job["ref_id"]).values(status=ref_status)
+            )
+            await session.commit()
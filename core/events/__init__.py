@@ -1,3 +1,4 @@
-from core.events.tracker import track
+from core.events.migrate import LegacyEventMigrator, legacy_events
+from core.events.tracker import event_writer, track
 
-__all__ = ["track"]
+__all__ = ["LegacyEventMigrator", "event_writer", "legacy_events", "track"]
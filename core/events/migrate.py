@@ -0,0 +1,98 @@
+"""Online move of the legacy ``events`` table into ``event_log``.
+
+Rows are moved oldest first, a small batch per transaction: the batch is
+inserted into ``event_log`` with its original ids and deleted from
+``events`` in the same commit, so every event is in exactly one of the two
+tables at any time and an interrupted run simply continues. Short
+transactions with a pause between them leave room for the bot's own
+writes, so this runs in the background while the bot keeps serving.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, select
+
+from core.events.schema import legacy_row, with_name_ids
+from models import AsyncSessionLocal, Event, EventRecord
+
+logger = logging.getLogger(__name__)
+
+
+class LegacyEventMigrator:
+    def __init__(self, batch_size: int = 2000, pause: float = 0.2) -> None:
+        self.batch_size = max(1, batch_size)
+        self.pause = max(0.0, pause)
+        self._task: Optional[asyncio.Task] = None
+        self.moved = 0
+
+    async def remaining(self) -> int:
+        async with AsyncSessionLocal() as session:
+            return await session.scalar(select(func.count()).select_from(Event))
+
+    async def move_batch(self) -> int:
+        """Move the oldest ``batch_size`` legacy rows; returns how many moved."""
+        async with AsyncSessionLocal() as session:
+            # Core statements: ORM bulk inserts cost several times more per row
+            result = await session.execute(select(Event.__table__).order_by(Event.id).limit(self.batch_size))
+            legacy = result.all()
+            if not legacy:
+                return 0
+            rows = await with_name_ids(legacy_row(event) for event in legacy)
+            await session.execute(EventRecord.__table__.insert(), rows)
+            await session.execute(delete(Event.__table__).where(Event.id <= legacy[-1].id))
+            await session.commit()
+        self.moved += len(legacy)
+        return len(legacy)
+
+    async def run(self) -> int:
+        """Move everything; returns the number of rows moved by this call."""
+        moved = 0
+        while True:
+            n = await self.move_batch()
+            if not n:
+                return moved
+            moved += n
+            if self.pause:
+                await asyncio.sleep(self.pause)
+
+    # ------------------------------------------------------------------
+    # Background task
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        if not await self.remaining():
+            return
+        self._task = asyncio.create_task(self._run(), name="legacy-events")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        logger.info(f"Moving {await self.remaining()} legacy events into event_log")
+        try:
+            moved = await self.run()
+        except asyncio.CancelledError:
+            logger.info(f"Legacy events: stopped after {self.moved} rows, will continue on next start")
+            raise
+        except Exception as e:
+            logger.error(f"Legacy events: move failed after {self.moved} rows: {e}", exc_info=True)
+            return
+        logger.info(f"Legacy events: done, {moved} rows moved")
+
+    def stats(self) -> Dict[str, int]:
+        return {"moved": self.moved, "running": int(self._task is not None and not self._task.done())}
+
+
+legacy_events = LegacyEventMigrator()
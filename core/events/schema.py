@@ -0,0 +1,145 @@
+"""Row layout of ``event_log`` and the interned event-name table.
+
+Hot analytics fields live in their own columns: ``ts`` is Unix seconds,
+the event name is a small integer id into ``event_names`` and
+``game_id``/``session_id``/``score`` are promoted out of ``meta``. Whatever
+is left of ``meta`` is stored as JSON, or NULL when nothing is left.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import AsyncSessionLocal, EventName
+
+logger = logging.getLogger(__name__)
+
+# Kept elsewhere already (game_results.raw_payload)
+DROPPED_FIELDS = ("raw_payload",)
+
+
+def _as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def split_meta(meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Typed columns plus the leftover ``meta`` JSON for an event_log row."""
+    rest = dict(meta or {})
+    game_id = rest.pop("game_id", None)
+    session_id = rest.pop("session_id", None)
+    score = _as_int(rest.get("score"))
+    if score is not None:
+        rest.pop("score")
+    for field in DROPPED_FIELDS:
+        rest.pop(field, None)
+    return {
+        "game_id": str(game_id) if game_id is not None else None,
+        "session_id": str(session_id)[:36] if session_id is not None else None,
+        "score": score,
+        "meta": json.dumps(rest, ensure_ascii=False) if rest else None,
+    }
+
+
+def event_row(
+    event_name: str,
+    tg_id: int,
+    tenant_id: str,
+    bot_id: str,
+    meta: Optional[Dict[str, Any]] = None,
+    ts: Optional[int] = None,
+) -> Dict[str, Any]:
+    """A row for ``event_log``; ``event_name`` is swapped for ``name_id`` on write."""
+    return {
+        "ts": ts if ts is not None else int(datetime.now(timezone.utc).timestamp()),
+        "tenant_id": tenant_id,
+        "bot_id": bot_id,
+        "tg_id": tg_id,
+        "event_name": event_name,
+        **split_meta(meta),
+    }
+
+
+def legacy_row(row: Any) -> Dict[str, Any]:
+    """Convert a row of the legacy ``events`` table (ISO ts, JSON meta)."""
+    try:
+        meta = json.loads(row.meta) if row.meta else None
+    except ValueError:
+        meta = {"legacy_meta": row.meta}
+    if meta is not None and not isinstance(meta, dict):
+        meta = {"legacy_meta": meta}
+    try:
+        dt = datetime.fromisoformat(row.ts)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        ts = int(dt.timestamp())
+    except (TypeError, ValueError):
+        logger.warning(f"Legacy event #{row.id}: unreadable ts {row.ts!r}, stored as 0")
+        ts = 0
+    return {
+        "id": row.id,
+        **event_row(row.event_name, _as_int(row.tg_id) or 0, row.tenant_id, row.bot_id, meta, ts=ts),
+    }
+
+
+class EventNames:
+    """Process-wide cache of ``event_names`` ids.
+
+    Unknown names are looked up (and inserted if needed) in their own
+    committed transaction, so a cached id always refers to a stored row
+    even if the batch that needed it is later rolled back.
+    """
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+
+    async def resolve(self, names: Iterable[str]) -> Dict[str, int]:
+        wanted = set(names)
+        missing = wanted - self._ids.keys()
+        if missing:
+            async with AsyncSessionLocal() as session:
+                await self._load(session, missing)
+                missing -= self._ids.keys()
+                if missing:
+                    await session.execute(self._insert_stmt(session), [{"name": name} for name in sorted(missing)])
+                    await session.commit()
+                    await self._load(session, missing)
+        return {name: self._ids[name] for name in wanted}
+
+    @staticmethod
+    def _insert_stmt(session: AsyncSession) -> Any:
+        dialect = session.bind.dialect.name
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            return insert(EventName)
+        # Another worker process may be adding the same name right now
+        return dialect_insert(EventName).on_conflict_do_nothing(index_elements=[EventName.name])
+
+    async def _load(self, session: AsyncSession, names: Iterable[str]) -> None:
+        result = await session.execute(select(EventName.name, EventName.id).where(EventName.name.in_(list(names))))
+        self._ids.update({name: id_ for name, id_ in result.all()})
+
+
+event_names = EventNames()
+
+
+async def with_name_ids(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rows ready for ``insert(EventRecord)``: ``event_name`` replaced by ``name_id``."""
+    rows = list(rows)
+    ids = await event_names.resolve({row["event_name"] for row in rows})
+    out = []
+    for row in rows:
+        row = dict(row)
+        row["name_id"] = ids[row.pop("event_name")]
+        out.append(row)
+    return out
@@ -1,35 +1,40 @@
 from __future__ import annotations
 
-import json
 import logging
-import os
-from datetime import datetime, timezone
 
-from models import AsyncSessionLocal, Event
+from config import get_settings
+from core.events.schema import event_row, with_name_ids
+from core.events.writer import EventWriter
+from models import AsyncSessionLocal, EventRecord
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
-_BOT_ID = os.getenv("BOT_ID", "tsar_bot")
-_TENANT_ID = os.getenv("TENANT_ID", "myking")
+event_writer = EventWriter(
+    batch_size=settings.events_batch_size,
+    flush_interval=settings.events_flush_interval,
+    max_queue=settings.events_queue_size,
+    overflow=settings.events_overflow,
+)
 
 
 async def track(event_name: str, tg_id: int, meta: dict | None = None) -> None:
     """Track an analytic event.
 
+    ``game_id``, ``session_id`` and ``score`` in ``meta`` go to their own
+    columns (see core.events.schema). While ``event_writer`` is running the
+    event is only buffered and written later in a batch; otherwise
+    (scripts, tests) it is committed right away.
     Safe: catches exceptions and logs warnings to avoid breaking the bot.
     """
     try:
-        meta_json = json.dumps(meta, ensure_ascii=False) if meta else None
-        event = Event(
-            ts=datetime.now(timezone.utc).isoformat(),
-            tenant_id=_TENANT_ID,
-            bot_id=_BOT_ID,
-            tg_id=str(tg_id),
-            event_name=event_name,
-            meta=meta_json,
-        )
+        row = event_row(event_name, int(tg_id), settings.tenant_id, settings.bot_id, meta)
+        if event_writer.running:
+            event_writer.submit(row)
+            return
+        rows = await with_name_ids([row])
         async with AsyncSessionLocal() as session:
-            session.add(event)
+            await session.execute(EventRecord.__table__.insert(), rows)
             await session.commit()
     except Exception as e:
         logger.warning(f"Failed to track event '{event_name}': {e}", exc_info=True)
@@ -0,0 +1,166 @@
+"""Buffered, batched writer for analytic events.
+
+Handlers call ``track()`` which only appends a row to an in-memory buffer.
+A background task drains the buffer with one multi-row INSERT per batch,
+so analytics never add a commit (and an fsync) to the user's reply path.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from core.events.schema import with_name_ids
+from core.metrics import EVENT_FLUSH_SECONDS
+from models import AsyncSessionLocal, EventRecord
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+
+class EventWriter:
+    """In-process queue that groups events into batched INSERTs.
+
+    A batch is flushed when ``batch_size`` rows are pending or
+    ``flush_interval`` seconds have passed, whichever comes first, and once
+    more on ``stop()``. The buffer holds at most ``max_queue`` rows; when it
+    is full the ``overflow`` policy decides whether the oldest buffered row
+    or the new one is dropped.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        overflow: str = "drop_oldest",
+    ) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.01, flush_interval)
+        self.max_queue = max(self.batch_size, max_queue)
+        self.overflow = overflow
+
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        # Counters
+        self.submitted = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """Buffer one event row. Never blocks; returns False if the row was dropped."""
+        self.submitted += 1
+        if len(self._buffer) >= self.max_queue:
+            self.dropped += 1
+            if self.overflow == "drop_newest":
+                return False
+            self._buffer.popleft()
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._buffer),
+            "submitted": self.submitted,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="event-writer")
+        logger.info(
+            "Event writer started (batch=%s, interval=%ss, queue=%s, overflow=%s)",
+            self.batch_size, self.flush_interval, self.max_queue, self.overflow,
+        )
+
+    async def stop(self) -> None:
+        """Stop the background task and flush everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._buffer:
+            if not await self.flush():
+                logger.warning("Event writer: %s events lost on shutdown", len(self._buffer))
+                self.dropped += len(self._buffer)
+                self._buffer.clear()
+                break
+        logger.info("Event writer stopped: %s", self.stats())
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._buffer:
+                if not await self.flush():
+                    break
+                if len(self._buffer) < self.batch_size:
+                    break
+
+    async def flush(self) -> bool:
+        """Write up to one batch. Returns False if the INSERT failed."""
+        async with self._flush_lock:
+            if not self._buffer:
+                return True
+            batch: List[Dict[str, Any]] = []
+            while self._buffer and len(batch) < self.batch_size:
+                batch.append(self._buffer.popleft())
+            started = time.perf_counter()
+            try:
+                rows = await with_name_ids(batch)
+                async with AsyncSessionLocal() as session:
+                    await session.execute(EventRecord.__table__.insert(), rows)
+                    await session.commit()
+            except Exception as e:
+                EVENT_FLUSH_SECONDS.observe(time.perf_counter() - started, "error")
+                self.failed += 1
+                logger.warning(f"Event writer: failed to flush {len(batch)} events: {e}")
+                # Put the batch back in front so a transient lock does not lose it
+                room = self.max_queue - len(self._buffer)
+                if room < len(batch):
+                    self.dropped += len(batch) - room
+                    batch = batch[:room]
+                self._buffer.extendleft(reversed(batch))
+                return False
+            EVENT_FLUSH_SECONDS.observe(time.perf_counter() - started, "ok")
+            self.flushed += len(batch)
+            self.batches += 1
+            return True
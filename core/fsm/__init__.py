@@ -0,0 +1,3 @@
+from core.fsm.storage import SQLAlchemyStorage
+
+__all__ = ["SQLAlchemyStorage"]
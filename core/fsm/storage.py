@@ -0,0 +1,253 @@
+"""FSM storage in the bot's own database.
+
+Form progress (``LeadStates``, ``B2bStates``, ``BillStates``) survives
+restarts and is visible to every worker process. Reads are served from an
+LRU cache (including "no state", which is what almost every update asks
+for); writes update the cache at once and are flushed to ``fsm_states`` in
+batches every ``flush_interval`` seconds. Forms untouched for ``ttl``
+seconds expire and are swept from the table.
+
+With several processes and no routing by user, set ``flush_interval`` and
+``cache_ttl`` to 0: every write is committed immediately and every read
+goes to the DB.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import delete, insert
+
+from models import AsyncSessionLocal, FsmState
+
+logger = logging.getLogger(__name__)
+
+# Keep IN (...) lists well under SQLite's bound parameter limit
+_CHUNK = 500
+
+
+@dataclass
+class _Entry:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    expires_at: Optional[datetime] = None
+    loaded_at: float = 0.0
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+class SQLAlchemyStorage(BaseStorage):
+    def __init__(
+        self,
+        ttl: float = 86400.0,
+        flush_interval: float = 1.0,
+        cache_size: int = 10000,
+        cache_ttl: float = 300.0,
+        sweep_interval: float = 600.0,
+    ) -> None:
+        self.ttl = timedelta(seconds=ttl)
+        self.flush_interval = max(0.0, flush_interval)
+        self.cache_size = max(1, cache_size)
+        self.cache_ttl = max(0.0, cache_ttl)
+        self.sweep_interval = sweep_interval
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # key -> snapshot waiting for the next flush (None = delete the row)
+        self._dirty: Dict[str, Optional[Tuple[Optional[str], Dict[str, Any], datetime]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.flushed = 0
+        self.expired = 0
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+        if key.thread_id:
+            parts.append(str(key.thread_id))
+        if key.business_connection_id:
+            parts.append(key.business_connection_id)
+        if key.destiny != "default":
+            parts.append(key.destiny)
+        return ":".join(parts)
+
+    # ------------------------------------------------------------------
+    # BaseStorage
+    # ------------------------------------------------------------------
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self._key(key)
+        entry = await self._entry(k)
+        entry.state = state.state if isinstance(state, State) else state
+        await self._changed(k, entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._entry(self._key(key))).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        k = self._key(key)
+        entry = await self._entry(k)
+        entry.data = data.copy()
+        await self._changed(k, entry)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._entry(self._key(key))).data.copy()
+
+    async def close(self) -> None:
+        await self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "dirty": len(self._dirty),
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushed": self.flushed,
+            "expired": self.expired,
+        }
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    async def _entry(self, k: str) -> _Entry:
+        now = datetime.utcnow()
+        entry = self._entries.get(k)
+        if entry is not None and (k in self._dirty or time.monotonic() - entry.loaded_at <= self.cache_ttl):
+            self.hits += 1
+            self._entries.move_to_end(k)
+        elif k in self._dirty:
+            # Evicted before its write was flushed: the snapshot is newest
+            snapshot = self._dirty[k]
+            entry = _Entry(loaded_at=time.monotonic())
+            if snapshot is not None:
+                entry.state, entry.data, entry.expires_at = snapshot[0], snapshot[1].copy(), snapshot[2]
+            self._put(k, entry)
+        else:
+            self.misses += 1
+            entry = await self._load(k)
+            self._put(k, entry)
+        if entry.expires_at is not None and entry.expires_at < now and not entry.empty:
+            # Abandoned form: start over
+            entry.state, entry.data, entry.expires_at = None, {}, None
+            self.expired += 1
+        return entry
+
+    def _put(self, k: str, entry: _Entry) -> None:
+        self._entries[k] = entry
+        self._entries.move_to_end(k)
+        while len(self._entries) > self.cache_size:
+            # Pending writes live in _dirty, so eviction never loses one
+            self._entries.popitem(last=False)
+
+    async def _load(self, k: str) -> _Entry:
+        async with AsyncSessionLocal() as session:
+            row = await session.get(FsmState, k)
+        if row is None:
+            return _Entry(loaded_at=time.monotonic())
+        try:
+            data = json.loads(row.data) if row.data else {}
+        except ValueError:
+            logger.warning(f"FSM storage: bad data for {k}, resetting")
+            data = {}
+        return _Entry(state=row.state, data=data, expires_at=row.expires_at, loaded_at=time.monotonic())
+
+    async def _changed(self, k: str, entry: _Entry) -> None:
+        if entry.empty:
+            entry.expires_at = None
+            self._dirty[k] = None
+        else:
+            entry.expires_at = datetime.utcnow() + self.ttl
+            self._dirty[k] = (entry.state, entry.data.copy(), entry.expires_at)
+        entry.loaded_at = time.monotonic()
+        if not self.flush_interval or self._task is None:
+            await self.flush()
+
+    # ------------------------------------------------------------------
+    # Write-behind
+    # ------------------------------------------------------------------
+
+    async def flush(self) -> int:
+        """Write all pending changes: one DELETE + one multi-row INSERT per chunk."""
+        if not self._dirty:
+            return 0
+        pending = self._dirty
+        self._dirty = {}
+        now = datetime.utcnow()
+        keys = list(pending)
+        rows: List[Dict[str, Any]] = []
+        for k, snapshot in pending.items():
+            if snapshot is None:
+                continue
+            state, data, expires_at = snapshot
+            try:
+                payload = json.dumps(data, ensure_ascii=False) if data else None
+            except (TypeError, ValueError) as e:
+                logger.warning(f"FSM storage: data for {k} is not JSON-serializable, not persisted: {e}")
+                continue
+            rows.append({"key": k, "state": state, "data": payload, "updated_at": now, "expires_at": expires_at})
+        try:
+            async with AsyncSessionLocal() as session:
+                for i in range(0, len(keys), _CHUNK):
+                    await session.execute(delete(FsmState).where(FsmState.key.in_(keys[i:i + _CHUNK])))
+                if rows:
+                    await session.execute(insert(FsmState), rows)
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"FSM storage: failed to flush {len(keys)} states: {e}")
+            # Keep newer values that arrived while we were writing
+            for k, snapshot in pending.items():
+                self._dirty.setdefault(k, snapshot)
+            return 0
+        self.flushed += len(keys)
+        return len(keys)
+
+    async def sweep(self) -> int:
+        """Delete expired forms from the table."""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                delete(FsmState).where(FsmState.expires_at < now).execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        return result.rowcount or 0
+
+    async def start(self) -> None:
+        if self.flush_interval and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run(), name="fsm-storage-flush")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        last_sweep = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - last_sweep >= self.sweep_interval:
+                    last_sweep = time.monotonic()
+                    removed = await self.sweep()
+                    if removed:
+                        logger.info(f"FSM storage: swept {removed} expired states")
+            except Exception as e:
+                logger.warning(f"FSM storage: background pass failed: {e}")
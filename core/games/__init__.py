@@ -0,0 +1,18 @@
+from core.games.catalog import GameCatalog, catalog
+from core.games.leaderboard import Leaderboard, leaderboard
+from core.games.results import get_user_bests, record_result, record_results
+from core.games.sessions import GameSessions, OpenSession, SessionError, game_sessions
+
+__all__ = [
+    "GameCatalog",
+    "GameSessions",
+    "Leaderboard",
+    "catalog",
+    "OpenSession",
+    "SessionError",
+    "game_sessions",
+    "get_user_bests",
+    "leaderboard",
+    "record_result",
+    "record_results",
+]
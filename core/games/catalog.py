@@ -0,0 +1,144 @@
+"""Game catalog loaded from games.json.
+
+The file is parsed once and kept as an id → game index together with a
+prebuilt "choose a game" keyboard. It is re-read only when its mtime
+changes (checked at most every ``check_interval`` seconds), so menu taps
+never touch the disk or the JSON parser.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from config import get_settings
+from core.keyboards import markups
+
+logger = logging.getLogger(__name__)
+
+# Project root = three levels up from this file (core/games/catalog.py → root)
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+class GameCatalog:
+    def __init__(
+        self,
+        path: Path | str = _PROJECT_ROOT / "games.json",
+        game_paths: Optional[Dict[str, str]] = None,
+        check_interval: float = 2.0,
+    ) -> None:
+        self.path = Path(path)
+        self.game_paths = game_paths or {}
+        self.check_interval = check_interval
+
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._games: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._enabled: List[Dict[str, Any]] = []
+        self._keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+
+    # ------------------------------------------------------------------
+    # Read API
+    # ------------------------------------------------------------------
+
+    @property
+    def games(self) -> List[Dict[str, Any]]:
+        """All games from games.json, in file order."""
+        self.refresh()
+        return self._games
+
+    @property
+    def enabled(self) -> List[Dict[str, Any]]:
+        """Enabled games that have a launch path configured."""
+        self.refresh()
+        return self._enabled
+
+    @property
+    def keyboard(self) -> InlineKeyboardMarkup:
+        """Prebuilt inline keyboard with one button per enabled game."""
+        self.refresh()
+        return self._keyboard
+
+    def get(self, game_id: str) -> Optional[Dict[str, Any]]:
+        self.refresh()
+        return self._by_id.get(game_id)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def refresh(self, force: bool = False) -> None:
+        """Reload games.json if its mtime changed since the last load."""
+        now = time.monotonic()
+        if not force and self._mtime is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            if self._mtime is None:
+                logger.warning(f"Game catalog: cannot stat {self.path}: {e}")
+                self._mtime = 0.0
+            return
+        if not force and mtime == self._mtime:
+            return
+        self._load(mtime)
+
+    def _load(self, mtime: float) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                games = json.load(f)
+            if not isinstance(games, list):
+                raise ValueError(f"expected a JSON list, got {type(games).__name__}")
+        except Exception as e:
+            # Keep serving the last good catalog
+            logger.error(f"Game catalog: failed to load {self.path}: {e}")
+            self._mtime = mtime
+            return
+
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for game in games:
+            if not isinstance(game, dict) or "id" not in game:
+                logger.warning(f"Game catalog: skipping entry without id: {game!r}")
+                continue
+            if game["id"] in by_id:
+                logger.warning(f"Game catalog: duplicate game id {game['id']!r}, keeping the first one")
+                continue
+            by_id[game["id"]] = game
+
+        enabled = [g for g in by_id.values() if g.get("enabled")]
+        self._validate(enabled)
+        enabled = [g for g in enabled if g["id"] in self.game_paths]
+
+        self._games = list(by_id.values())
+        self._by_id = by_id
+        self._enabled = enabled
+        markups.discard(self._keyboard)
+        self._keyboard = markups.intern(
+            InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [InlineKeyboardButton(text=g["name"], callback_data=f"game_{g['id']}")]
+                    for g in enabled
+                ]
+            )
+        )
+        self._mtime = mtime
+        logger.info(f"Game catalog loaded: {len(by_id)} games, {len(enabled)} playable")
+
+    def _validate(self, enabled: List[Dict[str, Any]]) -> None:
+        """Cross-check enabled games against Settings.game_paths."""
+        for game in enabled:
+            game_path = self.game_paths.get(game["id"])
+            if not game_path:
+                logger.warning(f"Game catalog: {game['id']!r} is enabled but has no path in game_paths, hiding it")
+            elif not (_PROJECT_ROOT / game_path).is_file():
+                logger.warning(f"Game catalog: {game['id']!r} path not found locally: {game_path}")
+
+
+catalog = GameCatalog(game_paths=get_settings().game_paths)
@@ -0,0 +1,170 @@
+"""In-memory leaderboards.
+
+Each game keeps its players' best scores in a list sorted by
+``(-score, user_id)``, so top-N is a slice and a rank is one bisect —
+no ``COUNT(*) WHERE score > ?`` per request. The global board ranks
+players by the sum of their per-game bests. Boards are warmed from
+``user_game_best`` at startup and updated as results are recorded.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from models import AsyncSessionLocal, User, UserGameBest
+
+logger = logging.getLogger(__name__)
+
+GLOBAL = "*"
+
+
+class RankedBoard:
+    """Best score per user, ordered highest first."""
+
+    __slots__ = ("_scores", "_order")
+
+    def __init__(self) -> None:
+        self._scores: Dict[int, int] = {}
+        self._order: List[Tuple[int, int]] = []
+
+    @classmethod
+    def from_scores(cls, scores: Dict[int, int]) -> "RankedBoard":
+        board = cls()
+        board._scores = scores
+        board._order = sorted((-score, user_id) for user_id, score in scores.items())
+        return board
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def set(self, user_id: int, score: int) -> None:
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            i = bisect_left(self._order, (-old, user_id))
+            del self._order[i]
+        self._scores[user_id] = score
+        insort(self._order, (-score, user_id))
+
+    def offer(self, user_id: int, score: int) -> bool:
+        """Keep ``score`` only if it beats the user's current best."""
+        old = self._scores.get(user_id)
+        if old is not None and old >= score:
+            return False
+        self.set(user_id, score)
+        return True
+
+    def score(self, user_id: int) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based place; players with equal scores share a place."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        # user ids are positive, so (-score, -1) sorts before every tie
+        return bisect_left(self._order, (-score, -1)) + 1
+
+    def top(self, n: int) -> List[Tuple[int, int]]:
+        return [(user_id, -neg) for neg, user_id in self._order[:n]]
+
+
+class Leaderboard:
+    def __init__(self) -> None:
+        self._boards: Dict[str, RankedBoard] = {}
+        self._global = RankedBoard()
+        self._names: Dict[int, str] = {}
+        self.warmed = False
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def board(self, game_id: str) -> RankedBoard:
+        if game_id == GLOBAL:
+            return self._global
+        board = self._boards.get(game_id)
+        if board is None:
+            board = self._boards[game_id] = RankedBoard()
+        return board
+
+    def record(self, user_id: int, game_id: str, score: int, username: Optional[str] = None) -> None:
+        """Fold a new result in; cheap no-op unless it is a personal best."""
+        if username:
+            self._names[user_id] = username
+        board = self.board(game_id)
+        old = board.score(user_id) or 0
+        if board.offer(user_id, score):
+            total = (self._global.score(user_id) or 0) + score - old
+            self._global.set(user_id, total)
+
+    def top(self, game_id: str = GLOBAL, n: int = 10) -> List[Tuple[int, int]]:
+        board = self._boards.get(game_id) if game_id != GLOBAL else self._global
+        return board.top(n) if board is not None else []
+
+    def rank(self, user_id: int, game_id: str = GLOBAL) -> Optional[Tuple[int, int]]:
+        """(place, number of players) or None if the user has no score."""
+        board = self._boards.get(game_id) if game_id != GLOBAL else self._global
+        if board is None:
+            return None
+        place = board.rank(user_id)
+        return (place, len(board)) if place is not None else None
+
+    def display_name(self, user_id: int) -> str:
+        name = self._names.get(user_id)
+        return name if name else f"Игрок #{str(user_id)[-4:]}"
+
+    async def warm(self) -> None:
+        """Rebuild all boards from user_game_best."""
+        scores: Dict[str, Dict[int, int]] = {}
+        totals: Dict[int, int] = {}
+        names: Dict[int, str] = {}
+        async with AsyncSessionLocal() as session:
+            stream = await session.stream(
+                select(UserGameBest.tg_user_id, UserGameBest.game_id, UserGameBest.best_score)
+            )
+            async for user_id, game_id, best in stream:
+                scores.setdefault(game_id, {})[user_id] = best
+                totals[user_id] = totals.get(user_id, 0) + best
+
+            stream = await session.stream(
+                select(User.id, User.username).where(
+                    User.id.in_(select(UserGameBest.tg_user_id).distinct()),
+                    User.username.is_not(None),
+                )
+            )
+            async for user_id, username in stream:
+                names[user_id] = username
+
+        self._boards = {game_id: RankedBoard.from_scores(s) for game_id, s in scores.items()}
+        self._global = RankedBoard.from_scores(totals)
+        self._names = names
+        self.warmed = True
+        logger.info(f"Leaderboard warmed: {len(self._boards)} games, {len(totals)} players")
+
+    async def start_refresh(self, interval: float) -> None:
+        """Re-warm periodically; used when other processes record results too."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop(interval), name="leaderboard-refresh")
+
+    async def stop_refresh(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.warm()
+            except Exception as e:
+                logger.warning(f"Leaderboard refresh failed: {e}")
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,186 @@
+"""Storage path for finished games.
+
+Every result is written to ``game_results`` and folded into the
+``user_game_best`` aggregate in one transaction, so "🏆 Мой результат" can
+read one row per game instead of scanning the user's whole history.
+A result claimed from a game session (core.games.sessions) carries its
+``session_id``; the unique index on it turns a duplicate into ``None``.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import case, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.games.leaderboard import leaderboard
+from core.games.sessions import OpenSession, game_sessions
+from models import AsyncSessionLocal, GameResult, GameSession, UserGameBest
+
+
+def _dialect_insert(dialect_name: str) -> Any:
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+async def _upsert_best(
+    session: AsyncSession, tg_user_id: int, game_id: str, score: int, played_at: datetime
+) -> None:
+    insert = _dialect_insert(session.bind.dialect.name)
+    if insert is None:
+        best = await session.get(UserGameBest, (tg_user_id, game_id))
+        if best is None:
+            session.add(UserGameBest(
+                tg_user_id=tg_user_id,
+                game_id=game_id,
+                best_score=score,
+                attempts=1,
+                last_played_at=played_at,
+            ))
+        else:
+            best.best_score = max(best.best_score, score)
+            best.attempts += 1
+            best.last_played_at = played_at
+        return
+
+    stmt = insert(UserGameBest).values(
+        tg_user_id=tg_user_id,
+        game_id=game_id,
+        best_score=score,
+        attempts=1,
+        last_played_at=played_at,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserGameBest.tg_user_id, UserGameBest.game_id],
+        set_={
+            "best_score": case(
+                (stmt.excluded.best_score > UserGameBest.best_score, stmt.excluded.best_score),
+                else_=UserGameBest.best_score,
+            ),
+            "attempts": UserGameBest.attempts + 1,
+            "last_played_at": stmt.excluded.last_played_at,
+        },
+    )
+    await session.execute(stmt)
+
+
+def _result_row(
+    tg_user_id: int,
+    game_id: str,
+    score: int,
+    raw_payload: Optional[str],
+    session: Optional[OpenSession],
+    now: datetime,
+) -> GameResult:
+    return GameResult(
+        tg_user_id=tg_user_id,
+        game_id=game_id,
+        score=score,
+        raw_payload=raw_payload,
+        created_at=now,
+        session_id=session.id if session else None,
+        duration_sec=session.duration_sec if session else None,
+    )
+
+
+async def _finish_sessions(session: AsyncSession, game_sessions: List[OpenSession]) -> None:
+    for game_session in game_sessions:
+        await session.execute(
+            update(GameSession)
+            .where(GameSession.id == game_session.id)
+            .values(finished_at=game_session.finished_at)
+        )
+
+
+async def record_result(
+    tg_user_id: int,
+    game_id: str,
+    score: int,
+    raw_payload: Optional[str] = None,
+    username: Optional[str] = None,
+    session: Optional[OpenSession] = None,
+) -> Optional[GameResult]:
+    """Insert a game result, update the user's best score and the leaderboard.
+
+    Returns None if ``session`` already has a result (nothing is written).
+    """
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        result_row = _result_row(tg_user_id, game_id, score, raw_payload, session, now)
+        db.add(result_row)
+        try:
+            # Flush first: a duplicate session must not count as an attempt
+            await db.flush()
+        except IntegrityError:
+            await db.rollback()
+            if session is not None:
+                # Stored by someone else: finished all the same
+                game_sessions.finish(session)
+            return None
+        await _upsert_best(db, tg_user_id, game_id, score, now)
+        if session is not None:
+            await _finish_sessions(db, [session])
+        await db.commit()
+    if session is not None:
+        game_sessions.finish(session)
+    leaderboard.record(tg_user_id, game_id, score, username)
+    return result_row
+
+
+async def record_results(
+    tg_user_id: int,
+    results: List[Tuple[str, int, Optional[str], Optional[OpenSession]]],
+    username: Optional[str] = None,
+) -> List[bool]:
+    """Batch form of :func:`record_result`: (game_id, score, raw_payload, session) rows.
+
+    One commit for the whole batch; if a session turns out to have a result
+    already, the rows are stored one by one instead. Returns, per row,
+    whether it was stored.
+    """
+    if not results:
+        return []
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            _result_row(tg_user_id, game_id, score, raw_payload, session, now)
+            for game_id, score, raw_payload, session in results
+        ])
+        try:
+            await db.flush()
+        except IntegrityError:
+            await db.rollback()
+            return [
+                await record_result(tg_user_id, game_id, score, raw_payload, username, session) is not None
+                for game_id, score, raw_payload, session in results
+            ]
+        for game_id, score, _, _ in results:
+            await _upsert_best(db, tg_user_id, game_id, score, now)
+        await _finish_sessions(db, [session for *_, session in results if session is not None])
+        await db.commit()
+    for game_id, score, _, session in results:
+        if session is not None:
+            game_sessions.finish(session)
+        leaderboard.record(tg_user_id, game_id, score, username)
+    return [True] * len(results)
+
+
+async def get_user_bests(tg_user_id: int, limit: Optional[int] = None) -> List[UserGameBest]:
+    """Best score per game for one user, highest first."""
+    async with AsyncSessionLocal() as session:
+        stmt = (
+            select(UserGameBest)
+            .where(UserGameBest.tg_user_id == tg_user_id)
+            .order_by(UserGameBest.best_score.desc(), UserGameBest.last_played_at.desc())
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
@@ -0,0 +1,224 @@
+"""Registry of game sessions handed out with "🎮 Запустить игру" buttons.
+
+Every button carries a fresh ``sessionid`` bound to one user and one game.
+A result is accepted only for a session the bot opened, by the same user,
+within ``ttl`` seconds, and only once: replayed or forged payloads and
+double taps are rejected instead of piling up in ``game_results``.
+
+Open sessions are kept in memory (dict lookup by id, plus the latest
+session per user for games whose ``sendData`` payload has no
+``sessionid``) and in the ``game_sessions`` table, so results still match
+after a restart or when another process opened the session. The unique
+``game_results.session_id`` index is the final guard across processes.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+
+from config import get_settings
+from models import AsyncSessionLocal, GameSession
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OpenSession:
+    id: str
+    tg_user_id: int
+    game_id: str
+    # Unix seconds
+    opened_at: int
+    finished_at: Optional[int] = None
+
+    @property
+    def duration_sec(self) -> Optional[int]:
+        if self.finished_at is None:
+            return None
+        return max(0, self.finished_at - self.opened_at)
+
+
+class SessionError(ValueError):
+    """A result that does not match an open session.
+
+    ``reason`` is one of ``unknown``, ``expired``, ``finished``, ``wrong_game``.
+    """
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class GameSessions:
+    def __init__(self, ttl: float = 86400.0, max_size: int = 100000, purge_interval: float = 3600.0) -> None:
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self.purge_interval = max(1.0, purge_interval)
+
+        # Oldest first: eviction pops from the front
+        self._sessions: "OrderedDict[str, OpenSession]" = OrderedDict()
+        self._latest: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.opened = 0
+        self.accepted = 0
+        self.rejected: Dict[str, int] = {}
+        self.evictions = 0
+        self.purged = 0
+
+    # ------------------------------------------------------------------
+    # Opening
+    # ------------------------------------------------------------------
+
+    async def open(self, tg_user_id: int, game_id: str) -> OpenSession:
+        session = OpenSession(str(uuid.uuid4()), tg_user_id, game_id, int(time.time()))
+        self._remember(session)
+        self.opened += 1
+        try:
+            async with AsyncSessionLocal() as db:
+                db.add(GameSession(
+                    id=session.id,
+                    tg_user_id=tg_user_id,
+                    game_id=game_id,
+                    opened_at=session.opened_at,
+                ))
+                await db.commit()
+        except Exception as e:
+            # Still valid in this process until evicted
+            logger.warning(f"Failed to store game session {session.id}: {e}")
+        return session
+
+    def _remember(self, session: OpenSession) -> None:
+        self._sessions[session.id] = session
+        self._latest[session.tg_user_id] = session.id
+        self._evict(time.time())
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_size and now - oldest.opened_at <= self.ttl:
+                return
+            self._sessions.popitem(last=False)
+            if self._latest.get(oldest.tg_user_id) == oldest.id:
+                del self._latest[oldest.tg_user_id]
+            self.evictions += 1
+
+    # ------------------------------------------------------------------
+    # Matching results
+    # ------------------------------------------------------------------
+
+    async def get(self, tg_user_id: int, session_id: Optional[str] = None) -> Optional[OpenSession]:
+        """The user's session (the latest one if ``session_id`` is None), finished or not."""
+        if session_id is None:
+            session_id = self._latest.get(tg_user_id)
+        elif not isinstance(session_id, str):
+            return None
+        session = self._sessions.get(session_id) if session_id is not None else None
+        if session is None:
+            session = await self._load(tg_user_id, session_id)
+        if session is None or session.tg_user_id != tg_user_id:
+            return None
+        return session
+
+    async def claim(
+        self, tg_user_id: int, session_id: Optional[str] = None, game_id: Optional[str] = None
+    ) -> OpenSession:
+        """Check that a result may be stored for a session; raises :class:`SessionError`.
+
+        Without ``session_id`` the user's latest session is used. Returns a
+        copy with ``finished_at`` set; the session itself is marked finished
+        by :meth:`finish` once the result is committed, so a failed write
+        can be retried. Two results racing for one session are settled by
+        the unique ``game_results.session_id`` index.
+        """
+        try:
+            session = await self.get(tg_user_id, session_id)
+            now = int(time.time())
+            if session is None:
+                raise SessionError("unknown")
+            if session.finished_at is not None:
+                raise SessionError("finished")
+            if now - session.opened_at > self.ttl:
+                raise SessionError("expired")
+            if game_id is not None and game_id != session.game_id:
+                raise SessionError("wrong_game")
+        except SessionError as e:
+            self.rejected[e.reason] = self.rejected.get(e.reason, 0) + 1
+            raise
+        self.accepted += 1
+        return replace(session, finished_at=now)
+
+    def finish(self, session: OpenSession) -> None:
+        """Mark the session finished after its result has been stored."""
+        cached = self._sessions.get(session.id)
+        if cached is not None:
+            cached.finished_at = session.finished_at or int(time.time())
+
+    async def _load(self, tg_user_id: int, session_id: Optional[str]) -> Optional[OpenSession]:
+        stmt = select(GameSession)
+        if session_id is not None:
+            stmt = stmt.where(GameSession.id == session_id[:36])
+        else:
+            stmt = stmt.where(GameSession.tg_user_id == tg_user_id).order_by(GameSession.opened_at.desc()).limit(1)
+        async with AsyncSessionLocal() as db:
+            row = await db.scalar(stmt)
+        if row is None:
+            return None
+        return OpenSession(row.id, row.tg_user_id, row.game_id, row.opened_at, row.finished_at)
+
+    # ------------------------------------------------------------------
+    # Cleanup of expired rows
+    # ------------------------------------------------------------------
+
+    async def purge(self) -> int:
+        cutoff = int(time.time() - self.ttl)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(GameSession).where(GameSession.opened_at < cutoff))
+            await db.commit()
+        self._evict(time.time())
+        self.purged += result.rowcount or 0
+        return result.rowcount or 0
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._purge_loop(), name="game-sessions-purge")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _purge_loop(self) -> None:
+        while True:
+            try:
+                n = await self.purge()
+                if n:
+                    logger.info(f"Game sessions: purged {n} expired")
+            except Exception as e:
+                logger.warning(f"Game sessions purge failed: {e}")
+            await asyncio.sleep(self.purge_interval)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "open": len(self._sessions),
+            "opened": self.opened,
+            "accepted": self.accepted,
+            "evictions": self.evictions,
+            "purged": self.purged,
+            **{f"rejected_{reason}": n for reason, n in self.rejected.items()},
+        }
+
+
+game_sessions = GameSessions(ttl=get_settings().game_session_ttl)
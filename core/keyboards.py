@@ -0,0 +1,93 @@
+"""Precomputed keyboard markups.
+
+Reply/inline keyboards are static (or have a couple of variants), yet
+building them means constructing and validating a tree of pydantic models
+and aiogram then dumps that tree to JSON on every send. Keyboards declared
+with ``@markups.cached`` are built once per distinct argument set, and
+``MarkupCachingSession`` sends their JSON from a cache.
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import ReplyKeyboardRemove, TelegramObject
+from aiohttp import FormData
+
+MarkupT = TypeVar("MarkupT", bound=TelegramObject)
+
+
+class MarkupRegistry:
+    def __init__(self) -> None:
+        # Interned markups by id() → serialized JSON (None until first send)
+        self._interned: Dict[int, Tuple[TelegramObject, Optional[str]]] = {}
+
+    def cached(self, builder: Callable[..., MarkupT]) -> Callable[..., MarkupT]:
+        """Memoize a keyboard builder by its (normalized) arguments."""
+        signature = inspect.signature(builder)
+        variants: Dict[Tuple[Any, ...], MarkupT] = {}
+
+        @functools.wraps(builder)
+        def wrapper(*args: Any, **kwargs: Any) -> MarkupT:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments.values())
+            markup = variants.get(key)
+            if markup is None:
+                markup = self.intern(builder(*args, **kwargs))
+                variants[key] = markup
+            return markup
+
+        return wrapper
+
+    def intern(self, markup: MarkupT) -> MarkupT:
+        """Register a prebuilt markup so its JSON is cached on first send."""
+        if id(markup) not in self._interned:
+            self._interned[id(markup)] = (markup, None)
+        return markup
+
+    def discard(self, markup: TelegramObject) -> None:
+        self._interned.pop(id(markup), None)
+
+    def serialized(self, markup: Any) -> Optional[str]:
+        """Cached JSON for an interned markup, None for anything else."""
+        entry = self._interned.get(id(markup))
+        if entry is None or entry[0] is not markup:
+            return None
+        if entry[1] is None:
+            # Same shape aiogram's prepare_value produces: None fields dropped
+            dumped = json.dumps(markup.model_dump(exclude_none=True, warnings=False))
+            entry = (markup, dumped)
+            self._interned[id(markup)] = entry
+        return entry[1]
+
+    def __len__(self) -> int:
+        return len(self._interned)
+
+
+markups = MarkupRegistry()
+
+
+class MarkupCachingSession(AiohttpSession):
+    """aiohttp session that reuses cached JSON for interned reply markups."""
+
+    def build_form_data(self, bot: Bot, method: TelegramMethod[Any]) -> FormData:
+        markup = getattr(method, "reply_markup", None)
+        cached = markups.serialized(markup) if markup is not None else None
+        if cached is None:
+            return super().build_form_data(bot=bot, method=method)
+        form = super().build_form_data(
+            bot=bot, method=method.model_copy(update={"reply_markup": None})
+        )
+        form.add_field("reply_markup", cached)
+        return form
+
+
+@markups.cached
+def remove_keyboard() -> ReplyKeyboardRemove:
+    return ReplyKeyboardRemove()
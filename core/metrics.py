@@ -0,0 +1,310 @@
+"""Latency histograms and counters in the Prometheus text format.
+
+No client library: a histogram is a list of bucket counts per label set,
+so observing costs a bisect and two additions. ``registry.register(app)``
+serves everything at ``/metrics``, together with the ``stats()`` counters
+of the bot's components (added with ``registry.collector``).
+
+What is measured:
+
+- ``bot_update_seconds`` — one update end to end, by update type
+- ``bot_handler_seconds`` — the matched handler, by router and handler name
+- ``bot_telegram_request_seconds`` — Bot API calls, by method
+- ``bot_db_query_seconds``, ``bot_db_connection_seconds``, ``bot_db_commits_total``
+  — statements, how long a session holds its connection, commits
+- ``bot_event_flush_seconds`` — batched event-log INSERTs
+
+In the multi-process mode every worker ships ``registry.collect()`` with
+its metrics report and the supervisor serves them with a ``worker`` label.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject, Update
+from aiogram.types.update import UpdateTypeLookupError
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+DB_OPERATIONS = ("select", "insert", "update", "delete")
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name, type, help, [(name with suffix, labels, value), ...]
+Family = Tuple[str, str, str, List[Tuple[str, Dict[str, str], float]]]
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def family(self) -> Family:
+        samples = [(self.name, dict(zip(self.labelnames, labels)), value) for labels, value in self._values.items()]
+        return self.name, "counter", self.help, samples
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def family(self) -> Family:
+        samples = []
+        for labels, series in self._series.items():
+            base = dict(zip(self.labelnames, labels))
+            total = 0
+            for bound, n in zip(self.buckets, series):
+                total += n
+                samples.append((self.name + "_bucket", {**base, "le": repr(bound)}, total))
+            total += series[len(self.buckets)]
+            samples.append((self.name + "_bucket", {**base, "le": "+Inf"}, total))
+            samples.append((self.name + "_sum", base, series[-1]))
+            samples.append((self.name + "_count", base, total))
+        return self.name, "histogram", self.help, samples
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(families: Iterable[Family]) -> str:
+    lines = []
+    for name, kind, help_text, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample, labels, value in samples:
+            if labels:
+                label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+                lines.append(f"{sample}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{sample} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def merge(labelled: Iterable[Tuple[Dict[str, str], Iterable[Family]]]) -> List[Family]:
+    """Families from several processes, each sample tagged with its process labels."""
+    merged: Dict[str, Family] = {}
+    for extra, families in labelled:
+        for name, kind, help_text, samples in families:
+            family = merged.setdefault(name, (name, kind, help_text, []))
+            family[3].extend((sample, {**extra, **labels}, value) for sample, labels, value in samples)
+    return list(merged.values())
+
+
+class Registry:
+    def __init__(self, prefix: str = "bot") -> None:
+        self.prefix = prefix
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), **kwargs: Any) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, labelnames, **kwargs))
+
+    def collector(self, component: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """Export the numeric values of ``stats()`` as ``<prefix>_<component>_<key>``."""
+        self._collectors[component] = stats
+
+    def collect(self) -> List[Family]:
+        families = [metric.family() for metric in self._metrics.values()]
+        for component, stats in self._collectors.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Metrics: {component}.stats() failed: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    name = f"{self.prefix}_{component}_{key}"
+                    families.append((name, "untyped", f"{component} {key}", [(name, {}, value)]))
+        return families
+
+    def register(
+        self,
+        app: web.Application,
+        path: str = "/metrics",
+        extra: Optional[Callable[[], Iterable[Tuple[Dict[str, str], Iterable[Family]]]]] = None,
+    ) -> None:
+        """Serve ``/metrics``; ``extra`` adds labelled families of other processes."""
+        async def handle(request: web.Request) -> web.Response:
+            families = self.collect()
+            if extra is not None:
+                families = merge([({}, families), *extra()])
+            return web.Response(text=render(families), content_type="text/plain", charset="utf-8",
+                                headers={"Cache-Control": "no-store"})
+
+        app.router.add_get(path, handle)
+
+
+registry = Registry()
+
+UPDATE_SECONDS = registry.histogram(
+    "bot_update_seconds", "Time to process one update, throttling included", ["type", "result"]
+)
+HANDLER_SECONDS = registry.histogram("bot_handler_seconds", "Time spent in the matched handler", ["router", "handler"])
+HANDLER_ERRORS = registry.counter("bot_handler_errors_total", "Handlers that raised", ["router", "handler"])
+TELEGRAM_SECONDS = registry.histogram("bot_telegram_request_seconds", "Bot API calls", ["method", "status"])
+DB_QUERY_SECONDS = registry.histogram("bot_db_query_seconds", "SQL statements", ["op"])
+DB_CONNECTION_SECONDS = registry.histogram(
+    "bot_db_connection_seconds", "How long a DB session holds its pooled connection"
+)
+DB_COMMITS = registry.counter("bot_db_commits_total", "DB transactions committed")
+EVENT_FLUSH_SECONDS = registry.histogram("bot_event_flush_seconds", "Batched event-log INSERTs", ["status"])
+
+
+# ----------------------------------------------------------------------
+# aiogram
+# ----------------------------------------------------------------------
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer ``dp.update`` middleware: one update, end to end."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            kind = event.event_type if isinstance(event, Update) else type(event).__name__
+        except UpdateTypeLookupError:
+            # Newer than this aiogram: the Dispatcher warns and skips it
+            kind = "unknown"
+        started = time.perf_counter()
+        result = "error"
+        try:
+            response = await handler(event, data)
+            result = "unhandled" if response is UNHANDLED else "ok"
+            return response
+        finally:
+            UPDATE_SECONDS.observe(time.perf_counter() - started, kind, result)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: runs only around the handler that matched."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        router = data.get("event_router")
+        handler_object = data.get("handler")
+        labels = (
+            router.name if router is not None else "",
+            getattr(handler_object.callback, "__name__", "?") if handler_object is not None else "?",
+        )
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(*labels)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, *labels)
+
+
+def instrument_dispatcher(dp: Dispatcher) -> None:
+    """Register before other outer middlewares so their time is counted too."""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_metrics = HandlerMetricsMiddleware()
+    for name, observer in dp.observers.items():
+        if name != "update":
+            # Inner middlewares of the dispatcher wrap handlers of every included router
+            observer.middleware(handler_metrics)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod) -> Any:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await make_request(bot, method)
+            status = "ok"
+            return response
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - started, type(method).__name__, status)
+
+
+def instrument_bot(bot: Bot) -> None:
+    bot.session.middleware(TelegramMetricsMiddleware())
+
+
+# ----------------------------------------------------------------------
+# SQLAlchemy
+# ----------------------------------------------------------------------
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    # The start time lives on the statement's execution context: a statement
+    # that fails never reaches after_cursor_execute and leaves nothing behind
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            op = statement.lstrip()[:6].lower()
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, op if op in DB_OPERATIONS else "other")
+
+    @event.listens_for(sync_engine, "commit")
+    def _commit(conn) -> None:
+        DB_COMMITS.inc()
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def _checkout(dbapi_connection, record, proxy) -> None:
+        record.info["metrics_checkout"] = time.perf_counter()
+
+    @event.listens_for(sync_engine.pool, "checkin")
+    def _checkin(dbapi_connection, record) -> None:
+        started = record.info.pop("metrics_checkout", None)
+        if started is not None:
+            DB_CONNECTION_SECONDS.observe(time.perf_counter() - started)
@@ -1,30 +1,230 @@
-"""Admin notification utility."""
+"""Admin notifications.
+
+Handlers hand notifications to :data:`notifier` and return right away; one
+worker per admin chat sends them under the shared Telegram rate limiter,
+waits out ``RetryAfter`` and retries transient errors. When a burst piles up
+(e.g. sign-ups after a school event) the pending messages for a chat are
+merged into digest messages instead of being sent one by one.
+"""
 from __future__ import annotations
 
+import asyncio
+import itertools
 import logging
-import os
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+    TelegramUnauthorizedError,
+)
+
+from config import get_settings
+from core.ratelimit import TelegramRateLimiter, telegram_limiter
 
 logger = logging.getLogger(__name__)
 
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
 
-async def notify_admin(bot: Bot, text: str) -> None:
-    """Send a message to the admin's Telegram account.
+# Telegram rejects messages longer than 4096 characters
+MESSAGE_LIMIT = 4096
+_DIGEST_SEPARATOR = "\n\n— — —\n\n"
 
-    Reads ADMIN_TG_ID from env. Safe: catches all exceptions.
-    """
-    admin_id_str = os.getenv("ADMIN_TG_ID", "0")
-    try:
-        admin_id = int(admin_id_str)
-    except ValueError:
-        admin_id = 0
+# (priority, sequence number, text); the sequence keeps FIFO order per priority
+_Item = Tuple[int, int, str]
 
-    if not admin_id:
-        logger.warning("notify_admin: ADMIN_TG_ID is not set or is 0, skipping notification")
-        return
 
+class NotificationDispatcher:
+    def __init__(
+        self,
+        recipients: Sequence[int],
+        limiter: TelegramRateLimiter,
+        digest_threshold: int = 5,
+        max_attempts: int = 5,
+        drain_timeout: float = 10.0,
+    ) -> None:
+        self.recipients = list(recipients)
+        self.limiter = limiter
+        self.digest_threshold = max(2, digest_threshold)
+        self.max_attempts = max(1, max_attempts)
+        self.drain_timeout = drain_timeout
+
+        self._bot: Optional[Bot] = None
+        self._queues: Dict[int, asyncio.PriorityQueue] = {}
+        self._workers: List[asyncio.Task] = []
+        self._seq = itertools.count()
+
+        self.submitted = 0
+        self.sent = 0
+        self.digests = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._bot is not None
+
+    def submit(self, text: str, priority: int = PRIORITY_NORMAL) -> None:
+        """Queue ``text`` for every recipient; never blocks."""
+        seq = next(self._seq)
+        for queue in self._queues.values():
+            queue.put_nowait((priority, seq, text))
+        self.submitted += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": sum(q.qsize() for q in self._queues.values()),
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "digests": self.digests,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    async def start(self, bot: Bot) -> None:
+        if self.running:
+            return
+        if not self.recipients:
+            logger.warning("notify: no admin recipients (ADMIN_TG_ID / ADMIN_TG_IDS), notifications are disabled")
+            return
+        self._bot = bot
+        for chat_id in self.recipients:
+            queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+            self._queues[chat_id] = queue
+            self._workers.append(asyncio.create_task(self._worker(chat_id, queue)))
+
+    async def stop(self) -> None:
+        """Give queued notifications a chance to go out, then stop workers."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(q.join() for q in self._queues.values())),
+                timeout=self.drain_timeout,
+            )
+        except asyncio.TimeoutError:
+            left = sum(q.qsize() for q in self._queues.values())
+            logger.warning(f"notify: shutting down with {left} notifications still queued")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
+        self._bot = None
+
+    async def send_now(self, bot: Bot, text: str) -> None:
+        """Deliver immediately, bypassing the queue (used when not started)."""
+        if not self.recipients:
+            logger.warning("notify_admin: ADMIN_TG_ID is not set or is 0, skipping notification")
+            return
+        for chat_id in self.recipients:
+            await self._deliver(bot, chat_id, text)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    async def _worker(self, chat_id: int, queue: asyncio.PriorityQueue) -> None:
+        while True:
+            first = await queue.get()
+            batch = self._take_batch(queue, first)
+            try:
+                if len(batch) == 1:
+                    text = first[2]
+                else:
+                    text = self._digest(batch)
+                    self.digests += 1
+                await self._deliver(self._bot, chat_id, text)
+            except Exception as e:
+                logger.warning(f"notify: worker for {chat_id} failed: {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def _take_batch(self, queue: asyncio.PriorityQueue, first: _Item) -> List[_Item]:
+        """Pull more pending items into a digest when a backlog has built up."""
+        batch = [first]
+        if queue.qsize() + 1 < self.digest_threshold:
+            return batch
+        size = len(self._digest(batch))
+        while not queue.empty():
+            item = queue.get_nowait()
+            extra = len(_DIGEST_SEPARATOR) + len(item[2])
+            if size + extra > MESSAGE_LIMIT:
+                # Does not fit; leave it for the next digest
+                queue.put_nowait(item)
+                queue.task_done()
+                break
+            batch.append(item)
+            size += extra
+        return batch
+
+    @staticmethod
+    def _digest(batch: List[_Item]) -> str:
+        header = f"📬 <b>Сводка уведомлений ({len(batch)})</b>\n\n"
+        return header + _DIGEST_SEPARATOR.join(text for _, _, text in batch)
+
+    async def _deliver(self, bot: Bot, chat_id: int, text: str) -> bool:
+        parse_mode: Optional[str] = "HTML"
+        attempt = 0
+        while True:
+            await self.limiter.acquire(chat_id)
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                self.sent += 1
+                return True
+            except TelegramRetryAfter as e:
+                # Flood control applies to the whole bot, so pause every sender
+                self.limiter.pause(e.retry_after)
+                self.retried += 1
+                logger.warning(f"notify: flood wait {e.retry_after}s for {chat_id}")
+                continue
+            except (TelegramForbiddenError, TelegramUnauthorizedError) as e:
+                logger.warning(f"notify_admin: failed to send message to {chat_id}: {e}")
+                self.failed += 1
+                return False
+            except TelegramBadRequest as e:
+                if parse_mode and "parse entities" in str(e):
+                    # Broken markup must not cost us the notification
+                    parse_mode = None
+                    continue
+                logger.warning(f"notify_admin: failed to send message to {chat_id}: {e}")
+                self.failed += 1
+                return False
+            except Exception as e:
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    logger.warning(f"notify_admin: failed to send message to {chat_id} after {attempt} attempts: {e}")
+                    self.failed += 1
+                    return False
+                self.retried += 1
+                await asyncio.sleep(min(30.0, 2.0 ** attempt))
+
+
+settings = get_settings()
+
+notifier = NotificationDispatcher(
+    recipients=settings.admin_ids,
+    limiter=telegram_limiter,
+    digest_threshold=settings.notify_digest_threshold,
+    max_attempts=settings.notify_max_attempts,
+)
+
+
+async def notify_admin(bot: Bot, text: str, priority: int = PRIORITY_NORMAL) -> None:
+    """Send an HTML message to the admin(s).
+
+    Queued when the dispatcher is running (the handler does not wait for
+    Telegram), delivered inline otherwise. Safe: never raises.
+    """
+    if notifier.running:
+        notifier.submit(text, priority)
+        return
     try:
-        await bot.send_message(chat_id=admin_id, text=text)
+        await notifier.send_now(bot, text)
     except Exception as e:
-        logger.warning(f"notify_admin: failed to send message to {admin_id}: {e}")
+        logger.warning(f"notify_admin: failed to send notification: {e}")
@@ -0,0 +1,130 @@
+"""Token-bucket rate limiting for outgoing Telegram messages.
+
+Telegram allows roughly 30 messages per second per bot overall and about
+one message per second to the same chat; going faster earns a
+``RetryAfter`` flood wait. :class:`TelegramRateLimiter` enforces both
+limits for background senders (admin notifications, broadcasts, reminders)
+so they never trip flood control for the whole bot.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from config import get_settings
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """Seconds until ``cost`` tokens are available (0.0 if they are now)."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def try_acquire(self, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """Take ``cost`` tokens if available.
+
+        Returns 0.0 on success, otherwise the number of seconds until enough
+        tokens will have accumulated (nothing is taken in that case).
+        """
+        wait = self.wait_time(cost, now)
+        if not wait:
+            self.tokens -= cost
+        return wait
+
+    def idle_for(self, now: float) -> float:
+        return now - self.updated
+
+
+class TelegramRateLimiter:
+    """Global + per-chat token buckets shared by background senders.
+
+    With a ``parent`` every message also takes a token from the parent's
+    global bucket: a sender gets its own cap without adding to the bot-wide
+    budget (broadcasts run under ``telegram_limiter`` this way).
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 25.0,
+        per_chat_rate: float = 1.0,
+        per_chat_burst: float = 1.0,
+        idle_ttl: float = 60.0,
+        parent: Optional["TelegramRateLimiter"] = None,
+    ) -> None:
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self.parent = parent
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.idle_ttl = idle_ttl
+        self._chats: Dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        self._last_sweep = time.monotonic()
+
+    def pause(self, seconds: float) -> None:
+        """Stop all sending for ``seconds`` (after a RetryAfter flood wait)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        if self.parent is not None:
+            self.parent.pause(seconds)
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst, now)
+        if now - self._last_sweep > self.idle_ttl:
+            self._sweep(now)
+        return bucket
+
+    def _sweep(self, now: float) -> None:
+        self._last_sweep = now
+        idle = [cid for cid, b in self._chats.items() if b.idle_for(now) > self.idle_ttl]
+        for cid in idle:
+            del self._chats[cid]
+
+    async def acquire(self, chat_id: Optional[int] = None) -> None:
+        """Wait until one message may be sent (to ``chat_id`` if given)."""
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            chat = self._chat_bucket(chat_id, now) if chat_id is not None else None
+            # Take from both buckets together or from neither
+            wait = max(self._global.wait_time(now=now), chat.wait_time(now=now) if chat else 0.0)
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            self._global.tokens -= 1
+            if chat is not None:
+                chat.tokens -= 1
+            if self.parent is not None:
+                await self.parent.acquire()
+            return
+
+
+settings = get_settings()
+
+# Shared by every background sender so together they stay under the limits
+telegram_limiter = TelegramRateLimiter(
+    global_rate=settings.tg_global_rate,
+    per_chat_rate=settings.tg_per_chat_rate,
+)
@@ -1 +1,9 @@
-from core.reminders.service import process_due_reminders, enable_reminder
+from core.reminders.scheduler import ReminderScheduler
+from core.reminders.service import (
+    enable_reminder,
+    list_due_reminders,
+    process_due_reminders,
+    reminder_scheduler,
+)
+
+__all__ = ["ReminderScheduler", "enable_reminder", "list_due_reminders", "process_due_reminders", "reminder_scheduler"]
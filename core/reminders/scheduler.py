@@ -0,0 +1,248 @@
+"""Background reminder delivery.
+
+The scheduler sleeps until the earliest ``next_remind_at`` (or until
+:meth:`ReminderScheduler.notify` says a reminder was added), then claims a
+batch of due reminders with one ``UPDATE ... RETURNING`` that also pushes
+their due time forward by a lease — a crash mid-send just lets them come
+due again. Messages go out through the shared Telegram rate limiter;
+one-shot reminders are disabled afterwards and recurring ones
+(``mode="repeat:<days>"``) are moved to the next date, both in bulk.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from sqlalchemy import and_, func, select, update
+
+from core.events import track
+from core.ratelimit import TelegramRateLimiter
+from models import AsyncSessionLocal, Reminder
+
+logger = logging.getLogger(__name__)
+
+REMINDER_TEXT = (
+    "👋 Давно не виделись!\n\n"
+    "Загляните в бот: новые игры, рейтинг и запись на пробное занятие ждут вас."
+)
+
+REPEAT_PREFIX = "repeat:"
+
+
+def iso(dt: datetime) -> str:
+    """Fixed-width ISO string, so reminders compare correctly as text."""
+    return dt.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def repeat_interval(mode: Optional[str]) -> Optional[timedelta]:
+    """``repeat:<days>`` → timedelta; anything else is a one-shot reminder."""
+    if mode and mode.startswith(REPEAT_PREFIX):
+        days = mode[len(REPEAT_PREFIX):]
+        if days.isdigit() and int(days) > 0:
+            return timedelta(days=int(days))
+    return None
+
+
+class ReminderScheduler:
+    def __init__(
+        self,
+        limiter: TelegramRateLimiter,
+        *,
+        tenant_id: str,
+        bot_id: str,
+        batch_size: int = 100,
+        concurrency: int = 8,
+        lease: float = 600.0,
+        max_sleep: float = 300.0,
+    ) -> None:
+        self.limiter = limiter
+        self.tenant_id = tenant_id
+        self.bot_id = bot_id
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.lease = lease
+        # Upper bound on a sleep, to pick up rows written by other processes
+        self.max_sleep = max_sleep
+
+        self._bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+        self.sent = 0
+        self.blocked = 0
+        self.failed = 0
+
+    def notify(self) -> None:
+        """Re-check the next due time (a reminder was added or moved)."""
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {"sent": self.sent, "blocked": self.blocked, "failed": self.failed}
+
+    async def start(self, bot: Bot) -> None:
+        if self._task is None or self._task.done():
+            self._bot = bot
+            self._task = asyncio.create_task(self._run(), name="reminders")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def due_clause(self, now_s: str):
+        return and_(
+            Reminder.tenant_id == self.tenant_id,
+            Reminder.bot_id == self.bot_id,
+            Reminder.enabled == 1,
+            Reminder.next_remind_at <= now_s,
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once(self._bot)
+                if claimed >= self.batch_size:
+                    continue
+                delay = await self._seconds_until_next()
+            except Exception as e:
+                logger.warning(f"Reminders: scheduler pass failed: {e}")
+                delay = 30.0
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _seconds_until_next(self) -> float:
+        async with AsyncSessionLocal() as session:
+            next_at = await session.scalar(
+                select(func.min(Reminder.next_remind_at)).where(
+                    Reminder.tenant_id == self.tenant_id,
+                    Reminder.bot_id == self.bot_id,
+                    Reminder.enabled == 1,
+                )
+            )
+        if next_at is None:
+            return self.max_sleep
+        try:
+            due = datetime.fromisoformat(next_at)
+        except ValueError:
+            return 0.0
+        if due.tzinfo is None:
+            due = due.replace(tzinfo=timezone.utc)
+        delay = (due - datetime.now(timezone.utc)).total_seconds()
+        return min(max(delay, 0.0), self.max_sleep)
+
+    async def claim(self, now: datetime) -> List[Dict[str, Any]]:
+        """Lease up to ``batch_size`` due reminders in one statement."""
+        now_s = iso(now)
+        due = self.due_clause(now_s)
+        ids = (
+            select(Reminder.id)
+            .where(due)
+            .order_by(Reminder.next_remind_at)
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(Reminder)
+                .where(Reminder.id.in_(ids), due)
+                .values(next_remind_at=iso(now + timedelta(seconds=self.lease)), updated_at=now_s)
+                .returning(Reminder.id, Reminder.tg_id, Reminder.mode)
+                .execution_options(synchronize_session=False)
+            )
+            rows = [dict(row._mapping) for row in result]
+            await session.commit()
+        return rows
+
+    async def run_once(self, bot: Bot) -> int:
+        """Claim and deliver one batch; returns the number claimed."""
+        now = datetime.now(timezone.utc)
+        rows = await self.claim(now)
+        if not rows:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        outcomes: Dict[int, str] = {}
+
+        async def deliver(row: Dict[str, Any]) -> None:
+            async with semaphore:
+                outcomes[row["id"]] = await self._send(bot, row["tg_id"])
+
+        await asyncio.gather(*(deliver(row) for row in rows))
+        await self._finish(rows, outcomes)
+
+        for row in rows:
+            outcome = outcomes[row["id"]]
+            if outcome == "sent":
+                await track("reminder.sent", row["tg_id"], {"mode": row["mode"], "reminder_id": row["id"]})
+        return len(rows)
+
+    async def _send(self, bot: Bot, chat_id: int) -> str:
+        attempt = 0
+        while True:
+            await self.limiter.acquire(chat_id)
+            try:
+                await bot.send_message(chat_id=chat_id, text=REMINDER_TEXT)
+                self.sent += 1
+                return "sent"
+            except TelegramRetryAfter as e:
+                self.limiter.pause(e.retry_after)
+                logger.warning(f"Reminders: flood wait {e.retry_after}s")
+            except TelegramForbiddenError:
+                self.blocked += 1
+                return "blocked"
+            except TelegramBadRequest as e:
+                logger.info(f"Reminders: cannot send to {chat_id}: {e}")
+                self.failed += 1
+                return "failed"
+            except Exception as e:
+                attempt += 1
+                if attempt >= 3:
+                    # Lease stays in place: the reminder comes due again later
+                    logger.warning(f"Reminders: send to {chat_id} failed: {e}")
+                    self.failed += 1
+                    return "retry"
+                await asyncio.sleep(2.0 ** attempt)
+
+    async def _finish(self, rows: List[Dict[str, Any]], outcomes: Dict[int, str]) -> None:
+        now = datetime.now(timezone.utc)
+        now_s = iso(now)
+        done: List[int] = []
+        rescheduled: List[Dict[str, Any]] = []
+        for row in rows:
+            outcome = outcomes[row["id"]]
+            if outcome == "retry":
+                continue
+            interval = repeat_interval(row["mode"])
+            if interval is not None and outcome == "sent":
+                rescheduled.append({"id": row["id"], "next_remind_at": iso(now + interval), "updated_at": now_s})
+            else:
+                # One-shot reminders, users who blocked the bot, dead chats
+                done.append(row["id"])
+
+        async with AsyncSessionLocal() as session:
+            if done:
+                await session.execute(
+                    update(Reminder)
+                    .where(Reminder.id.in_(done))
+                    .values(enabled=0, updated_at=now_s)
+                    .execution_options(synchronize_session=False)
+                )
+            if rescheduled:
+                # ORM bulk UPDATE by primary key → one executemany
+                await session.execute(update(Reminder), rescheduled)
+            await session.commit()
@@ -0,0 +1,171 @@
+"""Per-user throttling of incoming updates.
+
+``ThrottlingMiddleware`` is an outer middleware on ``dp.update``: it runs
+before any filter or handler, so an update from a flooding user costs one
+dict lookup and a token-bucket check instead of handler work, DB round
+trips and Telegram sends. Each user gets a :class:`TokenBucket`; an update
+takes tokens by its kind (a game result is dearer than a menu tap). When
+the bucket is empty the update is dropped and the user is told to slow
+down at most once per ``notice_interval``. A callback query repeating the
+previous one (same button, same message) within ``duplicate_window`` is a
+double tap and is dropped without a word. Idle users are swept out.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import TelegramObject, Update
+
+from config import get_settings
+from core.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Tokens per update kind (see ThrottlingMiddleware.kind)
+DEFAULT_COSTS: Dict[str, float] = {
+    "message": 1.0,
+    "command": 1.0,
+    "callback": 1.0,
+    "web_app_data": 3.0,
+    "other": 1.0,
+}
+
+NOTICE_TEXT = "⏳ Слишком часто. Подожди пару секунд 🙂"
+
+
+class _UserState:
+    __slots__ = ("bucket", "callback_key", "callback_at", "noticed_at")
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.bucket = bucket
+        self.callback_key: Optional[tuple] = None
+        self.callback_at = 0.0
+        self.noticed_at = 0.0
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: float = 5.0,
+        costs: Optional[Dict[str, float]] = None,
+        duplicate_window: float = 1.0,
+        notice_interval: float = 10.0,
+        idle_ttl: float = 300.0,
+        exempt: Iterable[int] = (),
+    ) -> None:
+        self.rate = rate
+        self.costs = {**DEFAULT_COSTS, **(costs or {})}
+        # A bucket smaller than an update's cost would drop that kind forever
+        self.burst = max(1.0, burst, *self.costs.values())
+        if self.burst > burst:
+            logger.warning(f"Throttling: burst {burst} is below the largest update cost, using {self.burst}")
+        self.duplicate_window = duplicate_window
+        self.notice_interval = notice_interval
+        self.idle_ttl = idle_ttl
+        self.exempt = set(exempt)
+        self._users: Dict[int, _UserState] = {}
+        self._last_sweep = time.monotonic()
+
+        # Counters
+        self.passed = 0
+        self.throttled: Dict[str, int] = {}
+        self.duplicates = 0
+        self.notices = 0
+        self.evictions = 0
+
+    @staticmethod
+    def kind(update: Update) -> str:
+        if update.message is not None:
+            if update.message.web_app_data is not None:
+                return "web_app_data"
+            if (update.message.text or "").startswith("/"):
+                return "command"
+            return "message"
+        if update.callback_query is not None:
+            return "callback"
+        return "other"
+
+    def _state(self, user_id: int, now: float) -> _UserState:
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserState(TokenBucket(self.rate, self.burst, now))
+        if now - self._last_sweep > self.idle_ttl:
+            self._sweep(now)
+        return state
+
+    def _sweep(self, now: float) -> None:
+        self._last_sweep = now
+        # A bucket idle this long has refilled anyway: dropping it loses nothing
+        idle = [uid for uid, s in self._users.items()
+                if s.bucket.idle_for(now) > self.idle_ttl and now - s.callback_at > self.idle_ttl]
+        for uid in idle:
+            del self._users[uid]
+        self.evictions += len(idle)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if not isinstance(event, Update) or user is None or user.id in self.exempt:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        state = self._state(user.id, now)
+        kind = self.kind(event)
+
+        if kind == "callback":
+            query = event.callback_query
+            key = (query.data, query.message.message_id if query.message else query.inline_message_id)
+            if key == state.callback_key and now - state.callback_at < self.duplicate_window:
+                self.duplicates += 1
+                return None
+            state.callback_key = key
+            state.callback_at = now
+
+        if state.bucket.try_acquire(self.costs.get(kind, 1.0), now):
+            self.throttled[kind] = self.throttled.get(kind, 0) + 1
+            if now - state.noticed_at >= self.notice_interval:
+                state.noticed_at = now
+                await self._notice(data.get("bot"), event)
+            return None
+
+        self.passed += 1
+        return await handler(event, data)
+
+    async def _notice(self, bot: Optional[Bot], update: Update) -> None:
+        if bot is None:
+            return
+        self.notices += 1
+        try:
+            if update.callback_query is not None:
+                await bot.answer_callback_query(update.callback_query.id, NOTICE_TEXT)
+            elif update.message is not None:
+                await bot.send_message(update.message.chat.id, NOTICE_TEXT)
+        except Exception as e:
+            logger.warning(f"Throttling notice failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._users),
+            "passed": self.passed,
+            "duplicates": self.duplicates,
+            "notices": self.notices,
+            "evictions": self.evictions,
+            **{f"throttled_{kind}": n for kind, n in self.throttled.items()},
+        }
+
+
+settings = get_settings()
+
+throttling = ThrottlingMiddleware(
+    rate=settings.throttle_rate,
+    burst=settings.throttle_burst,
+    exempt=[*settings.admin_ids, settings.admin_tg_id],
+)
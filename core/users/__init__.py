@@ -0,0 +1,4 @@
+from core.users.cache import CachedUser, UserCache
+from core.users.service import touch_user, user_cache
+
+__all__ = ["CachedUser", "UserCache", "touch_user", "user_cache"]
@@ -0,0 +1,214 @@
+"""In-memory user cache with write-coalesced activity updates.
+
+Almost every handler needs the user's ``phone`` (known vs guest menu) and
+refreshes ``last_seen_at``. Instead of a SELECT + UPDATE + commit per
+message, users are kept in an LRU cache with a TTL and activity timestamps
+are written back in one bulk UPDATE every ``flush_interval`` seconds.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import update
+
+from models import AsyncSessionLocal, User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedUser:
+    id: int
+    username: Optional[str]
+    phone: Optional[str]
+    first_seen_at: Optional[datetime]
+    last_seen_at: Optional[datetime]
+    loaded_at: float = 0.0
+
+
+class UserCache:
+    """LRU + TTL cache of ``users`` rows.
+
+    Entries older than ``ttl`` seconds are re-read from the DB on next access;
+    at most ``max_size`` users are kept. Pending ``last_seen_at``/``username``
+    changes live in a separate dirty map, so evicting an entry never loses a
+    write.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 600.0, flush_interval: float = 30.0) -> None:
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.flush_interval = max(0.1, flush_interval)
+
+        self._entries: "OrderedDict[int, CachedUser]" = OrderedDict()
+        self._dirty: Dict[int, Dict[str, object]] = {}
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushed = 0
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    async def touch(self, tg_user_id: int, username: Optional[str] = None) -> CachedUser:
+        """Return the user, creating it if needed, and record activity.
+
+        Same contract as ``models.get_or_create_user`` but the activity
+        update is deferred to the next bulk flush.
+        """
+        now = datetime.utcnow()
+        entry = self._get_fresh(tg_user_id)
+        if entry is None:
+            self.misses += 1
+            entry = await self._load(tg_user_id, username, now)
+        else:
+            self.hits += 1
+
+        entry.last_seen_at = now
+        if username:
+            entry.username = username
+        self._dirty[tg_user_id] = {
+            "id": tg_user_id,
+            "last_seen_at": now,
+            "username": entry.username,
+        }
+        return entry
+
+    def get(self, tg_user_id: int) -> Optional[CachedUser]:
+        """Cached entry without touching the DB (None if absent or expired)."""
+        return self._get_fresh(tg_user_id)
+
+    def set_phone(self, tg_user_id: int, phone: Optional[str]) -> None:
+        """Reflect a phone number that was just committed to the DB."""
+        entry = self._entries.get(tg_user_id)
+        if entry is not None:
+            entry.phone = phone
+
+    def invalidate(self, tg_user_id: int) -> None:
+        self._entries.pop(tg_user_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "dirty": len(self._dirty),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "flushed": self.flushed,
+        }
+
+    def _get_fresh(self, tg_user_id: int) -> Optional[CachedUser]:
+        entry = self._entries.get(tg_user_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.loaded_at > self.ttl:
+            del self._entries[tg_user_id]
+            return None
+        self._entries.move_to_end(tg_user_id)
+        return entry
+
+    def _put(self, entry: CachedUser) -> None:
+        self._entries[entry.id] = entry
+        self._entries.move_to_end(entry.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _load(self, tg_user_id: int, username: Optional[str], now: datetime) -> CachedUser:
+        # Concurrent misses for the same user share one DB round trip
+        pending = self._loading.get(tg_user_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[tg_user_id] = future
+        try:
+            entry = await self._fetch_or_create(tg_user_id, username, now)
+            self._put(entry)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unobserved failure is not logged twice
+            future.exception()
+            raise
+        finally:
+            del self._loading[tg_user_id]
+
+    async def _fetch_or_create(self, tg_user_id: int, username: Optional[str], now: datetime) -> CachedUser:
+        async with AsyncSessionLocal() as session:
+            user = await session.get(User, tg_user_id)
+            if user is None:
+                user = User(
+                    id=tg_user_id,
+                    username=username,
+                    first_seen_at=now,
+                    last_seen_at=now,
+                )
+                session.add(user)
+                await session.commit()
+            return CachedUser(
+                id=user.id,
+                username=user.username,
+                phone=user.phone,
+                first_seen_at=user.first_seen_at,
+                last_seen_at=user.last_seen_at,
+                loaded_at=time.monotonic(),
+            )
+
+    # ------------------------------------------------------------------
+    # Write-behind
+    # ------------------------------------------------------------------
+
+    async def flush(self) -> int:
+        """Write all pending activity updates in one bulk UPDATE."""
+        if not self._dirty:
+            return 0
+        rows = list(self._dirty.values())
+        self._dirty = {}
+        try:
+            async with AsyncSessionLocal() as session:
+                # ORM bulk UPDATE by primary key → single executemany
+                await session.execute(update(User), rows)
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"User cache: failed to flush {len(rows)} activity updates: {e}")
+            # Keep newer values that arrived while we were writing
+            for row in rows:
+                self._dirty.setdefault(row["id"], row)
+            return 0
+        self.flushed += len(rows)
+        return len(rows)
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="user-cache-flush")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
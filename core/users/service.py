@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from config import get_settings
+from core.users.cache import CachedUser, UserCache
+
+settings = get_settings()
+
+user_cache = UserCache(
+    max_size=settings.user_cache_size,
+    ttl=settings.user_cache_ttl,
+    flush_interval=settings.user_flush_interval,
+)
+
+
+async def touch_user(tg_user_id: int, username: Optional[str] = None) -> CachedUser:
+    """Cached replacement for ``models.get_or_create_user`` in handlers."""
+    return await user_cache.touch(tg_user_id, username)
@@ -0,0 +1,5 @@
+from core.web.health import HealthCheck, health
+from core.web.results import ResultsAPI
+from core.web.static import Asset, StaticAssets
+
+__all__ = ["Asset", "HealthCheck", "ResultsAPI", "StaticAssets", "health"]
@@ -0,0 +1,80 @@
+"""``/health``: readiness of the database and the bot, not just "the port is open".
+
+Each check is an async callable returning True/False (or raising); all
+run concurrently with a timeout. The response is JSON with one entry per
+check and status 200 when every check passed, 503 otherwise, so a load
+balancer or uptime monitor can act on it. ``/`` stays a plain liveness
+"OK".
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiohttp import web
+from sqlalchemy import text
+
+from models import engine
+
+logger = logging.getLogger(__name__)
+
+Check = Callable[[], Awaitable[bool]]
+
+
+async def database_ready() -> bool:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return True
+
+
+class HealthCheck:
+    def __init__(self, timeout: float = 2.0) -> None:
+        self.timeout = timeout
+        self._checks: Dict[str, Check] = {"db": database_ready}
+        self._flags: Dict[str, bool] = {}
+
+    def add(self, name: str, check: Check) -> None:
+        self._checks[name] = check
+
+    def set(self, name: str, ready: bool) -> None:
+        """A readiness flag flipped by the app itself (e.g. the bot after startup)."""
+        self._flags[name] = ready
+
+    def is_set(self, name: str) -> bool:
+        return self._flags.get(name, False)
+
+    async def _run(self, check: Check) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            ok = bool(await asyncio.wait_for(check(), timeout=self.timeout))
+            error = None
+        except asyncio.TimeoutError:
+            ok, error = False, f"timeout after {self.timeout}s"
+        except Exception as e:
+            ok, error = False, str(e)
+        result: Dict[str, Any] = {"ok": ok, "ms": round((time.perf_counter() - started) * 1000, 1)}
+        if error:
+            result["error"] = error
+        return result
+
+    async def run(self) -> Dict[str, Any]:
+        names = list(self._checks)
+        results = await asyncio.gather(*(self._run(self._checks[name]) for name in names))
+        checks = dict(zip(names, results))
+        checks.update({name: {"ok": ready} for name, ready in self._flags.items()})
+        return {"ok": all(check["ok"] for check in checks.values()), "checks": checks}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        report = await self.run()
+        if not report["ok"]:
+            logger.warning(f"Health check failed: {report['checks']}")
+        return web.json_response(report, status=200 if report["ok"] else 503,
+                                 headers={"Cache-Control": "no-store"})
+
+    def register(self, app: web.Application, path: str = "/health") -> None:
+        app.router.add_get(path, self.handle)
+
+
+health = HealthCheck()
@@ -0,0 +1,247 @@
+"""``POST /api/results``: game results straight from the WebApp.
+
+Games launched from inline ``web_app`` buttons cannot use
+``Telegram.WebApp.sendData``, so they post here instead, with the raw
+``Telegram.WebApp.initData`` string as proof of who is playing. The
+signature is checked with the bot token (aiogram's
+``safe_parse_webapp_init_data``) and ``auth_date`` must be recent; the
+player is taken from initData, never from the body.
+
+Body (JSON)::
+
+    {"initData": "<Telegram.WebApp.initData>",
+     "results": [{"game_id": "vitalik", "sessionid": "<from the URL>", "score": 42}, ...],
+     "events":  [{"name": "level_completed", "sessionid": "...", "level": 3}, ...]}
+
+``initData`` may also come in an ``Authorization: tma <initData>`` header.
+A single result may be sent as the body itself. Every result and event
+must carry the ``sessionid`` the bot put in the game URL; sessions are
+matched through the game session registry (core.games.sessions), so each
+session takes one result. Results are stored through ``record_results``
+(game_results + user_game_best + leaderboard); events are tracked as
+``game.<name>``.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from aiogram.utils.web_app import WebAppInitData, safe_parse_webapp_init_data
+from aiohttp import web
+
+from core.events import track
+from core.games.results import record_results
+from core.games.sessions import OpenSession, SessionError, game_sessions
+from core.users import touch_user
+
+logger = logging.getLogger(__name__)
+
+EVENT_NAME_RE = re.compile(r"^[a-z0-9_.]{1,50}$")
+CORS_HEADERS = "Authorization, Content-Type, X-Telegram-Init-Data"
+
+
+class ResultError(ValueError):
+    pass
+
+
+def _session_id(item: Dict[str, Any]) -> str:
+    session_id = item.get("sessionid") or item.get("session_id")
+    if not isinstance(session_id, str) or not session_id:
+        raise ResultError("sessionid is required")
+    return session_id[:36]
+
+
+def _score(item: Dict[str, Any]) -> int:
+    try:
+        return int(item.get("score"))
+    except (TypeError, ValueError):
+        raise ResultError("score must be an integer")
+
+
+def _claimed_game(item: Dict[str, Any]) -> Optional[str]:
+    game_id = item.get("game_id") or item.get("gameid")
+    return str(game_id) if game_id is not None else None
+
+
+class ResultsAPI:
+    def __init__(
+        self,
+        bot_token: str,
+        *,
+        auth_max_age: int = 86400,
+        max_batch: int = 50,
+        allowed_origins: Iterable[str] = ("*",),
+    ) -> None:
+        self.bot_token = bot_token
+        self.auth_max_age = auth_max_age
+        self.max_batch = max(1, max_batch)
+        self.allowed_origins = {origin.rstrip("/") for origin in allowed_origins if origin}
+
+        self.requests = 0
+        self.unauthorized = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.events = 0
+
+    def register(self, app: web.Application, path: str = "/api/results") -> None:
+        app.router.add_post(path, self.handle)
+        app.router.add_route("OPTIONS", path, self.preflight)
+
+    # ------------------------------------------------------------------
+    # CORS (games may be hosted on another origin, e.g. GitHub Pages)
+    # ------------------------------------------------------------------
+
+    def _cors(self, request: web.Request) -> Dict[str, str]:
+        origin = request.headers.get("Origin")
+        if not origin:
+            return {}
+        if "*" in self.allowed_origins:
+            allowed = "*"
+        elif origin.rstrip("/") in self.allowed_origins:
+            allowed = origin
+        else:
+            return {}
+        return {"Access-Control-Allow-Origin": allowed, "Vary": "Origin"}
+
+    async def preflight(self, request: web.Request) -> web.Response:
+        headers = self._cors(request)
+        if not headers:
+            return web.Response(status=403)
+        headers.update({
+            "Access-Control-Allow-Methods": "POST, OPTIONS",
+            "Access-Control-Allow-Headers": CORS_HEADERS,
+            "Access-Control-Max-Age": "86400",
+        })
+        return web.Response(status=204, headers=headers)
+
+    def _reply(self, request: web.Request, data: Dict[str, Any], status: int = 200) -> web.Response:
+        return web.json_response(data, status=status, headers=self._cors(request))
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def _authorize(self, request: web.Request, body: Dict[str, Any]) -> WebAppInitData:
+        init_data = body.get("initData") or request.headers.get("X-Telegram-Init-Data")
+        auth = request.headers.get("Authorization", "")
+        if not init_data and auth.lower().startswith("tma "):
+            init_data = auth[4:].strip()
+        if not isinstance(init_data, str) or not init_data:
+            raise ResultError("initData is required")
+        try:
+            data = safe_parse_webapp_init_data(self.bot_token, init_data)
+        except ValueError:
+            raise ResultError("initData signature is invalid")
+        if data.user is None:
+            raise ResultError("initData has no user")
+        age = time.time() - data.auth_date.timestamp()
+        if self.auth_max_age and age > self.auth_max_age:
+            raise ResultError("initData is too old")
+        return data
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        try:
+            body = await request.json()
+        except (ValueError, UnicodeDecodeError):
+            return self._reply(request, {"ok": False, "error": "body must be JSON"}, status=400)
+        if not isinstance(body, dict):
+            return self._reply(request, {"ok": False, "error": "body must be a JSON object"}, status=400)
+
+        try:
+            init = self._authorize(request, body)
+        except ResultError as e:
+            self.unauthorized += 1
+            return self._reply(request, {"ok": False, "error": str(e)}, status=401)
+
+        results = body.get("results")
+        if results is None and "score" in body:
+            results = [body]
+        results = results or []
+        events = body.get("events") or []
+        if not isinstance(results, list) or not isinstance(events, list):
+            return self._reply(request, {"ok": False, "error": "results/events must be lists"}, status=400)
+        if len(results) + len(events) > self.max_batch:
+            return self._reply(
+                request, {"ok": False, "error": f"at most {self.max_batch} items per request"}, status=413
+            )
+
+        user = init.user
+        rejected: List[Dict[str, Any]] = []
+
+        accepted: List[Tuple[str, int, Optional[str], Optional[OpenSession]]] = []
+        accepted_index: List[int] = []
+        for index, item in enumerate(results):
+            try:
+                if not isinstance(item, dict):
+                    raise ResultError("item must be an object")
+                score = _score(item)
+                session = await game_sessions.claim(user.id, _session_id(item), _claimed_game(item))
+            except SessionError as e:
+                rejected.append({"index": index, "error": f"session {e.reason}"})
+                continue
+            except ResultError as e:
+                rejected.append({"index": index, "error": str(e)})
+                continue
+            accepted.append((session.game_id, score, json.dumps(item, ensure_ascii=False), session))
+            accepted_index.append(index)
+
+        tracked = 0
+        for index, item in enumerate(events):
+            try:
+                if not isinstance(item, dict):
+                    raise ResultError("item must be an object")
+                name = item.get("name")
+                if not isinstance(name, str) or not EVENT_NAME_RE.match(name):
+                    raise ResultError("event name must match [a-z0-9_.]{1,50}")
+                session = await game_sessions.get(user.id, _session_id(item))
+                if session is None:
+                    raise ResultError("session unknown")
+            except ResultError as e:
+                rejected.append({"index": len(results) + index, "error": str(e)})
+                continue
+            meta = {k: v for k, v in item.items() if k not in ("name", "sessionid", "session_id", "game_id")}
+            await track(f"game.{name}", user.id, {"game_id": session.game_id, "session_id": session.id, **meta})
+            tracked += 1
+
+        stored = 0
+        if accepted:
+            await touch_user(user.id, user.username)
+            written = await record_results(user.id, accepted, username=user.username)
+            for index, (game_id, score, _, session), ok in zip(accepted_index, accepted, written):
+                if not ok:
+                    # Another request stored a result for this session first
+                    rejected.append({"index": index, "error": "session finished"})
+                    continue
+                stored += 1
+                await track("game.finished", user.id, {
+                    "game_id": game_id,
+                    "session_id": session.id,
+                    "score": score,
+                    "duration_sec": session.duration_sec,
+                    "source": "api",
+                })
+        rejected.sort(key=lambda entry: entry["index"])
+        self.accepted += stored
+        self.events += tracked
+        self.rejected += len(rejected)
+        if rejected:
+            logger.info(f"Results API: user {user.id}: {len(rejected)} items rejected: {rejected[:3]}")
+        return self._reply(request, {
+            "ok": not rejected,
+            "accepted": stored,
+            "events": tracked,
+            "rejected": rejected,
+        })
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "unauthorized": self.unauthorized,
+            "accepted": self.accepted,
+            "events": self.events,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,228 @@
+"""Static game files served from an in-memory index.
+
+``StaticAssets`` walks the game directories once at startup, reads each
+file, hashes it for the ETag and keeps gzip (and, if the optional
+``brotli`` package is installed, brotli) variants of compressible files.
+Requests are answered from that index with no filesystem access: the
+best encoding the client accepts, ``Cache-Control``, a content-hashed
+``ETag`` and ``304 Not Modified`` for a matching ``If-None-Match``.
+
+HTML is sent with ``no-cache`` (always revalidated, so a redeploy shows up
+on the next launch for the price of a 304); other assets may be cached for
+``max_age`` seconds. Directory URLs resolve to ``index.html``/``index.htm``
+and are never listed. Audio/video and files above ``memory_limit`` are
+streamed from disk by aiohttp's ``FileResponse``, which handles ``Range``.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import time
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/wasm",
+    "application/xml",
+    "image/svg+xml",
+    "text/css",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+    "text/xml",
+}
+MIN_COMPRESS_SIZE = 256
+INDEX_FILES = ("index.html", "index.htm")
+
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("application/javascript", ".mjs")
+mimetypes.add_type("application/wasm", ".wasm")
+
+
+@dataclass
+class Asset:
+    path: Path
+    content_type: str
+    size: int
+    etag: str
+    last_modified: str
+    # None: streamed from disk
+    body: Optional[bytes] = None
+    # "br" / "gzip" -> compressed body
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+class StaticAssets:
+    def __init__(self, max_age: int = 86400, memory_limit: int = 1024 * 1024) -> None:
+        self.max_age = max(0, max_age)
+        self.memory_limit = memory_limit
+        self._assets: Dict[str, Asset] = {}
+        self._prefixes: List[str] = []
+
+        self.hits = 0
+        self.not_modified = 0
+        self.compressed = 0
+        self.not_found = 0
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def add_directory(self, prefix: str, root: Path) -> int:
+        """Index every file under *root* as ``<prefix><relative path>``."""
+        prefix = "/" + prefix.strip("/") + "/"
+        started = time.monotonic()
+        raw = packed = 0
+        count = 0
+        for path in sorted(root.rglob("*")):
+            if not path.is_file() or any(part.startswith(".") for part in path.relative_to(root).parts):
+                continue
+            asset = self._load(path)
+            self._assets[prefix + path.relative_to(root).as_posix()] = asset
+            count += 1
+            raw += asset.size
+            packed += min([asset.size, *map(len, asset.encoded.values())])
+        if prefix not in self._prefixes:
+            self._prefixes.append(prefix)
+        logger.info(
+            f"Static {prefix}: {count} files, {raw // 1024} KiB -> {packed // 1024} KiB compressed "
+            f"in {time.monotonic() - started:.2f}s (brotli: {'on' if brotli else 'off'})"
+        )
+        return count
+
+    def _load(self, path: Path) -> Asset:
+        stat = path.stat()
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        if content_type.startswith(("audio/", "video/")) or stat.st_size > self.memory_limit:
+            # FileResponse sets its own ETag
+            return Asset(path, content_type, stat.st_size, etag="", last_modified=last_modified)
+        data = path.read_bytes()
+        asset = Asset(
+            path=path,
+            content_type=content_type,
+            size=len(data),
+            etag='"' + hashlib.blake2b(data, digest_size=12).hexdigest() + '"',
+            last_modified=last_modified,
+            body=data,
+        )
+        if content_type in COMPRESSIBLE_TYPES and len(data) >= MIN_COMPRESS_SIZE:
+            variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(data, quality=11)
+            # Keep only variants that actually save bytes
+            asset.encoded = {name: body for name, body in variants.items() if len(body) < len(data) * 0.9}
+        return asset
+
+    def resolve(self, url_path: str) -> Optional[Asset]:
+        asset = self._assets.get(url_path)
+        if asset is not None:
+            return asset
+        base = url_path if url_path.endswith("/") else url_path + "/"
+        for name in INDEX_FILES:
+            asset = self._assets.get(base + name)
+            if asset is not None:
+                return asset
+        return None
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    def register(self, app: web.Application) -> None:
+        for prefix in self._prefixes:
+            # GET routes answer HEAD too
+            app.router.add_get(prefix + "{path:.*}", self.handle)
+
+    def _cache_control(self, asset: Asset) -> str:
+        if asset.content_type == "text/html" or not self.max_age:
+            return "no-cache"
+        return f"public, max-age={self.max_age}"
+
+    def _choose_encoding(self, request: web.Request, asset: Asset) -> Tuple[Optional[str], bytes]:
+        if not asset.encoded:
+            return None, asset.body
+        accepted = _accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        for name in ("br", "gzip"):
+            if name in asset.encoded and accepted.get(name, accepted.get("*", 0.0)) > 0:
+                return name, asset.encoded[name]
+        return None, asset.body
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        asset = self.resolve(request.path)
+        if asset is None:
+            self.not_found += 1
+            raise web.HTTPNotFound()
+        if asset.content_type == "text/html" and not request.path.endswith((".html", ".htm")) \
+                and not request.path.endswith("/"):
+            # "/games/foo" -> "/games/foo/" so relative links in index.html resolve
+            raise web.HTTPMovedPermanently(
+                request.rel_url.with_path(request.path + "/").with_query(request.rel_url.query)
+            )
+        self.hits += 1
+
+        headers = {
+            "Cache-Control": self._cache_control(asset),
+            "Last-Modified": asset.last_modified,
+        }
+        if asset.body is None:
+            return web.FileResponse(asset.path, headers=headers)
+
+        encoding, body = self._choose_encoding(request, asset)
+        etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
+        headers["ETag"] = etag
+        if asset.encoded:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in tags or etag in tags or asset.etag in tags:
+                self.not_modified += 1
+                return web.Response(status=304, headers=headers)
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            self.compressed += 1
+        return web.Response(body=body, headers=headers, content_type=asset.content_type,
+                            charset="utf-8" if asset.content_type.startswith("text/") else None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "files": len(self._assets),
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "compressed": self.compressed,
+            "not_found": self.not_found,
+        }
@@ -0,0 +1,5 @@
+from core.workers.sharding import shard_for, update_user_id
+from core.workers.supervisor import Supervisor
+from core.workers.worker import UpdateWorker
+
+__all__ = ["Supervisor", "UpdateWorker", "shard_for", "update_user_id"]
@@ -0,0 +1,39 @@
+"""Routing of raw updates to worker processes.
+
+Updates are routed on the raw JSON dict, before aiogram builds any models,
+so the front end stays cheap. Everything from one user lands on the same
+worker, which keeps FSM conversations and per-user caches consistent.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """``from_user.id`` of a raw update (falls back to the chat id)."""
+    for name, body in update.items():
+        if name == "update_id" or not isinstance(body, dict):
+            continue
+        for field in ("from", "user"):
+            user = body.get(field)
+            if isinstance(user, dict) and isinstance(user.get("id"), int):
+                return user["id"]
+        chat = body.get("chat")
+        if isinstance(chat, dict) and isinstance(chat.get("id"), int):
+            return chat["id"]
+        message = body.get("message")
+        if isinstance(message, dict):
+            # e.g. message_reaction_count, callback on an inaccessible message
+            chat = message.get("chat")
+            if isinstance(chat, dict) and isinstance(chat.get("id"), int):
+                return chat["id"]
+    return None
+
+
+def shard_for(update: Dict[str, Any], shards: int) -> int:
+    if shards <= 1:
+        return 0
+    user_id = update_user_id(update)
+    if user_id is None:
+        user_id = update.get("update_id", 0)
+    return abs(user_id) % shards
@@ -0,0 +1,241 @@
+"""Front end + supervisor of the multi-process mode.
+
+The supervisor owns the public side: it receives updates (webhook or raw
+``getUpdates`` long polling), reads just enough of the JSON to pick a
+worker by user id and writes the update to that worker's stdin. Workers
+are ``main.py --worker <i>`` subprocesses; a crashed worker is restarted
+with backoff and the updates queued for it meanwhile are delivered after
+the restart. Metrics reported by the workers are served at ``/workers``.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import aiohttp
+from aiohttp import web
+
+from core.workers.sharding import shard_for
+from core.workers.worker import METRICS_PREFIX
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API = "https://api.telegram.org"
+
+
+class WorkerHandle:
+    """One worker subprocess plus the queue of updates waiting for it."""
+
+    def __init__(self, index: int, command: Sequence[str], queue_size: int) -> None:
+        self.index = index
+        self.command = list(command)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.ready = asyncio.Event()
+        # Set by the first metrics line: the worker has run on_startup and reads stdin
+        self.serving = asyncio.Event()
+        self.restarts = 0
+        self.started_at = 0.0
+        self.metrics: Dict[str, Any] = {}
+        # Prometheus families reported by the worker (core.metrics), kept out of /workers
+        self.families: List[Any] = []
+        self.metrics_at = 0.0
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._supervise(), name=f"worker-{self.index}-supervise"),
+            asyncio.create_task(self._write_loop(), name=f"worker-{self.index}-write"),
+        ]
+
+    async def stop(self, timeout: float) -> None:
+        """Deliver what is queued, close stdin and wait for a clean exit."""
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Worker {self.index}: {self.queue.qsize()} updates left undelivered")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+        if process.stdin is not None:
+            process.stdin.close()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Worker {self.index}: did not exit in time, killing")
+            process.kill()
+            await process.wait()
+
+    async def _spawn(self) -> None:
+        env = dict(os.environ, BOT_WORKER_INDEX=str(self.index))
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=env,
+        )
+        self.started_at = time.monotonic()
+        self.ready.set()
+        logger.info(f"Worker {self.index} started (pid {self.process.pid})")
+
+    async def _supervise(self) -> None:
+        backoff = 1.0
+        while not self._stopping:
+            await self._spawn()
+            await self._read_metrics(self.process)
+            code = await self.process.wait()
+            self.ready.clear()
+            self.serving.clear()
+            if self._stopping:
+                return
+            self.restarts += 1
+            if time.monotonic() - self.started_at > 60:
+                backoff = 1.0
+            logger.error(f"Worker {self.index} exited with code {code}; restarting in {backoff:.0f}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _read_metrics(self, process: asyncio.subprocess.Process) -> None:
+        assert process.stdout is not None
+        async for raw in process.stdout:
+            line = raw.decode("utf-8", "replace").rstrip("\n")
+            if line.startswith(METRICS_PREFIX):
+                try:
+                    metrics = json.loads(line[len(METRICS_PREFIX):])
+                    self.families = metrics.pop("prometheus", [])
+                    self.metrics = metrics
+                    self.metrics_at = time.monotonic()
+                    self.serving.set()
+                except ValueError:
+                    pass
+            elif line:
+                logger.info(f"Worker {self.index}: {line}")
+
+    async def _write_loop(self) -> None:
+        while True:
+            line = await self.queue.get()
+            while True:
+                await self.ready.wait()
+                process = self.process
+                try:
+                    process.stdin.write(line)
+                    await process.stdin.drain()
+                    break
+                except (BrokenPipeError, ConnectionResetError):
+                    # Worker died; keep the update for its replacement
+                    await asyncio.sleep(0.1)
+            self.queue.task_done()
+
+    def info(self) -> Dict[str, Any]:
+        alive = self.process is not None and self.process.returncode is None
+        return {
+            "alive": alive,
+            "pid": self.process.pid if self.process is not None else None,
+            "restarts": self.restarts,
+            "queued": self.queue.qsize(),
+            "metrics_age": round(time.monotonic() - self.metrics_at, 1) if self.metrics_at else None,
+            **self.metrics,
+        }
+
+
+class Supervisor:
+    def __init__(self, workers: int, command: Sequence[str], queue_size: int = 10000) -> None:
+        self.workers = [
+            WorkerHandle(i, [*command, "--worker", str(i)], queue_size) for i in range(max(1, workers))
+        ]
+        self.routed = 0
+
+    async def start(self) -> None:
+        for worker in self.workers:
+            await worker.start()
+
+    async def stop(self, timeout: float = 15.0) -> None:
+        await asyncio.gather(*(worker.stop(timeout) for worker in self.workers))
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """Wait until every worker has finished its startup; False on timeout."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(worker.serving.wait() for worker in self.workers)), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def route(self, update: Dict[str, Any], line: Optional[bytes] = None) -> None:
+        """Queue an update for its worker; waits while that queue is full."""
+        if line is None:
+            line = json.dumps(update, ensure_ascii=False, separators=(",", ":")).encode()
+        worker = self.workers[shard_for(update, len(self.workers))]
+        await worker.queue.put(line + b"\n")
+        self.routed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"routed": self.routed, "workers": [worker.info() for worker in self.workers]}
+
+    def metric_families(self) -> List[Any]:
+        """(labels, families) of every worker, for core.metrics.merge()."""
+        return [({"worker": str(worker.index)}, worker.families) for worker in self.workers]
+
+    async def workers_alive(self) -> bool:
+        return all(worker.process is not None and worker.process.returncode is None for worker in self.workers)
+
+    # ------------------------------------------------------------------
+    # Update sources
+    # ------------------------------------------------------------------
+
+    def register_webhook(self, app: web.Application, path: str, secret_token: str) -> None:
+        async def handle(request: web.Request) -> web.Response:
+            if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret_token:
+                return web.Response(status=401)
+            body = await request.read()
+            try:
+                update = json.loads(body)
+            except ValueError:
+                return web.Response(status=400)
+            # JSON strings cannot hold raw newlines, so this only folds whitespace
+            await self.route(update, body.replace(b"\r", b" ").replace(b"\n", b" "))
+            return web.Response()
+
+        app.router.add_post(path, handle)
+
+    def register_stats(self, app: web.Application) -> None:
+        async def handle(request: web.Request) -> web.Response:
+            return web.json_response(self.stats())
+
+        app.router.add_get("/workers", handle)
+
+    async def poll(self, token: str, allowed_updates: List[str], stop: asyncio.Event) -> None:
+        """Raw getUpdates loop: updates are routed without building models."""
+        url = f"{TELEGRAM_API}/bot{token}/getUpdates"
+        offset = 0
+        timeout = aiohttp.ClientTimeout(total=60)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while not stop.is_set():
+                params = {"offset": offset, "timeout": 30, "allowed_updates": json.dumps(allowed_updates)}
+                try:
+                    async with session.get(url, params=params) as resp:
+                        payload = await resp.json(content_type=None)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"getUpdates failed: {e}")
+                    await asyncio.sleep(2.0)
+                    continue
+                if not payload.get("ok"):
+                    retry_after = (payload.get("parameters") or {}).get("retry_after", 5)
+                    logger.warning(f"getUpdates error: {payload.get('description')}")
+                    await asyncio.sleep(retry_after)
+                    continue
+                for update in payload["result"]:
+                    offset = update["update_id"] + 1
+                    await self.route(update)
@@ -0,0 +1,144 @@
+"""Worker process side of the multi-process mode.
+
+A worker reads raw updates from stdin (one JSON object per line, written
+by the supervisor), feeds them to its own Dispatcher and writes a metrics
+line to stdout every few seconds. Different users are handled concurrently;
+updates of one user are handled strictly in arrival order.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Optional
+
+from aiogram import Bot, Dispatcher
+
+from core.workers.sharding import update_user_id
+
+logger = logging.getLogger(__name__)
+
+# Prefix of metrics lines on a worker's stdout
+METRICS_PREFIX = "@metrics "
+
+
+class UpdateWorker:
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        index: int,
+        *,
+        max_in_flight: int = 100,
+        metrics_interval: float = 5.0,
+        extra_metrics: Optional[Callable[[], Dict[str, Any]]] = None,
+    ) -> None:
+        self.dp = dp
+        self.bot = bot
+        self.index = index
+        self.metrics_interval = metrics_interval
+        self.extra_metrics = extra_metrics
+
+        self._slots = asyncio.Semaphore(max(1, max_in_flight))
+        # user id -> future of that user's last queued update
+        self._tails: Dict[int, asyncio.Future] = {}
+        self._tasks: set = set()
+        self._started = time.monotonic()
+
+        self.received = 0
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+
+    async def serve(self) -> None:
+        """Process updates until stdin is closed."""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=2 ** 22)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        reporter = asyncio.create_task(self._report_loop())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await self._slots.acquire()
+                self.received += 1
+                task = asyncio.create_task(self._handle(line))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            reporter.cancel()
+            self._report()
+
+    async def _handle(self, line: bytes) -> None:
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        previous: Optional[asyncio.Future] = None
+        done: Optional[asyncio.Future] = None
+        user_id: Optional[int] = None
+        try:
+            update = json.loads(line)
+            user_id = update_user_id(update)
+            if user_id is not None:
+                previous = self._tails.get(user_id)
+                done = loop.create_future()
+                self._tails[user_id] = done
+                if previous is not None:
+                    await previous
+            await self.dp.feed_raw_update(self.bot, update)
+            self.processed += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Worker {self.index}: update failed: {e}", exc_info=True)
+        finally:
+            if done is not None:
+                done.set_result(None)
+                if self._tails.get(user_id) is done:
+                    del self._tails[user_id]
+            elapsed = time.monotonic() - started
+            self.busy_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self._slots.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        finished = self.processed + self.errors
+        data: Dict[str, Any] = {
+            "index": self.index,
+            "pid": os.getpid(),
+            "uptime": round(time.monotonic() - self._started, 1),
+            "received": self.received,
+            "processed": self.processed,
+            "errors": self.errors,
+            "in_flight": len(self._tasks),
+            "avg_ms": round(self.busy_seconds / finished * 1000, 2) if finished else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+        try:
+            import resource  # POSIX only
+        except ImportError:
+            pass
+        else:
+            data["max_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if self.extra_metrics is not None:
+            try:
+                data.update(self.extra_metrics())
+            except Exception as e:
+                logger.warning(f"Worker {self.index}: metrics collection failed: {e}")
+        return data
+
+    def _report(self) -> None:
+        sys.stdout.write(METRICS_PREFIX + json.dumps(self.metrics()) + "\n")
+        sys.stdout.flush()
+
+    async def _report_loop(self) -> None:
+        while True:
+            self._report()
+            await asyncio.sleep(self.metrics_interval)
@@ -5,5 +5,11 @@ git pull
 source venv/bin/activate
 pip install -r requirements.txt
 
+# Optional gate: LOADTEST_BASELINE=loadtest_baseline.json ./deploy.sh
+if [ -n "$LOADTEST_BASELINE" ]; then
+    python scripts/loadtest.py --users 500 --check "$LOADTEST_BASELINE" \
+        || { echo "Load test regression, bot NOT restarted."; exit 1; }
+fi
+
 systemctl restart kiberone-bot.service
 echo "Bot updated and restarted."
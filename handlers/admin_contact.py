@@ -8,19 +8,15 @@ from aiogram.types import (
 )
 
 from config import get_settings
+from core.keyboards import markups
 
 router = Router(name="admin_contact")
 settings = get_settings()
 
 
-@router.message(F.text == "📩 Написать админу")
-async def write_to_admin(message: Message) -> None:
-    username = settings.admin_username.lstrip("@")
-    if not username:
-        await message.answer("Контакт администратора не настроен. Обратитесь позже.")
-        return
-
-    keyboard = InlineKeyboardMarkup(
+@markups.cached
+def _admin_contact_keyboard(username: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
@@ -30,7 +26,16 @@ async def write_to_admin(message: Message) -> None:
             ]
         ]
     )
+
+
+@router.message(F.text == "📩 Написать админу")
+async def write_to_admin(message: Message) -> None:
+    username = settings.admin_username.lstrip("@")
+    if not username:
+        await message.answer("Контакт администратора не настроен. Обратитесь позже.")
+        return
+
     await message.answer(
         f"Пишите напрямую администратору: @{username}",
-        reply_markup=keyboard,
+        reply_markup=_admin_contact_keyboard(username),
     )
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from html import escape
+
 from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -7,12 +9,13 @@ from aiogram.types import (
     KeyboardButton,
     Message,
     ReplyKeyboardMarkup,
-    ReplyKeyboardRemove,
 )
 
 from config import get_settings
+from core.keyboards import markups, remove_keyboard
 from core.notify import notify_admin
-from models import AsyncSessionLocal, B2bRequest, get_or_create_user
+from core.users import touch_user
+from models import AsyncSessionLocal, B2bRequest
 
 router = Router(name="b2b")
 settings = get_settings()
@@ -25,6 +28,7 @@ class B2bStates(StatesGroup):
     waiting_for_comment = State()
 
 
+@markups.cached
 def _business_type_keyboard() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -56,7 +60,7 @@ async def handle_business_type(message: Message, state: FSMContext) -> None:
         return
     await state.update_data(business_type=btype)
     await state.set_state(B2bStates.waiting_for_city)
-    await message.answer("В каком городе?", reply_markup=ReplyKeyboardRemove())
+    await message.answer("В каком городе?", reply_markup=remove_keyboard())
 
 
 @router.message(B2bStates.waiting_for_city)
@@ -105,7 +109,7 @@ async def handle_b2b_comment(message: Message, state: FSMContext) -> None:
 
     # Reply to user
     from handlers.games import main_keyboard
-    user = await get_or_create_user(message.from_user.id, message.from_user.username)
+    user = await touch_user(message.from_user.id, message.from_user.username)
     await message.answer(
         "✅ Заявка принята!\n\nМы свяжемся с вами для обсуждения проекта. 👑",
         reply_markup=main_keyboard(bool(user.phone)),
@@ -117,10 +121,10 @@ async def handle_b2b_comment(message: Message, state: FSMContext) -> None:
     full_name = message.from_user.full_name or "—"
     text = (
         "👑 <b>B2B заявка — Хочу такого же бота</b>\n\n"
-        f"👤 От: {full_name} ({user_link})\n"
-        f"🏢 Бизнес: {business_type}\n"
-        f"🌆 Город: {city}\n"
-        f"📞 Контакт: {contact}\n"
-        f"💬 Описание: {comment}"
+        f"👤 От: {escape(full_name)} ({user_link})\n"
+        f"🏢 Бизнес: {escape(business_type)}\n"
+        f"🌆 Город: {escape(city)}\n"
+        f"📞 Контакт: {escape(contact)}\n"
+        f"💬 Описание: {escape(comment)}"
     )
     await notify_admin(message.bot, text)
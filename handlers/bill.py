@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from html import escape
+
 from aiogram import Bot, F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -15,8 +17,12 @@ from aiogram.types import (
 from datetime import datetime
 
 from config import get_settings
-from core.notify import notify_admin
-from models import AsyncSessionLocal, BillRequest, User, get_or_create_user
+from core.crm import enqueue
+from core.keyboards import markups
+from core.notify import PRIORITY_HIGH, notify_admin
+from core.users import touch_user, user_cache
+from crm import outbox_worker
+from models import AsyncSessionLocal, BillRequest, User
 
 router = Router(name="bill")
 settings = get_settings()
@@ -26,6 +32,7 @@ class BillStates(StatesGroup):
     waiting_for_contact = State()
 
 
+@markups.cached
 def _contact_keyboard() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[[KeyboardButton(text="📱 Отправить номер", request_contact=True)]],
@@ -36,7 +43,7 @@ def _contact_keyboard() -> ReplyKeyboardMarkup:
 
 @router.message(F.text == "💳 Ожидаю счёт")
 async def bill_request_start(message: Message, state: FSMContext) -> None:
-    user = await get_or_create_user(message.from_user.id, message.from_user.username)
+    user = await touch_user(message.from_user.id, message.from_user.username)
 
     if not user.phone:
         # Need phone first
@@ -68,20 +75,35 @@ async def bill_receive_contact(message: Message, state: FSMContext) -> None:
         if user:
             user.phone = phone
             await session.commit()
+    user_cache.set_phone(message.from_user.id, phone)
 
     await state.clear()
     await _save_bill_request(message, phone, message.bot)
 
 
 async def _save_bill_request(message: Message, phone: str, bot: Bot) -> None:
-    """Save BillRequest to DB and notify admin."""
+    """Save BillRequest to DB (+ CRM sync job) and notify admin."""
+    username = message.from_user.username
+    user_link = f"@{username}" if username else f"tg://user?id={message.from_user.id}"
+    name = message.from_user.full_name or "—"
+
     async with AsyncSessionLocal() as session:
         req = BillRequest(
             tg_user_id=message.from_user.id,
             phone=phone,
         )
         session.add(req)
+        await session.flush()
+        enqueue(
+            session,
+            "bill",
+            req.id,
+            name=name,
+            phone=phone,
+            note=f"Ожидает счёт. Telegram: {user_link}",
+        )
         await session.commit()
+    outbox_worker.notify()
 
     # Reply to user
     from handlers.games import main_keyboard
@@ -92,16 +114,13 @@ async def _save_bill_request(message: Message, phone: str, bot: Bot) -> None:
     )
 
     # Notify admin
-    username = message.from_user.username
-    user_link = f"@{username}" if username else f"tg://user?id={message.from_user.id}"
-    name = message.from_user.full_name or "—"
     text = (
         "💳 <b>Запрос на счёт</b>\n\n"
-        f"👤 Имя: {name}\n"
+        f"👤 Имя: {escape(name)}\n"
         f"📱 Телефон: {phone}\n"
         f"🔗 Telegram: {user_link}"
     )
-    await notify_admin(bot, text)
+    await notify_admin(bot, text, PRIORITY_HIGH)
 
 
 def _normalize_phone(phone: str) -> str:
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from config import get_settings
+from core.broadcast import broadcaster
+
+router = Router(name="broadcast")
+settings = get_settings()
+
+# Admin-only commands
+router.message.filter(F.from_user.id.in_(set(settings.admin_ids)))
+
+
+@router.message(Command("broadcast"))
+async def start_broadcast(message: Message, command: CommandObject) -> None:
+    if not command.args:
+        await message.answer(
+            "Использование: /broadcast текст сообщения\n\n"
+            "Форматирование (жирный, курсив, ссылки) сохраняется.\n"
+            "/broadcast_status — ход рассылки\n"
+            "/broadcast_cancel — остановить рассылку"
+        )
+        return
+
+    # Keep the admin's formatting: html_text carries the entities as HTML tags
+    text = message.html_text.split(maxsplit=1)[1]
+    broadcast = await broadcaster.create(text, created_by=message.from_user.id)
+    await message.answer(
+        f"📣 Рассылка #{broadcast.id} поставлена в очередь.\n"
+        f"Получателей: {broadcast.total}\n\n"
+        "Ход: /broadcast_status"
+    )
+
+
+@router.message(Command("broadcast_status"))
+async def broadcast_status(message: Message) -> None:
+    broadcast = await broadcaster.latest()
+    if broadcast is None:
+        await message.answer("Рассылок ещё не было.")
+        return
+    processed = broadcast.sent + broadcast.blocked + broadcast.failed
+    await message.answer(
+        f"📣 Рассылка #{broadcast.id}: {broadcast.status}\n\n"
+        f"Обработано: {processed} из ~{broadcast.total}\n"
+        f"✅ Доставлено: {broadcast.sent}\n"
+        f"🚫 Заблокировали бота: {broadcast.blocked}\n"
+        f"⚠️ Ошибки: {broadcast.failed}"
+    )
+
+
+@router.message(Command("broadcast_cancel"))
+async def broadcast_cancel(message: Message, command: CommandObject) -> None:
+    if command.args and command.args.strip().isdigit():
+        broadcast_id = int(command.args.strip())
+    else:
+        latest = await broadcaster.latest()
+        if latest is None:
+            await message.answer("Рассылок ещё не было.")
+            return
+        broadcast_id = latest.id
+
+    if await broadcaster.cancel(broadcast_id):
+        await message.answer(f"⏹ Рассылка #{broadcast_id} остановлена.")
+    else:
+        await message.answer(f"Рассылка #{broadcast_id} уже завершена или не найдена.")
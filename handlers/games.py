@@ -1,8 +1,7 @@
 from __future__ import annotations
 
 import json
-import uuid
-from typing import Dict, List, Optional
+from typing import Optional
 from urllib.parse import quote
 
 from aiogram import Bot, F, Router
@@ -16,11 +15,15 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
     WebAppInfo,
 )
-from sqlalchemy import desc, select
 
 from config import get_settings
 from core.events import track
-from models import AsyncSessionLocal, GameResult, User, get_or_create_user
+from core.games import catalog
+from core.games.leaderboard import GLOBAL, leaderboard
+from core.games.results import get_user_bests, record_result
+from core.games.sessions import SessionError, game_sessions
+from core.keyboards import markups
+from core.users import touch_user
 
 router = Router(name="games")
 settings = get_settings()
@@ -30,6 +33,7 @@ settings = get_settings()
 # Keyboards
 # ---------------------------------------------------------------------------
 
+@markups.cached
 def main_keyboard(is_known: bool = False) -> ReplyKeyboardMarkup:
     """Main menu. Known users get an extra '🏆 Мой результат' button."""
     rows = [
@@ -44,6 +48,7 @@ def main_keyboard(is_known: bool = False) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True)
 
 
+@markups.cached
 def after_game_keyboard() -> InlineKeyboardMarkup:
     """Buttons shown after a game result."""
     return InlineKeyboardMarkup(
@@ -55,14 +60,9 @@ def after_game_keyboard() -> InlineKeyboardMarkup:
     )
 
 
-def games_keyboard(games: List[Dict]) -> InlineKeyboardMarkup:
-    buttons: List[List[InlineKeyboardButton]] = []
-    for game in games:
-        if game.get("enabled"):
-            buttons.append(
-                [InlineKeyboardButton(text=game["name"], callback_data=f"game_{game['id']}")]
-            )
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+def games_keyboard() -> InlineKeyboardMarkup:
+    """Prebuilt by the catalog; rebuilt only when games.json changes."""
+    return catalog.keyboard
 
 
 def play_game_keyboard(game_id: str, session_id: str) -> InlineKeyboardMarkup:
@@ -79,21 +79,13 @@ def play_game_keyboard(game_id: str, session_id: str) -> InlineKeyboardMarkup:
     )
 
 
-def load_games() -> List[Dict]:
-    try:
-        with open("games.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return []
-
-
 # ---------------------------------------------------------------------------
 # /start
 # ---------------------------------------------------------------------------
 
 @router.message(Command("start"))
 async def cmd_start(message: Message) -> None:
-    user = await get_or_create_user(message.from_user.id, message.from_user.username)
+    user = await touch_user(message.from_user.id, message.from_user.username)
     is_known = bool(user.phone)
 
     await track("user.started", message.from_user.id, {
@@ -102,20 +94,19 @@ async def cmd_start(message: Message) -> None:
     })
 
     # Show greeting + game button
-    games = load_games()
-    enabled = [g for g in games if g.get("enabled")]
+    enabled = catalog.enabled
 
     if enabled:
         first_game = enabled[0]
-        session_id = str(uuid.uuid4())
+        session = await game_sessions.open(message.from_user.id, first_game["id"])
         await message.answer(
             "👋 Привет! Я бот школы LazArt.\n\n"
             "Сначала — сыграй 60 секунд! 🎮",
-            reply_markup=play_game_keyboard(first_game["id"], session_id),
+            reply_markup=play_game_keyboard(first_game["id"], session.id),
         )
         await track("game.opened", message.from_user.id, {
             "game_id": first_game["id"],
-            "session_id": session_id,
+            "session_id": session.id,
             "source": "start",
         })
     else:
@@ -131,20 +122,17 @@ async def cmd_start(message: Message) -> None:
 
 @router.message(F.text == "🎮 Играть")
 async def show_games_to_play(message: Message) -> None:
-    games = load_games()
-    enabled_games = [g for g in games if g.get("enabled")]
-    if not enabled_games:
-        user = await get_or_create_user(message.from_user.id, message.from_user.username)
+    if not catalog.enabled:
+        user = await touch_user(message.from_user.id, message.from_user.username)
         await message.answer("Пока нет доступных игр.", reply_markup=main_keyboard(bool(user.phone)))
         return
-    await message.answer("Выбери игру:", reply_markup=games_keyboard(enabled_games))
+    await message.answer("Выбери игру:", reply_markup=games_keyboard())
 
 
 @router.callback_query(F.data.startswith("game_"))
 async def select_game(callback: CallbackQuery) -> None:
     game_id = callback.data.replace("game_", "")
-    games = load_games()
-    game = next((g for g in games if g["id"] == game_id), None)
+    game = catalog.get(game_id)
     if not game:
         await callback.answer("Игра не найдена")
         return
@@ -152,14 +140,14 @@ async def select_game(callback: CallbackQuery) -> None:
         await callback.answer("Путь к игре не настроен")
         return
 
-    session_id = str(uuid.uuid4())
+    session = await game_sessions.open(callback.from_user.id, game_id)
     await callback.message.answer(
         f"🎮 {game['name']}\n\nНажми кнопку ниже, чтобы начать игру.",
-        reply_markup=play_game_keyboard(game_id, session_id),
+        reply_markup=play_game_keyboard(game_id, session.id),
     )
     await track("game.opened", callback.from_user.id, {
         "game_id": game_id,
-        "session_id": session_id,
+        "session_id": session.id,
         "source": "menu",
     })
     await callback.answer()
@@ -169,58 +157,93 @@ async def select_game(callback: CallbackQuery) -> None:
 # WebApp result handler
 # ---------------------------------------------------------------------------
 
+SESSION_ERRORS = {
+    "unknown": "Не нашёл запуск этой игры. Открой её заново через «🎮 Играть».",
+    "wrong_game": "Не нашёл запуск этой игры. Открой её заново через «🎮 Играть».",
+    "expired": "Игра была открыта слишком давно — результат не засчитан. Запусти её заново через «🎮 Играть».",
+    "finished": "Этот результат уже засчитан ✅ Чтобы сыграть ещё раз, открой игру заново через «🎮 Играть».",
+}
+
+
+def _payload_id(data: dict, *keys: str) -> Optional[str]:
+    """An id sent back by the game; anything but a short string is forged."""
+    for key in keys:
+        value = data.get(key)
+        if value is None or value == "":
+            continue
+        if not isinstance(value, str) or len(value) > 64:
+            raise SessionError("unknown")
+        return value
+    return None
+
+
 @router.message(F.web_app_data)
 async def handle_web_app_data(message: Message) -> None:
     try:
         data = json.loads(message.web_app_data.data)
+        if not isinstance(data, dict):
+            raise ValueError("payload must be an object")
+        score = int(data.get("score", 0))
     except Exception:
         await message.answer("Не удалось прочитать результат игры.")
         return
 
-    game_id = data.get("game_id", "unknown")
-    score = int(data.get("score", 0))
     raw_payload = message.web_app_data.data
 
+    # Games get ?sessionid= in their URL; most don't send it back, then the
+    # user's latest session is the one being finished
+    try:
+        session = await game_sessions.claim(
+            message.from_user.id,
+            _payload_id(data, "sessionid", "session_id"),
+            _payload_id(data, "game_id"),
+        )
+    except SessionError as e:
+        await message.answer(SESSION_ERRORS.get(e.reason, SESSION_ERRORS["unknown"]))
+        return
+    game_id = session.game_id
+
+    # Save to game_results (+ user_game_best in the same transaction)
+    await touch_user(message.from_user.id, message.from_user.username)
+    stored = await record_result(
+        message.from_user.id, game_id, score, raw_payload,
+        username=message.from_user.username, session=session,
+    )
+    if stored is None:
+        await message.answer(SESSION_ERRORS["finished"])
+        return
+
+    # raw_payload is kept once, in game_results
     await track("game.finished", message.from_user.id, {
         "game_id": game_id,
+        "session_id": session.id,
         "score": score,
-        "raw_payload": raw_payload,
+        "duration_sec": session.duration_sec,
     })
 
-    # Save to game_results
-    user = await get_or_create_user(message.from_user.id, message.from_user.username)
-    async with AsyncSessionLocal() as session:
-        result_row = GameResult(
-            tg_user_id=message.from_user.id,
-            game_id=game_id,
-            score=score,
-            raw_payload=raw_payload,
-        )
-        session.add(result_row)
-        await session.commit()
-
-    await message.answer(
+    text = (
         f"🏆 Игра завершена!\n\n"
         f"🎮 Игра: {game_id}\n"
-        f"⭐ Очки: {score}",
-        reply_markup=after_game_keyboard(),
+        f"⭐ Очки: {score}"
     )
+    place = leaderboard.rank(message.from_user.id, game_id)
+    if place:
+        text += f"\n📊 Место в рейтинге: {place[0]} из {place[1]}"
+    await message.answer(text, reply_markup=after_game_keyboard())
 
 
 @router.callback_query(F.data == "play_again")
 async def play_again(callback: CallbackQuery) -> None:
-    games = load_games()
-    enabled = [g for g in games if g.get("enabled")]
-    if not enabled:
+    if not catalog.enabled:
         await callback.answer("Нет доступных игр")
         return
-    await callback.message.answer("Выбери игру:", reply_markup=games_keyboard(enabled))
+    await callback.message.answer("Выбери игру:", reply_markup=games_keyboard())
     await callback.answer()
 
 
 @router.callback_query(F.data == "go_menu")
 async def go_menu(callback: CallbackQuery) -> None:
-    user = await get_or_create_user(callback.from_user.id, callback.from_user.username)
+    user = await touch_user(callback.from_user.id, callback.from_user.username)
     await callback.message.answer(
         "🧭 Главное меню:",
         reply_markup=main_keyboard(bool(user.phone)),
@@ -239,17 +262,8 @@ async def challenge_friend(callback: CallbackQuery) -> None:
 
 @router.message(F.text == "🏆 Мой результат")
 async def my_result(message: Message) -> None:
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            select(GameResult)
-            .where(GameResult.tg_user_id == message.from_user.id)
-            .order_by(desc(GameResult.score))
-            .limit(5)
-        )
-        result = await session.execute(stmt)
-        rows = result.scalars().all()
-
-    user = await get_or_create_user(message.from_user.id, message.from_user.username)
+    rows = await get_user_bests(message.from_user.id, limit=5)
+    user = await touch_user(message.from_user.id, message.from_user.username)
 
     if not rows:
         await message.answer(
@@ -260,6 +274,45 @@ async def my_result(message: Message) -> None:
 
     lines = ["🏆 Твои лучшие результаты:"]
     for i, r in enumerate(rows, 1):
-        lines.append(f"{i}. {r.game_id} — {r.score} очков")
+        game = catalog.get(r.game_id)
+        name = game["name"] if game else r.game_id
+        line = f"{i}. {name} — {r.best_score} очков (попыток: {r.attempts})"
+        place = leaderboard.rank(message.from_user.id, r.game_id)
+        if place:
+            line += f", место {place[0]}/{place[1]}"
+        lines.append(line)
 
     await message.answer("\n".join(lines), reply_markup=main_keyboard(bool(user.phone)))
+
+
+# ---------------------------------------------------------------------------
+# /top — leaderboards
+# ---------------------------------------------------------------------------
+
+@router.message(Command("top"))
+async def show_top(message: Message) -> None:
+    """/top — global board, /top <game_id> — board of one game."""
+    parts = (message.text or "").split(maxsplit=1)
+    game_id = parts[1].strip() if len(parts) > 1 else GLOBAL
+
+    if game_id == GLOBAL:
+        title = "🏆 Общий рейтинг (сумма лучших результатов):"
+    else:
+        game = catalog.get(game_id)
+        if not game:
+            await message.answer("Игра не найдена. Пример: /top sapep")
+            return
+        title = f"🏆 Рейтинг — {game['name']}:"
+
+    top = leaderboard.top(game_id, 10)
+    if not top:
+        await message.answer("Пока никто не играл. Будь первым! 🎮")
+        return
+
+    lines = [title]
+    for i, (user_id, score) in enumerate(top, 1):
+        lines.append(f"{i}. {leaderboard.display_name(user_id)} — {score}")
+    place = leaderboard.rank(message.from_user.id, game_id)
+    if place and place[0] > len(top):
+        lines.append(f"\nТвоё место: {place[0]} из {place[1]}")
+    await message.answer("\n".join(lines))
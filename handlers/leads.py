@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from html import escape
+
 from aiogram import Bot, F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -7,12 +9,15 @@ from aiogram.types import (
     KeyboardButton,
     Message,
     ReplyKeyboardMarkup,
-    ReplyKeyboardRemove,
 )
 
 from config import get_settings
-from core.notify import notify_admin
-from models import AsyncSessionLocal, Lead, get_or_create_user
+from core.crm import enqueue
+from core.keyboards import markups, remove_keyboard
+from core.notify import PRIORITY_HIGH, notify_admin
+from core.users import touch_user
+from crm import outbox_worker
+from models import AsyncSessionLocal, Lead
 
 router = Router(name="leads")
 settings = get_settings()
@@ -25,6 +30,7 @@ class LeadStates(StatesGroup):
     waiting_for_comment = State()
 
 
+@markups.cached
 def _interest_keyboard() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -35,6 +41,7 @@ def _interest_keyboard() -> ReplyKeyboardMarkup:
     )
 
 
+@markups.cached
 def _skip_keyboard() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[[KeyboardButton(text="⏭ Пропустить")]],
@@ -48,7 +55,7 @@ async def start_lead(message: Message, state: FSMContext) -> None:
     await state.set_state(LeadStates.waiting_for_child_name)
     await message.answer(
         "📝 Запись на пробное занятие\n\nКак зовут ребёнка?",
-        reply_markup=ReplyKeyboardRemove(),
+        reply_markup=remove_keyboard(),
     )
 
 
@@ -106,7 +113,12 @@ async def handle_comment(message: Message, state: FSMContext) -> None:
     child_age = data.get("child_age", "")
     interest = data.get("interest", "")
 
-    # Save to DB
+    username = message.from_user.username
+    user_link = f"@{username}" if username else f"tg://user?id={message.from_user.id}"
+    full_name = message.from_user.full_name or "—"
+    user = await touch_user(message.from_user.id, username)
+
+    # Save to DB together with its CRM sync job
     async with AsyncSessionLocal() as session:
         lead = Lead(
             tg_user_id=message.from_user.id,
@@ -116,26 +128,36 @@ async def handle_comment(message: Message, state: FSMContext) -> None:
             comment=comment,
         )
         session.add(lead)
+        await session.flush()
+        note_parts = [f"Родитель: {full_name} ({user_link})", f"Возраст: {child_age}", f"Интерес: {interest}"]
+        if comment:
+            note_parts.append(f"Комментарий: {comment}")
+        enqueue(
+            session,
+            "lead",
+            lead.id,
+            name=child_name,
+            # The form does not ask for a phone: only known if shared for a bill
+            phone=user.phone,
+            note="\n".join(note_parts),
+        )
         await session.commit()
+    outbox_worker.notify()
 
     # Reply to user
     from handlers.games import main_keyboard
-    user = await get_or_create_user(message.from_user.id, message.from_user.username)
     await message.answer(
         "✅ Заявка принята!\n\nМы свяжемся с вами в ближайшее время.",
         reply_markup=main_keyboard(bool(user.phone)),
     )
 
     # Notify admin
-    username = message.from_user.username
-    user_link = f"@{username}" if username else f"tg://user?id={message.from_user.id}"
-    full_name = message.from_user.full_name or "—"
     text_parts = [
         "📝 <b>Новая заявка на пробное</b>\n",
-        f"👤 Родитель: {full_name} ({user_link})",
-        f"👶 Ребёнок: {child_name}, {child_age} лет",
+        f"👤 Родитель: {escape(full_name)} ({user_link})",
+        f"👶 Ребёнок: {escape(child_name)}, {escape(child_age)} лет",
         f"🎯 Интерес: {interest}",
     ]
     if comment:
-        text_parts.append(f"💬 Комментарий: {comment}")
-    await notify_admin(message.bot, "\n".join(text_parts))
+        text_parts.append(f"💬 Комментарий: {escape(comment)}")
+    await notify_admin(message.bot, "\n".join(text_parts), PRIORITY_HIGH)
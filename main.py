@@ -3,32 +3,77 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+import signal
+import sys
 from pathlib import Path
 
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
 from aiohttp import web
 
-from config import get_settings
-from models import init_db
+import crm
+from config import Settings, get_settings
+from core.broadcast import broadcaster
+from core.events import event_writer, legacy_events
+from core.fsm import SQLAlchemyStorage
+from core.games import catalog, game_sessions, leaderboard
+from core.keyboards import MarkupCachingSession
+from core.metrics import instrument_bot, instrument_dispatcher, instrument_engine, registry
+from core.notify import notifier
+from core.reminders import reminder_scheduler
+from core.throttling import throttling
+from core.users import user_cache
+from core.web import ResultsAPI, StaticAssets, health
+from core.workers import Supervisor, UpdateWorker
+from models import engine, init_db
 from handlers import games, leads
 from handlers.bill import router as bill_router
 from handlers.admin_contact import router as admin_contact_router
 from handlers.b2b import router as b2b_router
+from handlers.broadcast import router as broadcast_router
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-async def start_web_server() -> web.AppRunner:
+def create_web_app() -> web.Application:
+    """aiohttp app shared by health checks, metrics, static games and the webhook."""
     app = web.Application()
     app.router.add_get("/", lambda request: web.Response(text="OK"))
-    app.router.add_get("/health", lambda request: web.Response(text="OK"))
-    if Path("teGame").is_dir():
-        app.router.add_static("/teGame/", path="teGame", show_index=True)
-    if Path("games").is_dir():
-        app.router.add_static("/games/", path="games", show_index=True)
+    health.register(app)
+    assets = StaticAssets(max_age=get_settings().static_max_age)
+    for folder in ("teGame", "games"):
+        if Path(folder).is_dir():
+            assets.add_directory(f"/{folder}/", Path(folder))
+    assets.register(app)
+    # Served here, so counted here (not in the worker processes)
+    registry.collector("static", assets.stats)
+    settings = get_settings()
+    results_api = ResultsAPI(
+        settings.bot_token,
+        auth_max_age=settings.webapp_auth_max_age,
+        max_batch=settings.results_api_max_batch,
+        allowed_origins=settings.results_api_origins,
+    )
+    results_api.register(app)
+    registry.collector("results_api", results_api.stats)
+    return app
+
+
+def setup_metrics(bot: Bot) -> None:
+    """Time Bot API calls and DB work; export component counters at /metrics."""
+    instrument_bot(bot)
+    instrument_engine(engine)
+    registry.collector("user_cache", user_cache.stats)
+    registry.collector("events", event_writer.stats)
+    registry.collector("notify", notifier.stats)
+    registry.collector("throttling", throttling.stats)
+    registry.collector("game_sessions", game_sessions.stats)
+
 
+async def start_web_server(app: web.Application) -> web.AppRunner:
     runner = web.AppRunner(app)
     await runner.setup()
     port = int(os.getenv("PORT", "10000"))
@@ -38,30 +83,247 @@ async def start_web_server() -> web.AppRunner:
     return runner
 
 
-async def main() -> None:
+async def on_startup(bot: Bot, dispatcher: Dispatcher) -> None:
     settings = get_settings()
+    # Background jobs run once per bot: in the single process or in worker 0
+    run_jobs = settings.worker_index in (None, 0)
 
-    # Initialize DB (creates tables if missing)
-    await init_db()
+    catalog.refresh(force=True)
+    await leaderboard.warm()
+    if settings.worker_index is not None:
+        # Other workers record results too
+        await leaderboard.start_refresh(settings.leaderboard_refresh)
+    if run_jobs:
+        if crm.is_configured():
+            await crm.outbox_worker.start()
+        else:
+            logger.info("AlfaCRM is not configured; CRM outbox jobs stay queued")
+    await event_writer.start()
+    await user_cache.start()
+    if isinstance(dispatcher.storage, SQLAlchemyStorage):
+        await dispatcher.storage.start()
+    await notifier.start(bot)
+    health.set("bot", True)
+    if run_jobs:
+        await broadcaster.start(bot)
+        await reminder_scheduler.start(bot)
+        await legacy_events.start()
+        await game_sessions.start()
 
-    bot = Bot(token=settings.bot_token)
-    dp = Dispatcher(storage=MemoryStorage())
+
+async def on_shutdown(dispatcher: Dispatcher) -> None:
+    # Flush buffered analytics and queued notifications before the process exits
+    health.set("bot", False)
+    await leaderboard.stop_refresh()
+    await legacy_events.stop()
+    await game_sessions.stop()
+    await reminder_scheduler.stop()
+    await broadcaster.stop()
+    await notifier.stop()
+    await dispatcher.storage.close()
+    await user_cache.stop()
+    await crm.outbox_worker.stop()
+    await crm.close()
+    await event_writer.stop()
+
+
+def create_storage(settings: Settings) -> BaseStorage:
+    if settings.fsm_storage == "memory":
+        return MemoryStorage()
+    return SQLAlchemyStorage(
+        ttl=settings.fsm_ttl,
+        flush_interval=settings.fsm_flush_interval,
+        cache_size=settings.fsm_cache_size,
+        cache_ttl=settings.fsm_cache_ttl,
+    )
+
+
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher(storage=create_storage(get_settings()))
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    # First outer middleware, so throttled updates show up in the latency metrics too
+    instrument_dispatcher(dp)
+    if get_settings().throttle_rate > 0:
+        # Before filters and handlers: a flood costs one bucket check per update
+        dp.update.outer_middleware(throttling)
 
     # Register routers — order matters for FSM priority
+    # Admin commands first so an admin's open form does not swallow them
+    dp.include_router(broadcast_router)
     dp.include_router(games.router)
     dp.include_router(leads.router)
     dp.include_router(bill_router)
     dp.include_router(admin_contact_router)
     dp.include_router(b2b_router)
+    return dp
 
+
+def register_webhook(app: web.Application, dp: Dispatcher, bot: Bot, settings: Settings) -> None:
+    """Mount the Dispatcher on *app* at the secret webhook path.
+
+    Telegram gets 200 right away; the update is processed in a background
+    task. Requests without the matching secret header are rejected with 401.
+    Until on_startup has finished the answer is 503, so Telegram keeps the
+    update and delivers it again later (a webhook set by the previous run
+    is live as soon as the server listens).
+    """
+    handler = SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=settings.webhook_secret,
+    )
+
+    async def handle(request: web.Request) -> web.Response:
+        if not health.is_set("bot"):
+            return web.Response(status=503)
+        return await handler.handle(request)
+
+    app.router.add_post(settings.webhook_path, handle)
+
+
+def _stop_event() -> asyncio.Event:
+    stop = asyncio.Event()
+    if sys.platform != "win32":
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+    return stop
+
+
+async def run_polling(dp: Dispatcher, bot: Bot) -> None:
     logger.info("Starting bot with polling")
-    runner = await start_web_server()
+    # getUpdates is refused while a webhook is set
+    await bot.delete_webhook(drop_pending_updates=False)
+    await dp.start_polling(bot)
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, settings: Settings) -> None:
+    logger.info("Starting bot with webhook at %s", settings.webhook_path)
+    # Caches, writers and storage must be up before Telegram replays queued updates
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    try:
+        # Telegram keeps undelivered updates while we restart, so nothing is dropped
+        await bot.set_webhook(
+            url=settings.webhook_url,
+            secret_token=settings.webhook_secret,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=False,
+        )
+        await _stop_event().wait()
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+
+
+async def run_supervisor(settings: Settings) -> None:
+    """Multi-process mode: receive updates here, handle them in WORKERS processes."""
+    supervisor = Supervisor(settings.workers, [sys.executable, os.path.abspath(__file__)])
+    bot = Bot(token=settings.bot_token)
+    # Only used to learn which update types the routers handle
+    allowed_updates = create_dispatcher().resolve_used_update_types()
+
+    app = create_web_app()
+    supervisor.register_stats(app)
+    registry.register(app, extra=supervisor.metric_families)
+    health.add("workers", supervisor.workers_alive)
+    if settings.bot_mode == "webhook":
+        supervisor.register_webhook(app, settings.webhook_path, settings.webhook_secret)
+
+    await supervisor.start()
+    runner = await start_web_server(app)
+    stop = _stop_event()
+    try:
+        # Updates routed earlier would only queue up behind the workers' on_startup
+        if not await supervisor.wait_ready(timeout=60.0):
+            logger.warning("Not every worker reported ready in 60s; receiving updates anyway")
+        if settings.bot_mode == "webhook":
+            logger.info("Starting %s workers with webhook at %s", settings.workers, settings.webhook_path)
+            await bot.set_webhook(
+                url=settings.webhook_url,
+                secret_token=settings.webhook_secret,
+                allowed_updates=allowed_updates,
+                drop_pending_updates=False,
+            )
+            await stop.wait()
+        else:
+            logger.info("Starting %s workers with polling", settings.workers)
+            await bot.delete_webhook(drop_pending_updates=False)
+            poller = asyncio.create_task(supervisor.poll(settings.bot_token, allowed_updates, stop))
+            await stop.wait()
+            poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+    finally:
+        await runner.cleanup()
+        await supervisor.stop()
+        await bot.session.close()
+
+
+async def run_worker(index: int) -> None:
+    """Worker process: handle the updates the supervisor writes to stdin."""
+    settings = get_settings()
+    if sys.platform != "win32":
+        # Shutdown is driven by the supervisor closing stdin
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, signal.SIG_IGN)
+
+    bot = Bot(token=settings.bot_token, session=MarkupCachingSession())
+    dp = create_dispatcher()
+    setup_metrics(bot)
+    worker = UpdateWorker(
+        dp,
+        bot,
+        index,
+        extra_metrics=lambda: {
+            "user_cache": user_cache.stats(),
+            "events": event_writer.stats(),
+            "notify": notifier.stats(),
+            # Served by the supervisor at /metrics
+            "prometheus": registry.collect(),
+        },
+    )
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    try:
+        await worker.serve()
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+
+
+async def main() -> None:
+    settings = get_settings()
+
+    # Initialize DB (creates tables if missing)
+    await init_db()
+
+    if settings.workers > 1:
+        await run_supervisor(settings)
+        return
+
+    bot = Bot(token=settings.bot_token, session=MarkupCachingSession())
+    dp = create_dispatcher()
+    setup_metrics(bot)
+
+    app = create_web_app()
+    registry.register(app)
+    # Not ready until on_startup has run
+    health.set("bot", False)
+    if settings.bot_mode == "webhook":
+        register_webhook(app, dp, bot, settings)
+
+    runner = await start_web_server(app)
     try:
-        await dp.start_polling(bot)
+        if settings.bot_mode == "webhook":
+            await run_webhook(dp, bot, settings)
+        else:
+            await run_polling(dp, bot)
     finally:
         await runner.cleanup()
         await bot.session.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if len(sys.argv) == 3 and sys.argv[1] == "--worker":
+        asyncio.run(run_worker(int(sys.argv[2])))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,126 @@
+"""Baseline schema.
+
+Databases created by the old ``Base.metadata.create_all`` call already have
+some or all of these tables, so every table and column is only created when
+it is missing. Older ``bot.db`` files also lack the ``users`` activity
+columns, which are added here.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tables() -> list[sa.Table]:
+    meta = sa.MetaData()
+    return [
+        sa.Table(
+            "users", meta,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=False),
+            sa.Column("username", sa.String(255), nullable=True),
+            sa.Column("phone", sa.String(30), nullable=True),
+            sa.Column("first_seen_at", sa.DateTime, nullable=True),
+            sa.Column("last_seen_at", sa.DateTime, nullable=True),
+            sa.Column("games", sa.Text, nullable=True),
+        ),
+        sa.Table(
+            "game_results", meta,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("tg_user_id", sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("game_id", sa.String(100), nullable=False),
+            sa.Column("score", sa.Integer, nullable=False),
+            sa.Column("raw_payload", sa.Text, nullable=True),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+        ),
+        sa.Table(
+            "game_scores", meta,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("game_id", sa.String(100), nullable=False),
+            sa.Column("score", sa.Integer, nullable=False),
+            sa.Column("duration_sec", sa.Integer, nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+        ),
+        sa.Table(
+            "leads", meta,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("tg_user_id", sa.Integer, nullable=False),
+            sa.Column("child_name", sa.String(255), nullable=False),
+            sa.Column("child_age", sa.String(10), nullable=True),
+            sa.Column("interest", sa.String(100), nullable=True),
+            sa.Column("comment", sa.Text, nullable=True),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+            sa.Column("status", sa.String(30), nullable=False),
+        ),
+        sa.Table(
+            "bill_requests", meta,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("tg_user_id", sa.Integer, nullable=False),
+            sa.Column("phone", sa.String(30), nullable=True),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+            sa.Column("status", sa.String(30), nullable=False),
+        ),
+        sa.Table(
+            "b2b_requests", meta,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("tg_user_id", sa.Integer, nullable=False),
+            sa.Column("business_type", sa.String(100), nullable=True),
+            sa.Column("city", sa.String(100), nullable=True),
+            sa.Column("contact", sa.String(255), nullable=True),
+            sa.Column("comment", sa.Text, nullable=True),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+            sa.Column("status", sa.String(30), nullable=False),
+        ),
+        sa.Table(
+            "events", meta,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("ts", sa.String(30), nullable=False),
+            sa.Column("tenant_id", sa.String(50), nullable=False),
+            sa.Column("bot_id", sa.String(50), nullable=False),
+            sa.Column("tg_id", sa.String(30), nullable=False),
+            sa.Column("event_name", sa.String(100), nullable=False),
+            sa.Column("meta", sa.Text, nullable=True),
+        ),
+        sa.Table(
+            "reminders", meta,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("tg_id", sa.Integer, nullable=False),
+            sa.Column("tenant_id", sa.String(50), nullable=False),
+            sa.Column("bot_id", sa.String(50), nullable=False),
+            sa.Column("enabled", sa.Integer, nullable=False),
+            sa.Column("mode", sa.String(50), nullable=False),
+            sa.Column("next_remind_at", sa.String(30), nullable=False),
+            sa.Column("created_at", sa.String(30), nullable=False),
+            sa.Column("updated_at", sa.String(30), nullable=False),
+        ),
+    ]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+
+    for table in _tables():
+        if table.name not in existing:
+            table.create(bind)
+            continue
+        # Table predates this migration: add columns the old schema lacked
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in present and column.nullable:
+                op.add_column(table.name, sa.Column(column.name, column.type, nullable=True))
+
+
+def downgrade() -> None:
+    for table in reversed(_tables()):
+        op.drop_table(table.name)
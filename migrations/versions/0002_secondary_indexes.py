@@ -0,0 +1,34 @@
+"""Secondary indexes for the hot read paths.
+
+- game_results(tg_user_id, score): "🏆 Мой результат" top scores per user
+- events(ts), events(tenant_id, bot_id, ts): scripts/report.py time windows
+- reminders(tenant_id, bot_id, enabled, next_remind_at): due reminders
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_game_results_user_score", "game_results", ["tg_user_id", "score"])
+    op.create_index("ix_events_ts", "events", ["ts"])
+    op.create_index("ix_events_tenant_bot_ts", "events", ["tenant_id", "bot_id", "ts"])
+    op.create_index(
+        "ix_reminders_due", "reminders", ["tenant_id", "bot_id", "enabled", "next_remind_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reminders_due", table_name="reminders")
+    op.drop_index("ix_events_tenant_bot_ts", table_name="events")
+    op.drop_index("ix_events_ts", table_name="events")
+    op.drop_index("ix_game_results_user_score", table_name="game_results")
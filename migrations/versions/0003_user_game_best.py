@@ -0,0 +1,45 @@
+"""Per-user, per-game best score aggregate.
+
+Backfilled once from game_results and the legacy game_scores table.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_game_best",
+        sa.Column("tg_user_id", sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("game_id", sa.String(100), nullable=False),
+        sa.Column("best_score", sa.Integer, nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("last_played_at", sa.DateTime, nullable=False),
+        sa.PrimaryKeyConstraint("tg_user_id", "game_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO user_game_best (tg_user_id, game_id, best_score, attempts, last_played_at)
+        SELECT tg_user_id, game_id, MAX(score), COUNT(*), MAX(created_at)
+        FROM (
+            SELECT tg_user_id, game_id, score, created_at FROM game_results
+            UNION ALL
+            SELECT user_id, game_id, score, created_at FROM game_scores
+        ) AS history
+        GROUP BY tg_user_id, game_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_game_best")
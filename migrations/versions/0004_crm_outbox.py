@@ -0,0 +1,40 @@
+"""Transactional outbox for AlfaCRM sync.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "crm_outbox",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("kind", sa.String(20), nullable=False),
+        sa.Column("ref_id", sa.Integer, nullable=False),
+        sa.Column("idempotency_key", sa.String(64), nullable=False, unique=True),
+        sa.Column("payload", sa.Text, nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime, nullable=False),
+        sa.Column("locked_until", sa.DateTime, nullable=True),
+        sa.Column("external_id", sa.Integer, nullable=True),
+        sa.Column("last_error", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_crm_outbox_due", "crm_outbox", ["status", "next_attempt_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_crm_outbox_due", table_name="crm_outbox")
+    op.drop_table("crm_outbox")
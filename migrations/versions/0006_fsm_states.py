@@ -0,0 +1,32 @@
+"""Persistent FSM state.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fsm_states",
+        sa.Column("key", sa.String(255), primary_key=True),
+        sa.Column("state", sa.String(255), nullable=True),
+        sa.Column("data", sa.Text, nullable=True),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+        sa.Column("expires_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_fsm_states_expires_at", "fsm_states", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_fsm_states_expires_at", table_name="fsm_states")
+    op.drop_table("fsm_states")
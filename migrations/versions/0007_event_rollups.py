@@ -0,0 +1,52 @@
+"""Daily event rollups.
+
+Tables start empty; scripts/rollup.py (or scripts/report.py) fills them
+from the events table on its first run.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rollup_daily_counts",
+        sa.Column("day", sa.String(10), nullable=False),
+        sa.Column("tenant_id", sa.String(50), nullable=False),
+        sa.Column("bot_id", sa.String(50), nullable=False),
+        sa.Column("event_name", sa.String(100), nullable=False),
+        sa.Column("game_id", sa.String(100), nullable=False),
+        sa.Column("events", sa.Integer, nullable=False),
+        sa.PrimaryKeyConstraint("day", "tenant_id", "bot_id", "event_name", "game_id"),
+    )
+    op.create_table(
+        "rollup_daily_users",
+        sa.Column("day", sa.String(10), nullable=False),
+        sa.Column("tenant_id", sa.String(50), nullable=False),
+        sa.Column("bot_id", sa.String(50), nullable=False),
+        sa.Column("event_name", sa.String(100), nullable=False),
+        sa.Column("sketch", sa.LargeBinary, nullable=False),
+        sa.PrimaryKeyConstraint("day", "tenant_id", "bot_id", "event_name"),
+    )
+    op.create_table(
+        "rollup_state",
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("last_event_id", sa.Integer, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rollup_state")
+    op.drop_table("rollup_daily_users")
+    op.drop_table("rollup_daily_counts")
@@ -0,0 +1,64 @@
+"""Typed event log with interned event names.
+
+Only creates the tables: legacy ``events`` rows are moved into
+``event_log`` in small batches while the bot runs (core.events.migrate),
+keeping their ids. The id counter of ``event_log`` starts after the last
+legacy id so new events never collide with rows still waiting to move.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "event_names",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("name", sa.String(100), nullable=False, unique=True),
+    )
+    op.create_table(
+        "event_log",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("ts", sa.Integer, nullable=False),
+        sa.Column("tenant_id", sa.String(50), nullable=False),
+        sa.Column("bot_id", sa.String(50), nullable=False),
+        sa.Column("tg_id", sa.Integer, nullable=False),
+        sa.Column("name_id", sa.Integer, sa.ForeignKey("event_names.id"), nullable=False),
+        sa.Column("game_id", sa.String(100), nullable=True),
+        sa.Column("session_id", sa.String(36), nullable=True),
+        sa.Column("score", sa.Integer, nullable=True),
+        sa.Column("meta", sa.Text, nullable=True),
+        sqlite_autoincrement=True,
+    )
+    op.create_index("ix_event_log_ts", "event_log", ["ts"])
+    op.create_index("ix_event_log_tenant_bot_ts", "event_log", ["tenant_id", "bot_id", "ts"])
+
+    bind = op.get_bind()
+    last_id = bind.execute(sa.text("SELECT COALESCE(MAX(id), 0) FROM events")).scalar()
+    if not last_id:
+        return
+    if bind.dialect.name == "sqlite":
+        bind.execute(
+            sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('event_log', :seq)"), {"seq": last_id}
+        )
+    elif bind.dialect.name == "postgresql":
+        bind.execute(
+            sa.text("SELECT setval(pg_get_serial_sequence('event_log', 'id'), :seq)"), {"seq": last_id}
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_event_log_tenant_bot_ts", table_name="event_log")
+    op.drop_index("ix_event_log_ts", table_name="event_log")
+    op.drop_table("event_log")
+    op.drop_table("event_names")
@@ -0,0 +1,23 @@
+"""Index event_log(session_id): POST /api/results looks up the game.opened
+event of each submitted session.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_event_log_session_id", "event_log", ["session_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_event_log_session_id", table_name="event_log")
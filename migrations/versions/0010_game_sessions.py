@@ -0,0 +1,47 @@
+"""Game session registry and one result per session.
+
+- game_sessions: sessions handed out with "🎮 Запустить игру" buttons
+- game_results.session_id (unique) and duration_sec
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "game_sessions",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("tg_user_id", sa.Integer, nullable=False),
+        sa.Column("game_id", sa.String(100), nullable=False),
+        sa.Column("opened_at", sa.Integer, nullable=False),
+        sa.Column("finished_at", sa.Integer, nullable=True),
+    )
+    op.create_index("ix_game_sessions_user_opened", "game_sessions", ["tg_user_id", "opened_at"])
+    op.create_index("ix_game_sessions_opened_at", "game_sessions", ["opened_at"])
+
+    with op.batch_alter_table("game_results") as batch:
+        batch.add_column(sa.Column("session_id", sa.String(36), nullable=True))
+        batch.add_column(sa.Column("duration_sec", sa.Integer, nullable=True))
+        batch.create_index("ux_game_results_session_id", ["session_id"], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("game_results") as batch:
+        batch.drop_index("ux_game_results_session_id")
+        batch.drop_column("duration_sec")
+        batch.drop_column("session_id")
+
+    op.drop_index("ix_game_sessions_opened_at", table_name="game_sessions")
+    op.drop_index("ix_game_sessions_user_opened", table_name="game_sessions")
+    op.drop_table("game_sessions")
@@ -4,9 +4,10 @@ import json
 import logging
 import os
 from datetime import datetime
+from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func, select
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, LargeBinary, String, Text, event, func, select
 from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -52,6 +53,11 @@ class User(Base):
 class GameResult(Base):
     """New table for game results per ТЗ section 11."""
     __tablename__ = "game_results"
+    __table_args__ = (
+        Index("ix_game_results_user_score", "tg_user_id", "score"),
+        # At most one result per game session (NULL for results without one)
+        Index("ux_game_results_session_id", "session_id", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tg_user_id: Mapped[int] = mapped_column(
@@ -63,10 +69,51 @@ class GameResult(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, nullable=False
     )
+    session_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+    # Seconds from opening the game to the result
+    duration_sec: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
     user: Mapped[User] = relationship(back_populates="game_results")
 
 
+# ---------------------------------------------------------------------------
+# Game sessions: one per "🎮 Запустить игру" button (core.games.sessions)
+# ---------------------------------------------------------------------------
+
+class GameSession(Base):
+    __tablename__ = "game_sessions"
+    __table_args__ = (
+        Index("ix_game_sessions_user_opened", "tg_user_id", "opened_at"),
+        Index("ix_game_sessions_opened_at", "opened_at"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    tg_user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    game_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    # Unix seconds
+    opened_at: Mapped[int] = mapped_column(Integer, nullable=False)
+    finished_at: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+
+# ---------------------------------------------------------------------------
+# Best score per user and game — maintained alongside game_results
+# ---------------------------------------------------------------------------
+
+class UserGameBest(Base):
+    """Aggregate of game_results, updated in the same transaction as each insert."""
+    __tablename__ = "user_game_best"
+
+    tg_user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    game_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    best_score: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_played_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+
+
 # ---------------------------------------------------------------------------
 # Legacy GameScore — kept so existing DB rows are not lost
 # ---------------------------------------------------------------------------
@@ -141,11 +188,126 @@ class B2bRequest(Base):
 
 
 # ---------------------------------------------------------------------------
-# Legacy Event table — kept for existing analytics data
+# CRM outbox — rows waiting to be pushed to AlfaCRM (core/crm/outbox.py)
+# ---------------------------------------------------------------------------
+
+class CrmOutbox(Base):
+    __tablename__ = "crm_outbox"
+    __table_args__ = (
+        Index("ix_crm_outbox_due", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    ref_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    idempotency_key: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    external_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+
+
+# ---------------------------------------------------------------------------
+# Broadcasts
+# ---------------------------------------------------------------------------
+
+class Broadcast(Base):
+    """Admin campaign sent to every user; last_user_id is the resume cursor."""
+
+    __tablename__ = "broadcasts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    parse_mode: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
+    # pending / running / done / cancelled
+    status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)
+    created_by: Mapped[int] = mapped_column(Integer, nullable=False)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_user_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    sent: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    blocked: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, nullable=False
+    )
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+# ---------------------------------------------------------------------------
+# FSM state (core.fsm.SQLAlchemyStorage)
+# ---------------------------------------------------------------------------
+
+class FsmState(Base):
+    __tablename__ = "fsm_states"
+    __table_args__ = (
+        Index("ix_fsm_states_expires_at", "expires_at"),
+    )
+
+    # "<bot_id>:<chat_id>:<user_id>[:<thread_id>...]"
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    data: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+# ---------------------------------------------------------------------------
+# Analytic events (core.events): epoch ts, interned names, typed game fields
+# ---------------------------------------------------------------------------
+
+class EventName(Base):
+    __tablename__ = "event_names"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+
+
+class EventRecord(Base):
+    __tablename__ = "event_log"
+    __table_args__ = (
+        Index("ix_event_log_ts", "ts"),
+        Index("ix_event_log_tenant_bot_ts", "tenant_id", "bot_id", "ts"),
+        Index("ix_event_log_session_id", "session_id"),
+        # ids continue after the legacy events table, never reused
+        {"sqlite_autoincrement": True},
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Unix time, seconds, UTC
+    ts: Mapped[int] = mapped_column(Integer, nullable=False)
+    tenant_id: Mapped[str] = mapped_column(String(50), nullable=False)
+    bot_id: Mapped[str] = mapped_column(String(50), nullable=False)
+    tg_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    name_id: Mapped[int] = mapped_column(Integer, ForeignKey("event_names.id"), nullable=False)
+    game_id: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    session_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+    score: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # Remaining fields as JSON, NULL when there are none
+    meta: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+
+# ---------------------------------------------------------------------------
+# Legacy Event table — drained into event_log by core.events.migrate
 # ---------------------------------------------------------------------------
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        Index("ix_events_ts", "ts"),
+        Index("ix_events_tenant_bot_ts", "tenant_id", "bot_id", "ts"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     ts: Mapped[str] = mapped_column(String(30))
@@ -156,12 +318,52 @@ class Event(Base):
     meta: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
 
+# ---------------------------------------------------------------------------
+# Daily event rollups (core.analytics.rollup), fed incrementally from events
+# ---------------------------------------------------------------------------
+
+class RollupDailyCount(Base):
+    __tablename__ = "rollup_daily_counts"
+
+    # UTC date, "YYYY-MM-DD"
+    day: Mapped[str] = mapped_column(String(10), primary_key=True)
+    tenant_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    bot_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    event_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    # "" for events without a game
+    game_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    events: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class RollupDailyUsers(Base):
+    """HyperLogLog sketch of the distinct tg_ids per day and event (all games)."""
+    __tablename__ = "rollup_daily_users"
+
+    day: Mapped[str] = mapped_column(String(10), primary_key=True)
+    tenant_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    bot_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    event_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    sketch: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+class RollupState(Base):
+    """High-water mark: events with id <= last_event_id are already rolled up."""
+    __tablename__ = "rollup_state"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    last_event_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
 # ---------------------------------------------------------------------------
 # Legacy Reminder table — kept for existing data
 # ---------------------------------------------------------------------------
 
 class Reminder(Base):
     __tablename__ = "reminders"
+    __table_args__ = (
+        Index("ix_reminders_due", "tenant_id", "bot_id", "enabled", "next_remind_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tg_id: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -178,13 +380,73 @@ class Reminder(Base):
 # DB engine
 # ---------------------------------------------------------------------------
 
-engine = create_async_engine(settings.database_url, echo=False)
+_SQLITE_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SQLITE_SYNCHRONOUS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return _is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith(":"))
+
+
+def _engine_kwargs(url: str) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"echo": False}
+    if _is_sqlite(url) and not _is_sqlite_memory(url):
+        # aiosqlite runs each connection in its own thread; a small pool of
+        # long-lived connections keeps the per-connection PRAGMAs and page cache
+        kwargs.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+        )
+    return kwargs
+
+
+def _apply_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    journal_mode = settings.sqlite_journal_mode
+    if journal_mode not in _SQLITE_JOURNAL_MODES:
+        journal_mode = "WAL"
+    synchronous = settings.sqlite_synchronous
+    if synchronous not in _SQLITE_SYNCHRONOUS:
+        synchronous = "NORMAL"
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{abs(int(settings.sqlite_cache_size_kib))}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+engine = create_async_engine(settings.database_url, **_engine_kwargs(settings.database_url))
+if _is_sqlite(settings.database_url):
+    event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 
+_PROJECT_ROOT = Path(__file__).resolve().parent
+
+
+def _run_migrations(connection: Any) -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    cfg = Config(str(_PROJECT_ROOT / "alembic.ini"))
+    cfg.set_main_option("script_location", str(_PROJECT_ROOT / "migrations"))
+    cfg.attributes["connection"] = connection
+    command.upgrade(cfg, "head")
+
+
 async def init_db() -> None:
+    """Bring the schema up to date via Alembic migrations (migrations/)."""
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_run_migrations)
 
 
 # ---------------------------------------------------------------------------
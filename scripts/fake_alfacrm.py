@@ -0,0 +1,144 @@
+"""Fake local AlfaCRM server for testing the async CRM client and outbox.
+
+Implements the handful of v2api endpoints the bot uses and can inject
+failures, rate limits and latency:
+
+    python scripts/fake_alfacrm.py --port 8081 --fail-rate 0.2 --latency 0.1
+
+then point the bot at it:
+
+    ALFACRM_DOMAIN=http://127.0.0.1:8081 ALFACRM_EMAIL=test@example.com ALFACRM_TOKEN=test
+
+Use ``create_app()`` to embed it in an aiohttp test server.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import random
+import secrets
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+
+@dataclass
+class FakeAlfaCRMState:
+    email: str = "test@example.com"
+    api_key: str = "test"
+    # Probability of answering 500 / 429 instead of handling the request
+    fail_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    latency: float = 0.0
+    # Older CRMs have no lead API; the client then falls back to customers
+    lead_api: bool = True
+
+    tokens: set = field(default_factory=set)
+    leads: List[Dict[str, Any]] = field(default_factory=list)
+    customers: List[Dict[str, Any]] = field(default_factory=list)
+    logins: int = 0
+    requests: int = 0
+    _ids: Any = field(default_factory=lambda: itertools.count(1))
+
+
+STATE_KEY = web.AppKey("fake_alfacrm_state", FakeAlfaCRMState)
+
+
+@web.middleware
+async def chaos_middleware(request: web.Request, handler: Any) -> web.StreamResponse:
+    state = request.app[STATE_KEY]
+    state.requests += 1
+    if state.latency:
+        await asyncio.sleep(state.latency)
+    if state.fail_rate and random.random() < state.fail_rate:
+        return web.json_response({"error": "internal"}, status=500)
+    if state.rate_limit_rate and random.random() < state.rate_limit_rate:
+        return web.json_response({"error": "too many requests"}, status=429, headers={"Retry-After": "0.1"})
+    return await handler(request)
+
+
+def _authorized(request: web.Request) -> bool:
+    return request.headers.get("X-ALFACRM-TOKEN") in request.app[STATE_KEY].tokens
+
+
+async def login(request: web.Request) -> web.Response:
+    state = request.app[STATE_KEY]
+    body = await request.json()
+    if body.get("email") != state.email or body.get("api_key") != state.api_key:
+        return web.json_response({"name": "Unauthorized", "message": "Access denied"}, status=401)
+    state.logins += 1
+    token = secrets.token_hex(16)
+    state.tokens.add(token)
+    return web.json_response({"token": token})
+
+
+async def branch_index(request: web.Request) -> web.Response:
+    if not _authorized(request):
+        return web.json_response({"message": "Access denied"}, status=401)
+    return web.json_response({
+        "total": 1,
+        "count": 1,
+        "page": 0,
+        "items": [{"id": 1, "name": "Fake branch", "is_active": 1}],
+    })
+
+
+async def lead_create(request: web.Request) -> web.Response:
+    state = request.app[STATE_KEY]
+    if not _authorized(request):
+        return web.json_response({"message": "Access denied"}, status=401)
+    if not state.lead_api:
+        return web.json_response({"message": "Not Found"}, status=404)
+    body = await request.json()
+    lead = {"id": next(state._ids), "branch_id": int(request.match_info["branch_id"]), **body}
+    state.leads.append(lead)
+    return web.json_response({"success": True, "model": lead})
+
+
+async def customer_create(request: web.Request) -> web.Response:
+    state = request.app[STATE_KEY]
+    if not _authorized(request):
+        return web.json_response({"message": "Access denied"}, status=401)
+    body = await request.json()
+    customer = {"id": next(state._ids), "branch_id": int(request.match_info["branch_id"]), **body}
+    state.customers.append(customer)
+    return web.json_response({"success": True, "model": customer})
+
+
+def create_app(state: FakeAlfaCRMState | None = None) -> web.Application:
+    app = web.Application(middlewares=[chaos_middleware])
+    app[STATE_KEY] = state or FakeAlfaCRMState()
+    app.router.add_post("/v2api/auth/login", login)
+    app.router.add_post("/v2api/branch/index", branch_index)
+    app.router.add_post("/v2api/{branch_id:\\d+}/lead/create", lead_create)
+    app.router.add_post("/v2api/{branch_id:\\d+}/customer/create", customer_create)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--email", default="test@example.com")
+    parser.add_argument("--api-key", default="test")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--no-lead-api", action="store_true")
+    args = parser.parse_args()
+
+    state = FakeAlfaCRMState(
+        email=args.email,
+        api_key=args.api_key,
+        fail_rate=args.fail_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        latency=args.latency,
+        lead_api=not args.no_lead_api,
+    )
+    web.run_app(create_app(state), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
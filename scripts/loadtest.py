@@ -0,0 +1,348 @@
+"""Load test: synthetic Telegram updates through the real Dispatcher.
+
+Builds ``Update`` objects for thousands of simulated users and feeds them
+to ``Dispatcher.feed_update`` with all routers, middlewares and background
+jobs of the bot, against a throwaway SQLite database. The Bot API is
+replaced by an in-process session (no network), optionally with a fixed
+latency. Each user's updates are handled in order, users run concurrently.
+
+Per scenario it reports throughput, p50/p95/p99 latency per update and
+how many DB commits and Bot API calls the scenario cost.
+
+Scenarios:
+    start  — /start (greeting, game session opened)
+    menu   — "🎮 Играть", game button, "🏆 Мой результат", /top, back to menu
+    lead   — the whole "📝 Записаться / пробное" form (LeadStates)
+    game   — /start, then a web_app_data result for the opened game
+    mixed  — all of the above for different users, interleaved
+
+Usage:
+    python scripts/loadtest.py                           # every scenario, 1000 users
+    python scripts/loadtest.py --users 5000 --scenario lead --scenario game
+    python scripts/loadtest.py --tg-latency 0.05 --concurrency 200
+    python scripts/loadtest.py --format json > loadtest_baseline.json
+    python scripts/loadtest.py --check loadtest_baseline.json   # exit 1 on regression
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+SCENARIOS = ("start", "menu", "lead", "game", "mixed")
+FIRST_USER_ID = 7_000_000_000
+
+logger = logging.getLogger("loadtest")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay synthetic updates through the Dispatcher")
+    parser.add_argument("--users", type=int, default=1000, help="simulated users per scenario")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="repeatable; default: all")
+    parser.add_argument("--concurrency", type=int, default=100, help="users handled at the same time")
+    parser.add_argument("--tg-latency", type=float, default=0.0, help="seconds per fake Bot API call")
+    parser.add_argument("--db", help="SQLite file to use (default: a fresh temporary one)")
+    parser.add_argument("--throttle", action="store_true", help="keep the per-user throttling middleware on")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    parser.add_argument("--check", metavar="BASELINE", help="compare with a saved --format json run")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown vs the baseline (default 0.25)")
+    return parser.parse_args()
+
+
+def _configure_env(args: argparse.Namespace) -> None:
+    """Must run before the bot's modules are imported: they read settings at import."""
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "loadtest.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.abspath(db_path)}"
+    os.environ.setdefault("BOT_TOKEN", "123456:LOADTEST")
+    os.environ["BOT_MODE"] = "polling"
+    os.environ.pop("WORKERS", None)
+    # Admin notifications (new leads) go through the notifier to the fake Bot API
+    os.environ.setdefault("ADMIN_TG_ID", "1")
+    # Never talk to a real CRM from a load test
+    for name in ("ALFACRM_DOMAIN", "ALFACRM_EMAIL", "ALFACRM_TOKEN"):
+        os.environ.pop(name, None)
+    if not args.throttle:
+        os.environ["THROTTLE_RATE"] = "0"
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from aiogram import Bot
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import SendMessage, TelegramMethod
+    from aiogram.types import CallbackQuery, Chat, Message, Update, User, WebAppData
+
+    import main as bot_main
+    from config import get_settings
+    from core.events import event_writer
+    from core.games import catalog
+    from core.metrics import DB_COMMITS, instrument_engine
+    from core.users import user_cache
+    from models import engine, init_db
+
+    class LoadTestSession(BaseSession):
+        """Answers every Bot API call locally, like Telegram would."""
+
+        def __init__(self, latency: float = 0.0) -> None:
+            super().__init__()
+            self.latency = latency
+            self.calls = 0
+            self._message_ids = iter(range(1, 10 ** 12))
+
+        async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+            self.calls += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if isinstance(method, SendMessage):
+                return Message(
+                    message_id=next(self._message_ids),
+                    date=datetime.now(),
+                    chat=Chat(id=int(method.chat_id), type="private"),
+                    text=method.text,
+                )
+            return True
+
+        async def stream_content(self, *args: Any, **kwargs: Any) -> AsyncGenerator[bytes, None]:
+            # No handler downloads files, so there is never anything to stream
+            return
+            yield b""
+
+        async def close(self) -> None:
+            pass
+
+    await init_db()
+    settings = get_settings()
+    session = LoadTestSession(args.tg_latency)
+    bot = Bot(token=settings.bot_token, session=session)
+    dp = bot_main.create_dispatcher()
+    instrument_engine(engine)
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    games = [game["id"] for game in catalog.enabled if game["id"] in settings.game_paths] or ["loadtest"]
+    rng = random.Random(args.seed)
+    update_ids = iter(range(1, 10 ** 12))
+
+    # ------------------------------------------------------------------
+    # Update builders
+    # ------------------------------------------------------------------
+
+    def _user(user_id: int) -> User:
+        return User(id=user_id, is_bot=False, first_name="Load", last_name=str(user_id), username=f"lt{user_id}")
+
+    def text(user_id: int, value: str) -> Update:
+        message = Message(
+            message_id=next(update_ids),
+            date=datetime.now(),
+            chat=Chat(id=user_id, type="private"),
+            from_user=_user(user_id),
+            text=value,
+        )
+        return Update(update_id=message.message_id, message=message)
+
+    def callback(user_id: int, data: str) -> Update:
+        update_id = next(update_ids)
+        message = Message(message_id=update_id, date=datetime.now(), chat=Chat(id=user_id, type="private"), text="…")
+        query = CallbackQuery(
+            id=str(update_id), from_user=_user(user_id), chat_instance=str(user_id), data=data, message=message
+        )
+        return Update(update_id=update_id, callback_query=query)
+
+    def web_app_result(user_id: int, score: int) -> Update:
+        message = Message(
+            message_id=next(update_ids),
+            date=datetime.now(),
+            chat=Chat(id=user_id, type="private"),
+            from_user=_user(user_id),
+            web_app_data=WebAppData(data=json.dumps({"score": score}), button_text="🎮"),
+        )
+        return Update(update_id=message.message_id, message=message)
+
+    # Lazily built: later steps depend on nothing but the user id
+    flows: Dict[str, Callable[[int], List[Callable[[], Update]]]] = {
+        "start": lambda uid: [lambda: text(uid, "/start")],
+        "menu": lambda uid: [
+            lambda: text(uid, "🎮 Играть"),
+            lambda: callback(uid, f"game_{rng.choice(games)}"),
+            lambda: text(uid, "🏆 Мой результат"),
+            lambda: text(uid, "/top"),
+            lambda: callback(uid, "go_menu"),
+        ],
+        "lead": lambda uid: [
+            lambda: text(uid, "📝 Записаться / пробное"),
+            lambda: text(uid, rng.choice(["Маша", "Петя", "Алиса", "Тимур"])),
+            lambda: text(uid, str(rng.randint(6, 14))),
+            lambda: text(uid, rng.choice(["💻 Программирование", "🤖 Робототехника", "🎮 Игры", "🤷 Не знаю"])),
+            lambda: text(uid, "⏭ Пропустить"),
+        ],
+        "game": lambda uid: [
+            lambda: text(uid, "/start"),
+            lambda: web_app_result(uid, rng.randint(0, 5000)),
+        ],
+    }
+
+    # ------------------------------------------------------------------
+    # Runner
+    # ------------------------------------------------------------------
+
+    def db_commits() -> float:
+        return sum(value for _, _, value in DB_COMMITS.family()[3])
+
+    async def drain() -> None:
+        """Write out what the bot buffers, so commits land in the scenario that caused them."""
+        while event_writer.stats()["pending"]:
+            if not await event_writer.flush():
+                break
+        await user_cache.flush()
+        flush_storage = getattr(dp.storage, "flush", None)
+        if flush_storage is not None:
+            await flush_storage()
+
+    async def run_scenario(name: str, first_user: int) -> Dict[str, Any]:
+        users = range(first_user, first_user + args.users)
+        if name == "mixed":
+            kinds = [k for k in flows]
+            plans = [(uid, flows[kinds[i % len(kinds)]](uid)) for i, uid in enumerate(users)]
+        else:
+            plans = [(uid, flows[name](uid)) for uid in users]
+
+        latencies: List[float] = []
+        errors = 0
+        slots = asyncio.Semaphore(max(1, args.concurrency))
+
+        async def play(steps: List[Callable[[], Update]]) -> None:
+            nonlocal errors
+            async with slots:
+                for step in steps:
+                    update = step()
+                    started = time.perf_counter()
+                    try:
+                        await dp.feed_update(bot, update)
+                    except Exception as e:
+                        errors += 1
+                        logger.debug(f"update failed: {e}")
+                    latencies.append(time.perf_counter() - started)
+
+        commits_before = db_commits()
+        calls_before = session.calls
+        started = time.perf_counter()
+        await asyncio.gather(*(play(steps) for _, steps in plans))
+        elapsed = time.perf_counter() - started
+        await drain()
+        commits = db_commits() - commits_before
+
+        latencies.sort()
+        updates = len(latencies)
+        return {
+            "scenario": name,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "tg_latency": args.tg_latency,
+            "updates": updates,
+            "errors": errors,
+            "seconds": round(elapsed, 3),
+            "updates_per_sec": round(updates / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "db_commits": int(commits),
+            "commits_per_update": round(commits / updates, 3) if updates else 0.0,
+            "telegram_calls": session.calls - calls_before,
+        }
+
+    results = []
+    try:
+        for i, name in enumerate(args.scenario or SCENARIOS):
+            # Fresh users per scenario: nobody starts in another scenario's FSM state
+            results.append(await run_scenario(name, FIRST_USER_ID + i * 10 ** 7))
+            logger.info(f"{name}: done")
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        await engine.dispose()
+    return results
+
+
+def _print_text(results: List[Dict[str, Any]]) -> None:
+    header = f"{'scenario':<8} {'updates':>8} {'err':>4} {'upd/s':>9} {'p50 ms':>8} {'p95 ms':>8} " \
+             f"{'p99 ms':>8} {'commits':>8} {'c/upd':>6} {'tg calls':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['scenario']:<8} {r['updates']:>8} {r['errors']:>4} {r['updates_per_sec']:>9} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['db_commits']:>8} "
+              f"{r['commits_per_update']:>6} {r['telegram_calls']:>9}")
+
+
+def _check(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Regressions against a saved run: slower, more commits per update, or new errors."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)}
+    problems = []
+    for r in results:
+        base = baseline.get(r["scenario"])
+        if base is None:
+            continue
+        if (base.get("concurrency"), base.get("tg_latency")) != (r["concurrency"], r["tg_latency"]):
+            logger.warning(f"{r['scenario']}: baseline was run with other --concurrency/--tg-latency, "
+                           f"latencies are not comparable")
+        if r["updates_per_sec"] < base["updates_per_sec"] * (1 - tolerance):
+            problems.append(f"{r['scenario']}: throughput {r['updates_per_sec']}/s vs {base['updates_per_sec']}/s")
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{r['scenario']}: p95 {r['p95_ms']} ms vs {base['p95_ms']} ms")
+        if r["commits_per_update"] > base["commits_per_update"] * (1 + tolerance) + 0.01:
+            problems.append(
+                f"{r['scenario']}: {r['commits_per_update']} commits/update vs {base['commits_per_update']}"
+            )
+        if r["errors"] > base["errors"]:
+            problems.append(f"{r['scenario']}: {r['errors']} failed updates vs {base['errors']}")
+    return problems
+
+
+def main() -> int:
+    args = _parse_args()
+    _configure_env(args)
+    # The bot logs every send and every event at INFO; keep the report readable
+    logging.basicConfig(level=logging.WARNING, format="%(message)s", stream=sys.stderr)
+    logger.setLevel(logging.INFO)
+
+    results = asyncio.run(run(args))
+
+    if args.format == "json":
+        json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        _print_text(results)
+
+    if args.check:
+        problems = _check(results, args.check, args.tolerance)
+        for problem in problems:
+            logger.error(f"REGRESSION {problem}")
+        if problems:
+            return 1
+        logger.info(f"No regressions against {args.check}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
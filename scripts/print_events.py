@@ -25,16 +25,11 @@ def _get_db_path() -> str:
     return "bot.db"
 
 
-CREATE_EVENTS_SQL = """
-CREATE TABLE IF NOT EXISTS events (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  ts TEXT NOT NULL,
-  tenant_id TEXT NOT NULL,
-  bot_id TEXT NOT NULL,
-  tg_id TEXT NOT NULL,
-  event_name TEXT NOT NULL,
-  meta TEXT
-);
+LAST_EVENTS_SQL = """
+SELECT l.id, datetime(l.ts, 'unixepoch') AS ts, l.tenant_id, l.bot_id, l.tg_id,
+       n.name AS event_name, l.game_id, l.session_id, l.score, l.meta
+FROM event_log AS l JOIN event_names AS n ON n.id = l.name_id
+ORDER BY l.id DESC LIMIT 5
 """
 
 def main() -> None:
@@ -42,16 +37,10 @@ def main() -> None:
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
-    # Ensure table exists (idempotent)
-    cursor.execute(CREATE_EVENTS_SQL)
-    conn.commit()
-
     try:
-        cursor.execute("SELECT * FROM events ORDER BY id DESC LIMIT 5")
+        cursor.execute(LAST_EVENTS_SQL)
         rows = cursor.fetchall()
-
-        cursor.execute("PRAGMA table_info(events)")
-        headers = [col[1] for col in cursor.fetchall()]
+        headers = [col[0] for col in cursor.description]
 
         if not rows:
             print(f"No events found in {db_path}.")
@@ -65,7 +54,7 @@ def main() -> None:
             print(row)
 
     except sqlite3.OperationalError as e:
-        print(f"Error reading events table: {e}")
+        print(f"Error reading event_log (run `alembic upgrade head`?): {e}")
     finally:
         conn.close()
 
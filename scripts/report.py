@@ -1,11 +1,24 @@
-"""Analytics report from the bot database (events table)."""
-
+"""Analytics report from the bot database (event log).
+
+Reads the daily rollups (refreshed from new events first); pass --raw to
+count straight from the event log instead.
+
+Usage:
+    python scripts/report.py                       # last 7 days (or $DAYS)
+    python scripts/report.py --raw --from 2026-01-01T12:00
+    python scripts/report.py --from 2026-01-01 --to 2026-02-01
+    python scripts/report.py --days 30 --format json
+    python scripts/report.py --format csv > report.csv
+    python scripts/report.py --events --from 2026-01-01 > events.csv
+"""
+
+import argparse
+import csv
 import json
 import logging
 import os
 import sqlite3
 import sys
-from collections import Counter
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
@@ -13,161 +26,143 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
-logging.basicConfig(level=logging.INFO, format="%(message)s")
+from core.analytics import (
+    EVENT_COLUMNS,
+    EventFilter,
+    build_report,
+    build_rollup_report,
+    connect,
+    db_path_from_env,
+    iter_events,
+    report_rows,
+    update_rollups,
+    whole_days,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
 logger = logging.getLogger(__name__)
 
 
-def _get_db_path() -> str:
-    """Derive SQLite file path from DATABASE_URL (same source the bot uses).
-
-    Priority: DB_PATH (explicit override) → DATABASE_URL → bot.db
-    DATABASE_URL format: sqlite+aiosqlite:///./bot.db  →  ./bot.db
-    """
-    explicit = os.getenv("DB_PATH")
-    if explicit:
-        return explicit
-    db_url = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./bot.db")
-    if ":///" in db_url:
-        return db_url.split("///", 1)[1]
-    return "bot.db"
-
-
-def main():
-    # 1. Config
-    DB_PATH = _get_db_path()
-    TENANT_ID = os.getenv("TENANT_ID")
-    BOT_ID = os.getenv("BOT_ID")
-    DAYS = int(os.getenv("DAYS", "7"))
-
-    if not os.path.exists(DB_PATH):
-        logger.error(f"Database not found at {DB_PATH}")
-        return
-
-    # 2. Time Range
-    now = datetime.now(timezone.utc)
-    start_date = now - timedelta(days=DAYS)
-    start_iso = start_date.isoformat()
-
-    logger.info(f"--- Analytics Report ({DAYS} days) ---")
-    logger.info(f"From: {start_iso}")
-    logger.info(f"To:   {now.isoformat()}")
-    if TENANT_ID:
-        logger.info(f"Tenant: {TENANT_ID}")
-    if BOT_ID:
-        logger.info(f"Bot:    {BOT_ID}")
+def _parse_date(value: str) -> datetime:
+    """YYYY-MM-DD or a full ISO timestamp; naive values are UTC."""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Funnel and game analytics from the event log")
+    parser.add_argument("--from", dest="start", type=_parse_date, help="window start (inclusive), e.g. 2026-01-01")
+    parser.add_argument("--to", dest="end", type=_parse_date, help="window end (exclusive); default: now")
+    parser.add_argument("--days", type=int, default=int(os.getenv("DAYS", "7")), help="window length when --from is not given")
+    parser.add_argument("--tenant", default=os.getenv("TENANT_ID"), help="only this tenant_id")
+    parser.add_argument("--bot", default=os.getenv("BOT_ID"), help="only this bot_id")
+    parser.add_argument("--format", choices=("text", "json", "csv"), default="text")
+    parser.add_argument("--top", type=int, default=5, help="number of games in the top lists")
+    parser.add_argument("--events", action="store_true", help="export raw events in the window as CSV")
+    parser.add_argument("--raw", action="store_true", help="scan the event log instead of the daily rollups")
+    parser.add_argument("--no-refresh", action="store_true", help="read the rollups without rolling up new events")
+    return parser.parse_args()
+
+
+def _print_text(report: dict) -> None:
+    logger.info(f"--- Analytics Report ---")
+    logger.info(f"From: {report['from']}")
+    logger.info(f"To:   {report['to']}")
+    if report["tenant_id"]:
+        logger.info(f"Tenant: {report['tenant_id']}")
+    if report["bot_id"]:
+        logger.info(f"Bot:    {report['bot_id']}")
     logger.info("-" * 40)
-
-    # 3. Load Events
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM events WHERE ts >= ?"
-    params = [start_iso]
-
-    if TENANT_ID:
-        query += " AND tenant_id = ?"
-        params.append(TENANT_ID)
-    if BOT_ID:
-        query += " AND bot_id = ?"
-        params.append(BOT_ID)
-
-    try:
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-    except sqlite3.OperationalError as e:
-        logger.error(f"Error reading DB: {e}")
-        conn.close()
-        return
-
-    conn.close()
-
-    logger.info(f"Total events found: {len(rows)}")
+    logger.info(f"Total events found: {report['total_events']}")
     logger.info("-" * 40)
 
-    if not rows:
+    if not report["total_events"]:
         return
 
-    # 4. Process Data
-    # Counters
-    funnel_counts = Counter()
-    
-    # Game Stats
-    games_opened = Counter()
-    games_finished = Counter()
-    
-    # Sets for conversion
-    users_finished = set()
-    users_purchase_intent = set()
-
-    for row in rows:
-        event = row["event_name"]
-        tg_id = row["tg_id"]
-        funnel_counts[event] += 1
-        
-        try:
-            meta = json.loads(row["meta"]) if row["meta"] else {}
-        except json.JSONDecodeError:
-            meta = {}
-
-        if event == "game.opened":
-            game_id = meta.get("game_id", "unknown")
-            games_opened[game_id] += 1
-            
-        elif event == "game.finished":
-            game_id = meta.get("game_id", "unknown")
-            games_finished[game_id] += 1
-            users_finished.add(tg_id)
-            
-        elif event == "purchase.intent":
-            users_purchase_intent.add(tg_id)
-
-    # 5. Print Results
-
     # D) Funnel
     print("\n[D] Funnel Counts:")
-    steps = [
-        "user.started",
-        "game.opened",
-        "game.finished",
-        "purchase.intent",
-        "reminder.enabled",
-        "reminder.sent"
-    ]
-    for step in steps:
-        print(f"  {step:<20}: {funnel_counts[step]}")
+    for step, n in report["funnel"].items():
+        print(f"  {step:<20}: {n}")
 
     # A) Top Games Opened
     print("\n[A] Top Games Opened (by sessions):")
-    if not games_opened:
-        print("  (model empty)")
-    for gid, count in games_opened.most_common(5):
+    if not report["top_opened"]:
+        print("  (none)")
+    for gid, count in report["top_opened"]:
         print(f"  {gid:<20}: {count}")
 
     # B) Top Games Finished
     print("\n[B] Top Games Finished (by sessions):")
-    if not games_finished:
+    if not report["top_finished"]:
         print("  (none)")
-    for gid, count in games_finished.most_common(5):
+    for gid, count in report["top_finished"]:
         print(f"  {gid:<20}: {count}")
 
     # C) Conversion
     print("\n[C] Conversion (Finished -> Purchase Intent):")
-    finished_count = len(users_finished)
-    intent_count = len(users_purchase_intent)
-    
-    # Intersection: users who finished AND showed intent
-    converted_users = users_finished.intersection(users_purchase_intent)
-    converted_count = len(converted_users)
-
-    if finished_count > 0:
-        cr = (converted_count / finished_count) * 100
-        print(f"  Unique Finished Users : {finished_count}")
-        print(f"  Unique Intent Users   : {intent_count}")
-        print(f"  Converted Users       : {converted_count}")
-        print(f"  Conversion Rate       : {cr:.2f}%")
+    conv = report["conversion"]
+    if conv["finished_users"]:
+        print(f"  Unique Finished Users : {conv['finished_users']}")
+        print(f"  Unique Intent Users   : {conv['intent_users']}")
+        print(f"  Converted Users       : {conv['converted_users']}")
+        print(f"  Conversion Rate       : {conv['rate']:.2f}%")
     else:
         print("  Conversion Rate       : N/A (no finished users)")
 
+
+def main():
+    args = _parse_args()
+    db_path = db_path_from_env()
+    if not os.path.exists(db_path):
+        logger.error(f"Database not found at {db_path}")
+        return 1
+
+    use_rollups = not (args.raw or args.events)
+    end = args.end or datetime.now(timezone.utc)
+    if use_rollups and not args.end:
+        # Rollups are per UTC day: "last N days" means today and N-1 before it
+        end = whole_days(EventFilter(start=end, end=end)).end
+    start = args.start or end - timedelta(days=args.days)
+    window = EventFilter(start=start, end=end, tenant_id=args.tenant, bot_id=args.bot)
+
+    conn = connect(db_path, readonly=not (use_rollups and not args.no_refresh))
+    try:
+        if args.events:
+            writer = csv.writer(sys.stdout)
+            writer.writerow(EVENT_COLUMNS)
+            for row in iter_events(conn, window):
+                writer.writerow(tuple(row))
+            return 0
+
+        if use_rollups:
+            if not args.no_refresh:
+                applied = update_rollups(conn)
+                if applied:
+                    logger.info(f"Rolled up {applied} new events")
+            report = build_rollup_report(conn, window, top=args.top)
+        else:
+            report = build_report(conn, window, top=args.top)
+    except sqlite3.OperationalError as e:
+        logger.error(f"Error reading DB: {e}")
+        if use_rollups:
+            logger.error("Rollup tables may be missing: run `alembic upgrade head`, or pass --raw")
+        return 1
+    finally:
+        conn.close()
+
+    if args.format == "json":
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif args.format == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["section", "key", "value"])
+        writer.writerows(report_rows(report))
+    else:
+        _print_text(report)
+    return 0
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
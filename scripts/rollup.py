@@ -0,0 +1,60 @@
+"""Roll up new events into the daily rollup tables.
+
+Cheap when there is nothing new, so it can run from cron every few minutes:
+    */5 * * * * cd /opt/bots/bot_project && venv/bin/python scripts/rollup.py
+
+Usage:
+    python scripts/rollup.py              # incremental, from the high-water mark
+    python scripts/rollup.py --rebuild    # drop rollups and start from the first event
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from core.analytics import connect, db_path_from_env, high_water_mark, reset_rollups, update_rollups
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental daily rollups of the event log")
+    parser.add_argument("--rebuild", action="store_true", help="discard existing rollups first")
+    parser.add_argument("--batch-size", type=int, default=50000, help="events per transaction")
+    args = parser.parse_args()
+
+    db_path = db_path_from_env()
+    if not os.path.exists(db_path):
+        logger.error(f"Database not found at {db_path}")
+        return 1
+
+    conn = connect(db_path, readonly=False)
+    try:
+        if args.rebuild:
+            reset_rollups(conn)
+            logger.info("Rollups cleared")
+        started = time.monotonic()
+        applied = update_rollups(conn, batch_size=args.batch_size)
+        logger.info(
+            f"Rolled up {applied} events in {time.monotonic() - started:.2f}s "
+            f"(high-water mark: event #{high_water_mark(conn)})"
+        )
+    except sqlite3.OperationalError as e:
+        logger.error(f"Rollup failed: {e} (is the DB migrated? run `alembic upgrade head`)")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,9 +13,10 @@ sys.path.append(str(PROJECT_ROOT))
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from core import app_state
+from aiogram import Bot
+
+from config import get_settings
 from core.reminders.service import process_due_reminders, enable_reminder, list_due_reminders
-from core.config import get_tenant_config
 from models import init_db, Reminder, AsyncSessionLocal
 
 async def main():
@@ -23,10 +24,6 @@ async def main():
     
     # 1. Init environment
     try:
-        if not os.getenv("TENANT_ID"):
-             os.environ["TENANT_ID"] = "vojd"
-        cfg = get_tenant_config()
-        app_state.init_tenant(cfg)
         await init_db()
         logger.info("Environment initialized.")
     except Exception as e:
@@ -52,7 +49,12 @@ async def main():
     
     # 5. Process due
     logger.info("Processing due reminders...")
-    count = await process_due_reminders()
+    # Sends a real message: use your own Telegram id as tg_id
+    bot = Bot(token=get_settings().bot_token)
+    try:
+        count = await process_due_reminders(bot)
+    finally:
+        await bot.session.close()
     logger.info(f"Processed count (should be 1): {count}")
 
     # 6. Verify processed